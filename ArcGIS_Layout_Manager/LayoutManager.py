@@ -1,15 +1,19 @@
 from __future__ import print_function
 from __future__ import division
 
-import json
+import collections
+import contextlib
 import logging
 
 import os
+import threading
 
-import arcview
-import arcpy
+from . import layout_elements, exceptions, table_of_contents_elements, layout_storage, storage_backends, \
+    instrumentation, export, planning, layout_index, lazy_import, apply_plans, capture, background_save, spatial_index, \
+    geometry, toc_tree, inventory
 
-from . import layout_elements, exceptions, table_of_contents_elements
+# arcpy is only imported (after arcview) once a LayoutManager works with a map document
+arcpy = lazy_import.LazyModule("arcpy", requires=("arcview",))
 
 """
 Layout Manager to help with managing multiple ArcGIS Layouts in a single map document
@@ -25,41 +29,16 @@ class LayoutManager(object):
     active_layout - Current active layout
     toc_active - Controls if the table of contents are updated when the layout changes (default: True)
     lyr_active - Controls if the map layout objects are updated when the layout changes (default: True)
+    diff_switch - Only write the properties that differ from the state last applied or captured when the layout
+    changes (default: False). Changes made by hand in ArcMap are only seen once the layout is updated
+    json_format - Format written when saving the layout json, 1 for the flat format with every property of every
+    layout, 2 for a shared base layout with per layout overrides or 3 for the base and overrides as json lines,
+    one line per layout (default: 2)
+    json_compress - gzip compress the layout json when saving, compressed files are found when reading (default: False)
+    json_compact - write the layout json without indentation, smaller but harder to edit by hand (default: False)
     """
 
-    # Moves any missing element from the current layout off screen
-    move_missing_off_screen = True
-
-    # Auto save the json contents after a change
-    auto_save = True
-
-    # Currently Active Layout
-    active_layout = None
-
-    # Should it modify Table of Contents
-    toc_active = True
-
-    # Should it modify Layers
-    lyr_active = True
-
-    _within_arcmap = False
-
-    _is_active = False
-    _mxd = None
-    _mxd_name = None
-    _mxd_source_path = None
-    _layout_json_path = None
-
-    _layouts = {}
-
-    _layout_object_mapper = {
-        "DATAFRAME_ELEMENT": layout_elements.DataFrameElement,
-        "GRAPHIC_ELEMENT": layout_elements.GraphicElement,
-        "LEGEND_ELEMENT": layout_elements.LegendElement,
-        "MAPSURROUND_ELEMENT": layout_elements.MapSurroundElement,
-        "PICTURE_ELEMENT": layout_elements.PictureElement,
-        "TEXT_ELEMENT": layout_elements.TextElement
-    }
+    _layout_object_mapper = layout_elements.layout_object_mapper
 
     def __init__(self, **kwargs):
         """
@@ -69,13 +48,117 @@ class LayoutManager(object):
         mxd_path
         mxd
         :type kwargs:
+        apply_first_layout
+        storage
+        read_only
+        background_save
+        inventory
+        :type kwargs:
         mxd_path = string
         mxd =  arcpy.mapping.MapDocument
         Nothing to use "CURRENT" if working within ArcMap
+        apply_first_layout = bool, switch to the first stored layout once loaded, otherwise there's no active layout
+        until the first switch (default: True)
+        storage = "json" (default), "sqlite" or a storage_backends.LayoutStorage
+        read_only = bool, never write the layout storage, for workers sharing a store (default: False)
+        background_save = bool, save on a background writer thread, see start_background_save (default: False)
+        inventory = bool, cache the element and layer names of the document in <mxd>_inventory.json, see inventory
+        (default: True when opened from mxd_path, a supplied MapDocument may have changes not saved to disk)
         """
+        # Configuration and document state are per instance, so managers for different documents
+        # can live in one process without sharing layouts
+
+        # Moves any missing element from the current layout off screen
+        self.move_missing_off_screen = True
+
+        # Auto save the json contents after a change
+        self.auto_save = True
+
+        # Currently Active Layout
+        self.active_layout = None
+
+        # Should it modify Table of Contents
+        self.toc_active = True
+
+        # Should it modify Layers
+        self.lyr_active = True
+
+        # Only write changed properties when switching
+        self.diff_switch = False
+
+        # Layout json format written on save, files in either format are read
+        self.json_format = layout_storage.OVERRIDE_FORMAT
+        self.json_compress = False
+        self.json_compact = False
+
+        self._within_arcmap = False
+
+        self._is_active = False
+        self._mxd = None
+        self._mxd_name = None
+        self._mxd_source_path = None
+        self._layout_json_path = None
+        self._storage = None
+        self._read_only = False
+
+        self._layouts = layout_storage.LayoutCollection()
+
+        # state last applied to or captured from the map document, used by diff_switch
+        self._applied_elements = {}
+        self._applied_toc = {}
+
+        # layout names changed since the last save and the (layout name, layout) the map document showed when a
+        # batch was rolled back, a recapture of the document matching it isn't stored into the restored layout
+        self._unsaved_layouts = set()
+        self._clean_state = None
+
+        self._stats = instrumentation.NullStats()
+
+        # nesting depth of batch() blocks and whether a refresh was held back by one
+        self._batch_depth = 0
+        self._refresh_pending = False
+
+        # version, content version and per layout signatures of the layout storage when last read or written,
+        # used by reload and save_layout_json to find changes made by other processes
+        self._storage_version = None
+        self._storage_content = None
+        # held while the storage state is read or recorded, shared with the background writer thread
+        self._storage_lock = threading.RLock()
+        self._stored_signatures = {}
+
+        # functions called as listener(layout_name, record) when a layout is created, changed or removed
+        self._layout_listeners = []
+
+        # Number of compiled apply plans kept, most recently switched layouts first
+        self.plan_cache_size = 64
+
+        # compiled apply plans by layout name and the (arcpy object, type, name) / (arcpy layer, long name)
+        # handles of the document they are bound to, None until listed
+        self._apply_plans = collections.OrderedDict()
+        self._element_handles = None
+        self._layer_handles = None
+        # tree of the layer handles and the plan whose table of contents the document last showed, used by
+        # diff_switch to skip unchanged subtrees, None once the table of contents was captured or not fully applied
+        self._toc_tree = None
+        self._applied_toc_plan = None
+
+        # background_save.BackgroundWriter while saving in the background
+        self._writer = None
+
+        # inventory.DocumentInventory of the document on disk, None when not used
+        self._inventory = None
+        # the inventory only describes the document until its elements or layers change in this session or the
+        # handles are dropped
+        self._inventory_names = True
+
         try:
             mxd = kwargs.get("mxd")
             mxd_path = kwargs.get("mxd_path")
+            apply_first_layout = kwargs.get("apply_first_layout", True)
+            storage = kwargs.get("storage", "json")
+            self._read_only = kwargs.get("read_only", False)
+            if self._read_only:
+                self.auto_save = False
 
             self.log_or_print("starting layout mapper", logging.info)
 
@@ -93,21 +176,27 @@ class LayoutManager(object):
                 else:
                     raise exceptions.MXD_ERROR()
 
-            self._activate_mapper()
+            opened_from_path = type(mxd) != arcpy.mapping.MapDocument and not self._within_arcmap
+            if kwargs.get("inventory", opened_from_path):
+                self._inventory = inventory.DocumentInventory.for_document(self._mxd.filePath)
+
+            self._activate_mapper(storage)
             self._is_active = True
+            if kwargs.get("background_save", False) and not self._read_only:
+                self.start_background_save()
 
             layout_items = self._get_layouts()
-            if len(layout_items) > 0:
-                self.auto_save = False
+            # without applying the first layout the document matches no layout, there's no active layout until
+            # a switch, so the first auto save switch doesn't capture the document into a stored layout
+            if len(layout_items) > 0 and apply_first_layout:
                 self.active_layout = layout_items[0]
-                self.switch_layout(self.active_layout)
-                self.auto_save = True
+                self._reapply_active_layout()
 
         except exceptions.MXD_ERROR as mxd_error:
             self.log_or_print("Error activating MXD", logging.error)
             self.log_or_print("Confirm MXD Path and re-init", logging.error)
         except Exception as e:
-            logging.error(e.message)
+            logging.error(str(e))
 
     def __del__(self):
         del(self._mxd)
@@ -115,112 +204,360 @@ class LayoutManager(object):
     def _get_mxd_source_path(self):
         self.log_or_print("Getting MXD Name and Source Path", logging.info)
         mxd_file_path = self._mxd.filePath
-        mxd_source = self._mxd.filePath.replace("\\{}".format(mxd_file_path.split("\\")[-1]), "")
+        mxd_source = os.path.dirname(mxd_file_path)
         self._mxd_source_path = mxd_source
-        self._mxd_name = mxd_file_path.split("\\")[-1].replace(".mxd", "")
+        self._mxd_name = os.path.basename(mxd_file_path).replace(".mxd", "")
         json_path = os.path.join(self._mxd_source_path, "{}_layout.json".format(self._mxd_name))
         self._layout_json_path = json_path
         return mxd_source
 
-    def _activate_mapper(self):
+    def _activate_mapper(self, storage="json"):
         if self._is_active:
             self.log_or_print("Mapper already active", logging.warning)
 
         self._get_mxd_source_path()
 
-        if not os.path.isfile(self._layout_json_path):
-            with open(self._layout_json_path, 'w') as fl:
-                fl.write("[]")
+        self._storage = storage_backends.storage_for_document(self._mxd.filePath, storage)
+
+        if not self._storage.exists():
+            self._storage.create()
+            self._layouts = layout_storage.LayoutCollection(loader=self._storage.read_record)
+            self._record_storage_state(collections.OrderedDict())
         else:
             self._read_layout()
         return
 
     def _read_layout(self):
-        self.log_or_print("Loading layout JSON", logging.info)
-        data = None
-        with open(self._layout_json_path, 'r') as fl:
-            data = json.loads(fl.read())
-
-        return_data = {}
-        for val in data:
-            layout_name = val.get('layout_name')
-            layout_types = {}
-            layout_items = val.get('layout_items')
-            self.toc_active = val.get('toc_active', True)
-            self.lyr_active = val.get('lyr_active', True)
-
-            for item in layout_items:
-                layout_type_dct = {}
-                for ty in layout_items[item]:
-                    obj = self._layout_object_mapper[item](ty)
-                    layout_type_dct[obj.name] = obj
-                layout_types[item] = layout_type_dct
-
-            toc_types = {}
-            toc_items = val.get('toc_items', {})
-            for item in toc_items:
-                toc_val = table_of_contents_elements.TableOfContentsItem(toc_items[item])
-                toc_types[toc_val.long_name] = toc_val
-
-            return_data[layout_name] = {
-                'layout_name': layout_name,
-                'layout_items': layout_types,
-                'toc_items': toc_types,
-            }
-
-        self._layouts = return_data
+        self.log_or_print("Loading layouts from {}".format(self._storage.path), logging.info)
+
+        # layouts are only built from their records when first used
+        version = self._storage.version()
+        content = self._storage.content_version()
+        index, settings = self._storage.read_index()
+        self.toc_active = settings.get('toc_active', self.toc_active)
+        self.lyr_active = settings.get('lyr_active', self.lyr_active)
+
+        self._layouts = layout_storage.LayoutCollection(index, self._storage.read_record)
+        self._record_storage_state(index, version, content)
         return self._layouts
 
-    def save_layout_json(self):
-        self._get_mxd_source_path()
-        self.log_or_print("Saving layout JSON to {}".format(self._layout_json_path), logging.info)
-        out_data = []
-        for item_name in self._layouts:
-            item = self._layouts[item_name]
-            out_name = item.get('layout_name')
-            layouts = {}
-            layout_items = item.get('layout_items')
-            for item1 in layout_items:
-                layout_sub = []
-                for sub in layout_items[item1]:
-                    layout_sub.append(layout_items[item1][sub].to_dictionary())
-                layouts[item1] = layout_sub
-
-            toc = {}
-            toc_items = item.get('toc_items', {})
-            for item in toc_items:
-                toc_val = toc_items[item]
-                toc[toc_val.long_name] = toc_val.to_dictionary()
-
-            out_data.append({
-                "layout_name": out_name,
-                "layout_items": layouts,
-                'toc_items': toc,
-                'toc_active': self.toc_active,
-                'lyr_active': self.lyr_active
-            })
-
-        with open(self._layout_json_path, 'w') as fl:
-            fl.write(json.dumps(out_data, indent=4))
+    def _record_storage_state(self, index=None, version=None, content=None, signatures=None):
+        """
+        Remember the state of the layout storage as last read or written
+        """
+        with self._storage_lock:
+            self._storage_version = self._storage.version() if version is None else version
+            self._storage_content = self._storage.content_version() if content is None else content
+            self._stored_signatures = self._storage.signatures(index) if signatures is None else signatures
+
+    def _storage_changed(self):
+        """
+        Check if the layout storage changed since it was last read or written, the content is only compared
+        when the version changed, so touching the file doesn't count as a change
+        """
+        with self._storage_lock:
+            version = self._storage.version()
+            if version == self._storage_version:
+                return False
+            content = self._storage.content_version()
+            if content == self._storage_content:
+                self._storage_version = version
+                return False
+            return True
+
+    def reload(self, apply=True, force=False):
+        """
+        Pick up layouts changed in the layout storage by hand or by another process
+        Only layouts whose stored record changed are rebuilt, the rest keep their loaded layouts.
+        Layouts changed here and not saved are kept, unless the same layout also changed in the storage.
+        :param apply: switch to the active layout again if it changed (default: True)
+        :type apply: bool
+        :param force: replace layouts changed both here and in the storage with the stored layout,
+        otherwise exceptions.LayoutConflict is raised and nothing is reloaded (default: False)
+        :type force: bool
+        :return: names of the layouts changed or removed in the storage
+        :rtype: list
+        """
+        if self._writer is not None:
+            self._writer.flush()
+            self._take_background_failure()
+        if not self._storage_changed():
+            return []
+        return self._reload_storage(apply, force)
+
+    def _reload_storage(self, apply, force):
+        self.log_or_print("Reloading changed layouts from {}".format(self._storage.path), logging.info)
+        with self._storage_lock:
+            changed = self._reload_index(force)
+        self._notify_layout_listeners(changed)
+
+        self.log_or_print("{} layouts changed in storage".format(len(changed)), logging.info)
+        if self.active_layout in changed:
+            if self.active_layout not in self._layouts:
+                self.log_or_print("Active layout \"{}\" was removed".format(self.active_layout), logging.warning)
+            elif apply:
+                self._reapply_active_layout()
+        return list(changed)
+
+    def _reload_index(self, force):
+        """
+        Read the storage index again and reindex the layouts changed in it
+        :return: names of the layouts changed or removed in the storage
+        :rtype: set
+        """
+        version = self._storage.version()
+        content = self._storage.content_version()
+        index, settings = self._storage.read_index()
+        signatures = self._storage.signatures(index)
+        stored_signatures = self._stored_signatures
+
+        changed = set(layout_name for layout_name in signatures
+                      if stored_signatures.get(layout_name) != signatures[layout_name])
+        changed.update(layout_name for layout_name in stored_signatures if layout_name not in signatures)
+
+        conflicts = [layout_name for layout_name in self._unsaved_layouts if layout_name in changed]
+        if conflicts and not force:
+            raise exceptions.LayoutConflict(conflicts)
+
+        # unsaved layouts not changed in the storage stay as they are here
+        kept_unsaved = set(layout_name for layout_name in self._unsaved_layouts if layout_name not in changed)
+        kept_layouts = dict((layout_name, self._layouts.get(layout_name)) for layout_name in kept_unsaved
+                            if layout_name in self._layouts)
+
+        self._layouts.reindex(index, changed)
+        for layout_name in kept_unsaved:
+            if layout_name in kept_layouts:
+                self._layouts[layout_name] = kept_layouts[layout_name]
+            elif layout_name in self._layouts:
+                del self._layouts[layout_name]
+        self._unsaved_layouts = kept_unsaved
+
+        self.toc_active = settings.get('toc_active', self.toc_active)
+        self.lyr_active = settings.get('lyr_active', self.lyr_active)
+        self._record_storage_state(index, version, content, signatures)
+        return changed
+
+    def _reapply_active_layout(self):
+        # switch without capturing the document into the reloaded layout first
+        with self._stats.phase("switch", self.active_layout):
+            self._switch_layout(self.active_layout, capture=False)
+
+    def save_layout_json(self, force=False):
+        """
+        Save the layouts
+        If the layout storage was changed by another process since it was read, the other changes are reloaded
+        first, exceptions.LayoutConflict is raised if they include a layout changed here
+        :param force: overwrite the storage without checking for changes (default: False)
+        :type force: bool
+        """
+        if self._read_only:
+            self.log_or_print("Layout manager is read only - not saving", logging.warning)
+            return
+
+        if self._writer is not None:
+            if not self._take_background_failure():
+                # layouts are replaced rather than changed, so a shallow copy is a snapshot
+                with self._stats.phase("save"):
+                    self._writer.submit(self._layouts.copy(), self._unsaved_layouts, self._storage_settings(),
+                                        self.json_format, force)
+                self._unsaved_layouts = set()
+                return
+            # a background write found the storage changed by another process, the changes are merged here
+            self._writer.flush()
+        self._write_storage(force)
+
+    def _storage_settings(self):
+        return {
+            'toc_active': self.toc_active,
+            'lyr_active': self.lyr_active
+        }
+
+    def _write_storage(self, force):
+        if not force and self._storage_changed():
+            self._reload_storage(apply=False, force=False)
+
+        self.log_or_print("Saving layouts to {}".format(self._storage.path), logging.info)
+        with self._stats.phase("save"), self._storage_lock:
+            signatures = self._storage.write(self._layouts, self._unsaved_layouts, self._storage_settings(),
+                                             self.json_format, self.json_compress, self.json_compact)
+            self._record_storage_state(signatures=signatures)
+
+        self._unsaved_layouts = set()
 
         return
 
-    def create_layout(self, layout_name):
+    def start_background_save(self, delay=0.5):
+        """
+        Save on a background writer thread, save_layout_json (and auto save) only hands over a snapshot of the layouts
+        Saves made within delay seconds of each other are written once. Each write goes to a temp file that
+        replaces the json file once complete. Call flush() or close() to make sure the layouts are written.
+        Changes made in the storage by another process are found before each write, the write is then skipped
+        and the changes are merged by the next save_layout_json or flush().
+        :param delay: seconds to wait for more saves before writing (default: 0.5)
+        :type delay: float
+        """
+        if self._read_only:
+            self.log_or_print("Layout manager is read only - not saving", logging.warning)
+            return
+        if self._writer is not None:
+            self._writer.delay = delay
+            return
+        self._writer = background_save.BackgroundWriter(
+            self._background_write, lambda: not self._storage_changed(), delay, self._storage_lock
+        )
+
+    def stop_background_save(self):
+        """
+        Write any pending save and save on the calling thread again
+        """
+        if self._writer is None:
+            return
+        try:
+            self.flush()
+        finally:
+            self._writer.close()
+            self._writer = None
+
+    def flush(self):
+        """
+        Wait until saves handed to the background writer are written
+        Raises the error of a failed background write, exceptions.LayoutConflict if the storage was changed
+        by another process in a layout changed here
+        """
+        if self._writer is None:
+            return
+        self._writer.flush()
+        if self._take_background_failure():
+            self._write_storage(force=False)
+
+    def _background_write(self, layouts, changed_layouts, settings, format_version):
+        # runs on the writer thread, holding the storage lock
+        signatures = self._storage.write(layouts, changed_layouts, settings, format_version, self.json_compress,
+                                         self.json_compact)
+        self._record_storage_state(signatures=signatures)
+
+    def _take_background_failure(self):
+        """
+        Mark the layouts of failed background writes unsaved again
+        :return: True if a write was skipped because the storage was changed by another process
+        """
+        failed_layouts, error = self._writer.take_failure()
+        if error is None:
+            return False
+        self._unsaved_layouts.update(failed_layouts)
+        if not isinstance(error, background_save.StorageChanged):
+            raise error
+        return True
+
+    def create_layout(self, layout_name, base_layout=None, element_types=None, name_pattern=None, toc_root=None,
+                      properties=None):
+        """
+        Create a layout from the map document
+        With any of the scope options only that part of the document is captured, the rest of the new layout
+        is copied from base_layout. See update_layout for the scope options
+        :param layout_name: name of the new layout
+        :param base_layout: layout the new layout starts from when the capture is scoped (default: active layout)
+        """
         try:
-            if layout_name in self._get_layouts():
+            if layout_name in self._layouts:
                 raise exceptions.LayoutExists()
 
             self.log_or_print("Creating new layout \"{}\"".format(layout_name), logging.info)
-            new_layout = self._generate_layout(layout_name)
+            scope = capture.CaptureScope(element_types, name_pattern, toc_root, properties)
+            base = self._layouts.get(self.active_layout if base_layout is None else base_layout)
+            with self._stats.phase("capture", layout_name):
+                if scope.is_full() or base is None:
+                    new_layout = self._generate_layout(layout_name)
+                else:
+                    new_layout = self._capture_scoped(layout_name, base, scope)
             self._layouts[new_layout.get('layout_name')] = new_layout
+            self._unsaved_layouts.add(new_layout.get('layout_name'))
             self.active_layout = layout_name
+            self._notify_layout_listeners([layout_name])
 
-            if self.auto_save:
-                self.save_layout_json()
+            if self._auto_saving():
+                self._save_changes()
 
         except exceptions.LayoutExists as le:
             self.log_or_print("Layout \"{}\" Exists - Choose a new name".format(layout_name), logging.error)
 
+    def create_layouts(self, pages, share_toc=True):
+        """
+        Create a layout for each data driven page in a single pass, saving once at the end
+        Each page is made current, captured and stored under its page id, as create_layout(page_id) would.
+        Elements that did not change from the previous page share the previous page's element object.
+        :param pages: page ids, search cursor rows with the page name as the first value,
+        or a DataDrivenPages object to create a layout for every page
+        :type pages: iterable or arcpy.mapping.DataDrivenPages
+        :param share_toc: capture the table of contents once and reuse it for every page, changing
+        the current page does not change layer visibility or transparency (default: True)
+        :type share_toc: bool
+        :return: names of the created layouts
+        :rtype: list
+        """
+        data_driven_pages = self._mxd.dataDrivenPages
+        if hasattr(pages, "pageCount"):
+            pages = range(1, pages.pageCount + 1)
+
+        existing_names = set(self._get_layouts())
+        created = []
+        previous_layout = None
+        shared_toc_items = None
+        self.log_or_print("Creating layouts for data driven pages", logging.info)
+        for page in pages:
+            if isinstance(page, (tuple, list)):
+                page = data_driven_pages.getPageIDFromName(page[0])
+
+            if page in existing_names:
+                self.log_or_print("Layout \"{}\" Exists - Skipping page".format(page), logging.error)
+                continue
+
+            data_driven_pages.currentPageID = page
+            if self._within_arcmap:
+                arcpy.RefreshActiveView()
+
+            with self._stats.phase("capture", page):
+                if shared_toc_items is None or not share_toc:
+                    shared_toc_items = self._get_table_of_contents()
+
+                new_layout = {
+                    'layout_name': page,
+                    'layout_items': self._get_layout_items(),
+                    'toc_items': shared_toc_items
+                }
+            if previous_layout is not None:
+                self._reuse_unchanged_elements(new_layout, previous_layout)
+
+            self._layouts[page] = new_layout
+            self._unsaved_layouts.add(page)
+            existing_names.add(page)
+            created.append(page)
+            previous_layout = new_layout
+
+        if previous_layout is not None:
+            self.active_layout = previous_layout.get('layout_name')
+            self._track_applied_state(previous_layout)
+        self._notify_layout_listeners(created)
+
+        if self._auto_saving():
+            self._save_changes()
+
+        return created
+
+    @staticmethod
+    def _reuse_unchanged_elements(new_layout, previous_layout):
+        """
+        Swap elements of a new layout for the previous layout's element objects when their properties match
+        Layout element objects are never changed in place, so they can be shared between layouts
+        """
+        previous_items = previous_layout.get('layout_items', {})
+        for element_type, elements in new_layout.get('layout_items', {}).items():
+            previous_elements = previous_items.get(element_type, {})
+            for element_name, element in elements.items():
+                previous_element = previous_elements.get(element_name)
+                if previous_element is not None and previous_element.to_dictionary() == element.to_dictionary():
+                    elements[element_name] = previous_element
+
     def _generate_layout(self, layout_name):
         toc_items = self._get_table_of_contents()
         layout_items = self._get_layout_items()
@@ -229,8 +566,211 @@ class LayoutManager(object):
             'layout_items': layout_items,
             'toc_items': toc_items
         }
+        self._track_applied_state(layout_dct)
         return layout_dct
 
+    def _capture_scoped(self, layout_name, base_layout, scope):
+        """
+        Capture part of the map document merged into a copy of a stored layout
+        :param base_layout: stored layout, left unchanged
+        :type scope: capture.CaptureScope
+        :return: the merged layout
+        :rtype: dict
+        """
+        layout_items = dict(
+            (element_type, dict(elements)) for element_type, elements in base_layout.get('layout_items', {}).items()
+        )
+        toc_items = base_layout.get('toc_items', {})
+
+        if scope.capture_elements:
+            unnamed = 0
+            for element_type in scope.element_types or (None,):
+                if element_type is None:
+                    items = arcpy.mapping.ListLayoutElements(self._mxd)
+                else:
+                    items = arcpy.mapping.ListLayoutElements(self._mxd, element_type)
+                for item in items:
+                    item_type = item.type if element_type is None else element_type
+                    name = item.name
+                    self._stats.count_reads(item_type, 2 if element_type is None else 1)
+                    if not scope.includes_element(name):
+                        continue
+                    if not name:
+                        unnamed += 1
+                        continue
+                    elements = layout_items.setdefault(item_type, {})
+                    stored = elements.get(name)
+                    element, reads = capture.read_element(item, item_type, stored, scope.element_properties)
+                    self._stats.count_reads(item_type, reads)
+                    elements[name] = element
+                    self._record_captured(self._applied_elements, (item_type, name), element,
+                                          None if stored is None else scope.element_properties)
+            if unnamed:
+                self.log_or_print("{} unnamed elements skipped, update the whole layout to name them".format(unnamed),
+                                  logging.warning)
+
+        if scope.capture_toc:
+            # the toc items dict may be shared with other layouts
+            toc_items = dict(toc_items)
+            for lyr in arcpy.mapping.ListLayers(self._mxd):
+                long_name = lyr.longName
+                self._stats.count_reads("LAYER")
+                if not scope.includes_layer(long_name):
+                    continue
+                stored = toc_items.get(long_name)
+                toc_item, reads = capture.read_layer(lyr, stored, scope.toc_properties)
+                self._stats.count_reads("LAYER", reads)
+                toc_items[long_name] = toc_item
+                self._record_captured(self._applied_toc, long_name, toc_item,
+                                      None if stored is None else scope.toc_properties)
+            self._applied_toc_plan = None
+
+        layout_dct = {
+            'layout_name': layout_name,
+            'layout_items': layout_items,
+            'toc_items': toc_items
+        }
+        return layout_dct
+
+    @staticmethod
+    def _record_captured(applied, key, captured, properties):
+        """
+        Record the part of a captured item read from the map document as applied, see capture.known_state
+        :param applied: _applied_elements or _applied_toc
+        :param properties: property names read, None when every property was read
+        """
+        state = capture.known_state(applied.get(key), captured, properties)
+        if state is None:
+            applied.pop(key, None)
+        else:
+            applied[key] = state
+
+    def _track_applied_state(self, layout_dct):
+        """
+        Record a freshly captured layout as the current state of the map document
+        :param layout_dct: layout generated from the map document
+        :type layout_dct: dict
+        """
+        self._applied_elements = {}
+        for element_type, elements in layout_dct.get('layout_items', {}).items():
+            for element_name, element in elements.items():
+                self._applied_elements[(element_type, element_name)] = element
+        self._applied_toc = dict(layout_dct.get('toc_items', {}))
+        self._applied_toc_plan = None
+        self._clean_state = None
+
+    @staticmethod
+    def _layout_dictionaries(layout_dct):
+        dictionaries = {}
+        for element_type, elements in layout_dct.get('layout_items', {}).items():
+            for element_name, element in elements.items():
+                dictionaries[(element_type, element_name)] = element.to_dictionary()
+        for long_name, toc_item in layout_dct.get('toc_items', {}).items():
+            dictionaries[("TOC", long_name)] = toc_item.to_dictionary()
+        return dictionaries
+
+    def _layout_differs(self, old_layout, new_layout):
+        if old_layout is None:
+            return True
+        return self._layout_dictionaries(old_layout) != self._layout_dictionaries(new_layout)
+
+    def _store_document_changes(self):
+        """
+        Recapture the active layout before the map document is changed by the manager, storing it only if it differs
+        from the stored layout, so a switch without changes made by hand doesn't save
+        Every captured property is read, a change to any of them can only be found by reading it
+        """
+        layout_name = self.active_layout
+        shown = self._layouts.get(layout_name)
+        if self._clean_state is not None and self._clean_state[0] == layout_name:
+            shown = self._clean_state[1]
+        with self._stats.phase("recapture", layout_name):
+            new_layout = self._generate_layout(layout_name)
+        if self._layout_differs(shown, new_layout):
+            self._layouts[layout_name] = new_layout
+            self._unsaved_layouts.add(layout_name)
+            self._notify_layout_listeners([layout_name])
+
+    def _auto_saving(self):
+        """
+        Auto save is on and not held back by a batch
+        """
+        return self.auto_save and self._batch_depth == 0
+
+    def _refresh(self):
+        """
+        Refresh the ArcMap table of contents and view, deferred to the end of a batch
+        """
+        if not self._within_arcmap:
+            return
+        if self._batch_depth > 0:
+            self._refresh_pending = True
+            return
+        with self._stats.phase("refresh", self.active_layout):
+            arcpy.RefreshTOC()
+            arcpy.RefreshActiveView()
+        self._refresh_pending = False
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Group several operations, holding back refreshes, auto save recaptures and saves until the block ends
+        The view is refreshed once and, with auto_save on, changed layouts are saved once at the end.
+        With auto_save on, changes made to the active layout before the block are stored as the block starts, as the
+        first switch would store them. Changes made to the map document inside the block are only stored by an
+        explicit update_layout.
+        If the block raises, the in memory layouts are rolled back to their state before the block,
+        the map document itself is left as it is.
+        Ex:
+            with lm.batch():
+                lm.create_layout("Layout One")
+                lm.update_layout("Layout Two")
+                lm.switch_layout("Layout One")
+        """
+        if self._batch_depth > 0:
+            yield self
+            return
+
+        # switches inside the block don't recapture, so the active layout is checked once here, before the snapshot
+        # so a rollback keeps it
+        if self.auto_save and self.active_layout is not None:
+            self._store_document_changes()
+        layouts_snapshot = self._layouts.copy()
+        active_snapshot = self.active_layout
+        unsaved_snapshot = set(self._unsaved_layouts)
+        self._batch_depth += 1
+        try:
+            yield self
+        except Exception:
+            self._batch_depth -= 1
+            self.log_or_print("Batch failed - rolling back layouts", logging.error)
+            # layouts changed in the block are all unsaved, auto saves are held back
+            rolled_back = self._unsaved_layouts | unsaved_snapshot
+            self._layouts = layouts_snapshot
+            self.active_layout = active_snapshot
+            self._unsaved_layouts = unsaved_snapshot
+            self._notify_layout_listeners(rolled_back)
+            # the document still shows the batch, don't let the next switch capture it into the restored layout
+            self._clean_state = None
+            if self.auto_save and self.active_layout is not None:
+                shown = self._generate_layout(self.active_layout)
+                self._clean_state = (self.active_layout, shown)
+            self._refresh_pending = False
+            raise
+
+        self._batch_depth -= 1
+        if self._refresh_pending:
+            self._refresh()
+        if self._auto_saving():
+            self._save_changes()
+
+    def _save_changes(self):
+        """
+        Save the layout json only if a layout changed since the last save
+        """
+        if self._unsaved_layouts:
+            self.save_layout_json()
+
     def _get_layout_items(self):
         # search mxd
         logging.info("Collecting layout elements info")
@@ -243,46 +783,223 @@ class LayoutManager(object):
             "TEXT_ELEMENT": {}
         }
 
-        existing_names = []
-        for layout_item in arcpy.mapping.ListLayoutElements(self._mxd):
-            item = self._layout_object_mapper[layout_item.type](layout_item)
-            if not self._check_unique_name(item.name, existing_names):
-                item.name = self._create_unique_name(layout_item.type, existing_names)
-                layout_item.name = item.name
-            existing_names.append(item.name)
-            layout_list_items[layout_item.type][item.name] = item
+        listed = arcpy.mapping.ListLayoutElements(self._mxd)
+        element_types = []
+        items = []
+        for layout_item in listed:
+            element_type = layout_item.type
+            item = self._layout_object_mapper[element_type](layout_item)
+            self._stats.count_reads(element_type, len(item._properties) + 1)
+            element_types.append(element_type)
+            items.append(item)
 
+        listed_names = [item.name for item in items]
+        element_handles = self._name_elements(listed, listed_names, element_types)
+        for item, (layout_item, element_type, name) in zip(items, element_handles):
+            item.name = name
+            layout_list_items[element_type][name] = item
+
+        self._record_inventory(elements=[handle[1:] for handle in element_handles], listed_names=listed_names)
+        self._set_element_handles(element_handles)
         return layout_list_items
 
-    def _check_unique_name(self, name, existing_names):
-        if name in existing_names or name is None or name == "":
-            self.log_or_print("{} not unique".format(name), logging.info)
-            return False
-        else:
-            self.log_or_print("{} unique".format(name), logging.info)
-            return True
+    def _name_elements(self, items, listed_names, element_types):
+        """
+        Element handles of the listed elements, unnamed elements and elements repeating a name are named in the
+        document so layouts can find them
+        :return: (arcpy element, element type, name) of each element
+        :rtype: list
+        """
+        names = capture.UniqueNames()
+        element_handles = []
+        for item, listed_name, element_type in zip(items, listed_names, element_types):
+            name = names.claim(listed_name, element_type)
+            if name != listed_name:
+                item.name = name
+                self._stats.count_writes(element_type)
+            element_handles.append((item, element_type, name))
 
-    def _create_unique_name(self, base_type, existing_names):
-        name = None
-        layout_iterator = 0
-        while not self._check_unique_name(name, existing_names):
-            layout_iterator += 1
-            name = "{}_LAYOUT_{}".format(base_type, layout_iterator)
-        return name
+        if names.renamed:
+            self.log_or_print("Named {} elements without a unique name".format(names.renamed), logging.info)
+        return element_handles
 
     def _get_table_of_contents(self):
         self.log_or_print("Generating Table of contents", logging.info)
         layers = {}
+        layer_handles = []
         for lyr in arcpy.mapping.ListLayers(self._mxd):
             item = table_of_contents_elements.TableOfContentsItem(lyr)
+            self._stats.count_reads("LAYER", 5)
             layers[item.long_name] = item
+            layer_handles.append((lyr, item.long_name))
+
+        self._record_inventory(layers=[handle[1] for handle in layer_handles])
+        self._set_layer_handles(layer_handles)
         return layers
 
+    def _record_inventory(self, elements=None, listed_names=None, layers=None):
+        """
+        Fill the sections of the document inventory not yet known from a listing of the document, a listing that
+        differs from a known section means the document changed in this session and the inventory is no longer used
+        A read only manager keeps the inventory without saving it
+        """
+        if self._inventory is None or not self._inventory_names:
+            return
+        if (elements is not None and self._inventory.elements not in (None, elements)) or \
+                (layers is not None and self._inventory.layers not in (None, layers)):
+            self._inventory_names = False
+            return
+        changed = False
+        if elements is not None:
+            changed = self._inventory.record_elements(elements, listed_names) or changed
+        if layers is not None:
+            changed = self._inventory.record_layers(layers) or changed
+        if changed and not self._read_only:
+            try:
+                self._inventory.save()
+            except (IOError, OSError) as e:
+                self.log_or_print("Could not save the document inventory: {}".format(str(e)), logging.warning)
+
+    def invalidate_plans(self):
+        """
+        Drop the compiled apply plans and the element and layer handles they are bound to
+        Elements or layers added, removed or renamed are found on the next switch, this is only needed to free
+        the plans
+        """
+        self._apply_plans.clear()
+        self._element_handles = None
+        self._layer_handles = None
+        self._inventory_names = False
+        self._toc_tree = None
+        self._applied_toc_plan = None
+
+    def _set_element_handles(self, element_handles):
+        # keep the handles plans are bound to while the same elements are listed, in the same order
+        if self._element_handles is not None and \
+                [handle[1:] for handle in element_handles] == [handle[1:] for handle in self._element_handles]:
+            return
+        self._element_handles = element_handles
+
+    def _set_layer_handles(self, layer_handles):
+        if self._layer_handles is not None and \
+                [handle[1] for handle in layer_handles] == [handle[1] for handle in self._layer_handles]:
+            return
+        self._layer_handles = layer_handles
+        self._toc_tree = toc_tree.TocTree(layer_handles)
+
+    def _current_element_handles(self):
+        """
+        Element handles of the document, only read again when the elements were added, removed or renamed
+        The count is compared, then the name of each element, an element deleted and another cloned in its place
+        keeps the count but not the name
+        """
+        items = arcpy.mapping.ListLayoutElements(self._mxd)
+        if self._element_handles is not None and len(items) == len(self._element_handles):
+            names = [item.name for item in items]
+            for handle in self._element_handles:
+                self._stats.count_reads(handle[1])
+            if names == [handle[2] for handle in self._element_handles]:
+                return self._element_handles
+            self.log_or_print("Layout elements were renamed, binding the layouts again", logging.info)
+            self._inventory_names = False
+            element_types = [item.type for item in items]
+            for element_type in element_types:
+                self._stats.count_reads(element_type)
+            self._set_element_handles(self._name_elements(items, names, element_types))
+            return self._element_handles
+
+        if self._element_handles is not None:
+            # elements were added or removed in this session
+            self._inventory_names = False
+        inventory_current = self._inventory is not None and self._inventory_names
+        cached = self._inventory.elements if inventory_current else None
+        if self._element_handles is None and cached is not None and len(cached) == len(items):
+            # names of the unchanged document from the inventory, nothing is read, elements the inventory
+            # named are named the same in the document
+            element_handles = [(item, element_type, name) for item, (element_type, name) in zip(items, cached)]
+            for (item, element_type, name), listed_name in zip(element_handles, self._inventory.listed_names):
+                if name != listed_name:
+                    item.name = name
+                    self._stats.count_writes(element_type)
+        else:
+            listed_names = [item.name for item in items]
+            # types of elements listed with the same names as a (stale) inventory section aren't read again
+            element_types = self._inventory.element_types(listed_names) if inventory_current else None
+            reads = 1
+            if element_types is None:
+                element_types = [item.type for item in items]
+                reads = 2
+            for element_type in element_types:
+                self._stats.count_reads(element_type, reads)
+            element_handles = self._name_elements(items, listed_names, element_types)
+            self._record_inventory(elements=[handle[1:] for handle in element_handles], listed_names=listed_names)
+        self._set_element_handles(element_handles)
+        return self._element_handles
+
+    def _current_layer_handles(self):
+        layers = arcpy.mapping.ListLayers(self._mxd)
+        if self._layer_handles is not None and len(layers) == len(self._layer_handles):
+            long_names = [lyr.longName for lyr in layers]
+            self._stats.count_reads("LAYER", len(layers))
+            if long_names == [handle[1] for handle in self._layer_handles]:
+                return self._layer_handles
+            self.log_or_print("Layers were renamed, binding the layouts again", logging.info)
+            self._inventory_names = False
+            self._set_layer_handles(list(zip(layers, long_names)))
+        else:
+            if self._layer_handles is not None:
+                # layers were added or removed in this session
+                self._inventory_names = False
+            cached = self._inventory.layers if self._inventory is not None and self._inventory_names else None
+            if self._layer_handles is None and cached is not None and len(cached) == len(layers):
+                layer_handles = list(zip(layers, cached))
+            else:
+                layer_handles = []
+                for lyr in layers:
+                    layer_handles.append((lyr, lyr.longName))
+                    self._stats.count_reads("LAYER")
+                self._record_inventory(layers=[handle[1] for handle in layer_handles])
+            self._set_layer_handles(layer_handles)
+        return self._layer_handles
+
+    def _apply_plan(self, layout_data, element_handles, layer_handles):
+        """
+        Cached apply plan of a layout, compiled again if the layout or the handles changed
+        """
+        layout_name = layout_data.get('layout_name')
+        plan = self._apply_plans.pop(layout_name, None)
+        if plan is None or plan.layout is not layout_data or plan.element_handles is not element_handles \
+                or plan.layer_handles is not layer_handles:
+            with self._stats.phase("compile", layout_name):
+                plan = apply_plans.compile_plan(layout_data, element_handles, layer_handles,
+                                                self._toc_tree if layer_handles is not None else None)
+            for handle, element_type, name in plan.missing_elements:
+                self.log_or_print('"{}" not found.'.format(name), logging.warning)
+            for long_name in plan.missing_layers:
+                self.log_or_print("TOC Item {} is not found in layout manager".format(long_name), logging.warning)
+
+        self._apply_plans[layout_name] = plan
+        while len(self._apply_plans) > max(self.plan_cache_size, 1):
+            self._apply_plans.popitem(last=False)
+        return plan
+
     def switch_layout(self, new_layout):
+        """
+        Apply a stored layout to the map document, with auto_save on the active layout is stored first if changed
+        Errors are logged, a read only manager raises them instead
+        :return: True if the layout was applied
+        :rtype: bool
+        """
+        with self._stats.phase("switch", new_layout):
+            return self._switch_layout(new_layout)
+
+    def _switch_layout(self, new_layout, capture=True):
+        applying = False
         try:
-            if self.auto_save:
-                self.update_layout()
-                self.save_layout_json()
+            if capture and self._auto_saving():
+                if self.active_layout is not None:
+                    self._store_document_changes()
+                self._save_changes()
 
             self.log_or_print("Switching Layout to {}".format(new_layout), logging.info)
             layout_data = self._layouts.get(new_layout)
@@ -290,66 +1007,326 @@ class LayoutManager(object):
                 raise exceptions.MissingLayout()
 
             self.active_layout = layout_data.get('layout_name')
-            layout_items = layout_data.get('layout_items')
-            toc_items = layout_data.get('toc_items')
+            applying = True
+            element_handles = self._current_element_handles() if self.lyr_active else None
+            layer_handles = self._current_layer_handles() if self.toc_active else None
+            plan = self._apply_plan(layout_data, element_handles, layer_handles)
 
             if self.lyr_active:
                 self.log_or_print("Updating Layout properties", logging.info)
-                for item in arcpy.mapping.ListLayoutElements(self._mxd):
-                    layout_element = layout_items.get(item.type, {}).get(item.name, None)
-                    if layout_element is not None:
-                        layout_element.update_map_feature(item)
-                    else:
-                        if self.move_missing_off_screen:
-                            self.log_or_print('"{}" not found. Moving off screen'.format(item.name), logging.warning)
-                            max_x = self._mxd.pageSize.width + item.elementPositionX + 20
-                            item.elementPositionX = max_x
-                        else:
-                            self.log_or_print('"{}" not found.'.format(item.name), logging.warning)
+                with self._stats.phase("apply_elements", new_layout):
+                    apply_plans.replay_elements(plan, self._applied_elements if self.diff_switch else None,
+                                                self._stats)
+                    self._applied_elements.update(plan.applied_elements)
+                    for handle, element_type, name in plan.missing_elements:
+                        self._applied_elements.pop((element_type, name), None)
+                    if plan.missing_elements and self.move_missing_off_screen:
+                        self.log_or_print("Moving {} elements not in the layout off screen".format(
+                            len(plan.missing_elements)), logging.warning)
+                        page_width = self._mxd.pageSize.width
+                        for handle, element_type, name in plan.missing_elements:
+                            handle.elementPositionX = page_width + handle.elementPositionX + 20
+                            self._stats.count_writes(element_type)
 
             if self.toc_active:
                 self.log_or_print("Updating Table of Contents properties", logging.info)
-                for item in arcpy.mapping.ListLayers(self._mxd):
-                    toc_var = toc_items.get(item.longName, None)
-                    if toc_var is not None:
-                        toc_var.update_toc_feature(item)
+                with self._stats.phase("apply_toc", new_layout):
+                    previous_plan = self._applied_toc_plan
+                    if self.diff_switch and previous_plan is not None and plan.toc_tree is not None \
+                            and previous_plan.toc_tree is plan.toc_tree:
+                        apply_plans.replay_toc_tree(plan, previous_plan, self._stats)
                     else:
-                        self.log_or_print("TOC Item {} is not found in layout manager".format(item.longName), logging.warning)
+                        apply_plans.replay_toc(plan, self._applied_toc if self.diff_switch else None, self._stats)
+                    self._applied_toc.update(plan.applied_toc)
+                    # layers missing from the layout keep a state the plan doesn't know
+                    self._applied_toc_plan = None if plan.missing_layers else plan
 
-
-            if self._within_arcmap:
-                arcpy.RefreshTOC()
-                arcpy.RefreshActiveView()
+            self._refresh()
+            self._clean_state = None
+            return True
 
         except exceptions.MissingLayout as ml:
             self.log_or_print("Layout \"{}\" doesnt exists - please create or check".format(new_layout), logging.error)
+            if self._read_only:
+                raise
         except Exception as e:
-            self.log_or_print(e.message, logging.error)
+            self.log_or_print(str(e), logging.error)
+            if applying:
+                self._abandon_applied_state()
+            if self._read_only:
+                raise
+        return False
 
-    def update_layout(self, layout_name=None):
+    def _abandon_applied_state(self):
+        """
+        Forget the state of a map document left part way between layouts by a failed switch
+        There's no active layout until the next switch, which writes every property and captures nothing
+        """
+        self.active_layout = None
+        self._applied_elements = {}
+        self._applied_toc = {}
+        self._applied_toc_plan = None
+        self._clean_state = None
+
+    def update_layout(self, layout_name=None, element_types=None, name_pattern=None, toc_root=None, properties=None):
+        """
+        Store the map document as a layout
+        With any of the scope options only that part of the document is read and merged into the stored layout
+        Ex:
+            lm.update_layout(element_types=["DATAFRAME_ELEMENT"], properties=["extent"])
+            lm.update_layout(toc_root="Basemap", properties=["visibility"])
+        :param layout_name: layout to store to (default: active layout)
+        :param element_types: element types to capture, Ex: ["DATAFRAME_ELEMENT"]
+        :type element_types: list
+        :param name_pattern: fnmatch pattern of the element names to capture, Ex: "Inset*"
+        :type name_pattern: str
+        :param toc_root: long name of the group layer whose layers are captured
+        :type toc_root: str
+        :param properties: property groups to capture, see capture.PROPERTY_GROUPS
+        :type properties: list
+        """
         try:
             if layout_name is None:
-                new_layout = self._generate_layout(self.active_layout)
-                self._layouts[self.active_layout] = new_layout
-            else:
-                new_layout = self._generate_layout(layout_name)
+                layout_name = self.active_layout
+            if layout_name is None:
+                self.log_or_print("No active layout to update - switch to a layout or give a layout name",
+                                  logging.error)
+                return
+
+            scope = capture.CaptureScope(element_types, name_pattern, toc_root, properties)
+            stored = self._layouts.get(layout_name)
+            with self._stats.phase("recapture", layout_name):
+                if scope.is_full() or stored is None:
+                    new_layout = self._generate_layout(layout_name)
+                else:
+                    new_layout = self._capture_scoped(layout_name, stored, scope)
+            if self._layout_differs(stored, new_layout):
                 self._layouts[layout_name] = new_layout
+                self._unsaved_layouts.add(layout_name)
+                self._notify_layout_listeners([layout_name])
 
-            if self.auto_save:
-                self.save_layout_json()
+            if self._auto_saving():
+                self._save_changes()
 
         except Exception as e:
-            self.log_or_print(e.message, logging.error)
+            self.log_or_print(str(e), logging.error)
+
+    def enable_stats(self, hook=None):
+        """
+        Start recording phase timings and property reads/writes
+        :param hook: optional function called as hook(phase_name, seconds, layout_name) as each phase ends
+        :type hook: function
+        :return: the stats being recorded
+        :rtype: instrumentation.LayoutStats
+        """
+        if not isinstance(self._stats, instrumentation.LayoutStats):
+            self._stats = instrumentation.LayoutStats()
+        if hook is not None:
+            self._stats.hooks.append(hook)
+        return self._stats
+
+    def disable_stats(self):
+        self._stats = instrumentation.NullStats()
+
+    def stats(self):
+        """
+        Recorded phase seconds and counts, switch seconds per layout, and property reads/writes per element type
+        :rtype: dict
+        """
+        return self._stats.to_dictionary()
+
+    @contextlib.contextmanager
+    def profile(self, hook=None):
+        """
+        Record stats for the duration of a with block
+        Ex:
+            with lm.profile() as stats:
+                lm.switch_layout("Layout One")
+            print(stats.to_dictionary())
+        """
+        previous_stats = self._stats
+        self._stats = instrumentation.LayoutStats([hook] if hook is not None else None)
+        try:
+            yield self._stats
+        finally:
+            self._stats = previous_stats
+
+    def add_layout_listener(self, listener):
+        """
+        Call listener(layout_name, record) whenever a layout is created, changed or reloaded,
+        record is the flat layout record or None when the layout was removed
+        :type listener: function
+        """
+        self._layout_listeners.append(listener)
+
+    def remove_layout_listener(self, listener):
+        if listener in self._layout_listeners:
+            self._layout_listeners.remove(listener)
+
+    def _notify_layout_listeners(self, layout_names):
+        if not self._layout_listeners:
+            return
+        for layout_name in layout_names:
+            record = self._layouts.record(layout_name) if layout_name in self._layouts else None
+            for listener in list(self._layout_listeners):
+                listener(layout_name, record)
+
+    def build_layout_index(self):
+        """
+        Index every layout by layer, visibility, transparency, element, image and text, kept up to date as
+        layouts are created, updated or reloaded. See layout_index for the queries
+        Ex:
+            index = lm.build_layout_index()
+            index.query(layout_index.visible("Roads", False) & layout_index.element("Legend"))
+        :rtype: layout_index.LayoutIndex
+        """
+        page_size = (self._mxd.pageSize.width, self._mxd.pageSize.height)
+        index = layout_index.LayoutIndex.from_records(
+            (self._layouts.record(layout_name) for layout_name in self._layouts), page_size
+        )
+        self.add_layout_listener(index)
+        return index
+
+    def validate_layouts(self, layouts=None):
+        """
+        Compare stored layouts with the elements and layers of the map document
+        With a current document inventory the document isn't listed, the elements and layers come from the inventory
+        :param layouts: layout names to check (default: every layout)
+        :type layouts: list
+        :return: layout name to inventory.LayoutValidation
+        :rtype: dict
+        """
+        if self._inventory is not None and self._inventory_names and self._inventory.is_complete():
+            elements = self._inventory.elements
+            layers = self._inventory.layers
+        else:
+            elements = [handle[1:] for handle in self._current_element_handles()]
+            layers = [handle[1] for handle in self._current_layer_handles()]
+        if layouts is None:
+            layouts = self._get_layouts()
+        return dict(
+            (layout_name, inventory.validate_layout(self._layouts.record(layout_name), elements, layers))
+            for layout_name in layouts
+        )
+
+    def build_extent_index(self):
+        """
+        Index the data frame extents of every layout, kept up to date as layouts are created, updated or reloaded.
+        See spatial_index for the queries
+        Ex:
+            index = lm.build_extent_index()
+            index.layouts_at(512300.0, 4821000.0)
+        :rtype: spatial_index.ExtentIndex
+        """
+        index = spatial_index.ExtentIndex.from_records(
+            self._layouts.record(layout_name) for layout_name in self._layouts
+        )
+        self.add_layout_listener(index)
+        return index
+
+    def geometry_view(self, layouts=None, element_types=None):
+        """
+        Columnar view of element positions, sizes and data frame extents for bulk changes, needs numpy.
+        See geometry.GeometryView, changes are stored with apply_geometry
+        Ex:
+            view = lm.geometry_view()
+            view.scale(11 / 8.5)
+            lm.apply_geometry(view)
+        :param layouts: layout names to include (default: every layout)
+        :type layouts: list
+        :param element_types: element types to include (default: every type)
+        :type element_types: list
+        :rtype: geometry.GeometryView
+        """
+        return geometry.GeometryView(self._layouts, layouts, element_types)
+
+    def apply_geometry(self, view):
+        """
+        Store the layouts changed in a geometry view, the active layout is switched to again if it changed
+        With auto save on, changes made to the map document are stored into the active layout first
+        :type view: geometry.GeometryView
+        :return: names of the changed layouts
+        :rtype: list
+        """
+        if self._auto_saving() and self.active_layout in view.changed_layouts():
+            self._store_document_changes()
+        updated = view.updated_layouts(self._layouts)
+        for layout_name in updated:
+            self._layouts[layout_name] = updated[layout_name]
+            self._unsaved_layouts.add(layout_name)
+        self._notify_layout_listeners(list(updated))
+        self.log_or_print("Changed the geometry of {} layouts".format(len(updated)), logging.info)
+
+        if self.active_layout in updated:
+            self._reapply_active_layout()
+        if self._auto_saving() and updated:
+            self._save_changes()
+        return list(updated)
+
+    def plan_layout_order(self, layouts=None, start=None):
+        """
+        Order layouts so consecutive switches change as few properties as possible
+        Ex:
+            for item in lm.plan_layout_order():
+                lm.switch_layout(item)
+        :param layouts: layout names to order (default: every layout)
+        :type layouts: list
+        :param start: layout to start from (default: the active layout)
+        :return: layout names in switch order
+        :rtype: list
+        """
+        if layouts is None:
+            layouts = self._get_layouts()
+        if start is None:
+            start = self.active_layout
+        records = ((layout_name, self._layouts.record(layout_name)) for layout_name in layouts)
+        order, total_cost = planning.plan_switch_order(records, start)
+        self.log_or_print("Planned {} layouts with {} property changes".format(len(order), total_cost), logging.info)
+        return order
+
+    def export_layouts(self, output_template, layouts=None, workers=None, export_format="JPEG", retries=1,
+                       export_options=None):
+        """
+        Export layouts in parallel worker processes, each opening the map document from disk
+        Unsaved layouts are saved first, see export.export_layouts for the parameters
+        Without a list of layouts every layout is exported, in the order from plan_layout_order
+        Ex:
+            results = lm.export_layouts(r"C:\\maps\\{layout}.jpg", workers=4)
+        :return: one result per layout
+        :rtype: list of export.ExportResult
+        """
+        if self._unsaved_layouts:
+            self.save_layout_json()
+        # workers read the storage from disk
+        self.flush()
+        if layouts is None:
+            layouts = self.plan_layout_order()
+        return export.export_layouts(self._mxd.filePath, output_template, layouts, workers, export_format, retries,
+                                     self._storage, export_options)
+
+    def has_unsaved_changes(self):
+        return bool(self._unsaved_layouts) or (self._writer is not None and self._writer.busy())
+
+    def close(self, save=True):
+        """
+        Save unsaved layouts and release the map document, the manager can't be used afterwards
+        :param save: save layouts changed since the last save, ignored when read only (default: True)
+        :type save: bool
+        """
+        try:
+            if save and self._is_active and not self._read_only and self._unsaved_layouts:
+                self.save_layout_json()
+        finally:
+            self.stop_background_save()
+        self._is_active = False
+        self._mxd = None
 
     def _get_layouts(self):
-        layout_list = []
-        for item in self._layouts:
-            layout_list.append(self._layouts[item].get('layout_name', ""))
-        return  layout_list
+        return list(self._layouts)
 
     def list_layouts(self):
         layout_list = self._get_layouts()
-        outstr = "\n".join(layout_list)
+        outstr = "\n".join(str(layout) for layout in layout_list)
         self.log_or_print(outstr, logging.info)
         return layout_list
 
@@ -0,0 +1,180 @@
+from __future__ import print_function
+from __future__ import division
+
+"""
+Compiled apply plans for switch_layout
+A plan binds a stored layout once to the element and layer handles of the open map document, giving flat lists of
+property writes. Switching to the layout again replays the lists, without looking up each live element in the
+layout or reading its type and name.
+Plans are only valid for the handles they were compiled against and for the same layout object, layouts are
+replaced rather than changed when updated, so a changed layout never matches an old plan.
+With a toc_tree.TocTree the plan also holds the state and subtree signature of each layer, replay_toc_tree then
+only visits the subtrees that differ from the plan applied before it.
+"""
+
+EXTENT_FIELDS = ("XMin", "XMax", "YMin", "YMax")
+
+
+class ApplyPlan(object):
+    """
+    element_operations - (handle, element_type, item_key, property, value) for every element of the layout
+    missing_elements - (handle, element_type, name) of document elements not in the layout
+    toc_operations - (handle, long_name, property, value) for every layer of the layout
+    missing_layers - long names of document layers not in the layout
+    toc_states - (property, value) writes of each layer of the toc tree, None for layers not in the layout
+    toc_signatures - signature of each subtree of the toc tree
+    """
+
+    def __init__(self, layout, element_handles, layer_handles, toc_tree=None):
+        self.layout = layout
+        self.element_handles = element_handles
+        self.layer_handles = layer_handles
+        self.element_operations = []
+        self.missing_elements = []
+        self.applied_elements = {}
+        self.toc_operations = []
+        self.missing_layers = []
+        self.applied_toc = {}
+        self.toc_tree = toc_tree
+        self.toc_states = None
+        self.toc_signatures = None
+
+
+def compile_plan(layout, element_handles, layer_handles, toc_tree=None):
+    """
+    Bind a layout to the handles of the open document
+    :param layout: layout with layout_items and toc_items
+    :type layout: dict
+    :param element_handles: (arcpy element, element type, name) of every layout element in the document,
+    None to leave out the elements
+    :type element_handles: list
+    :param layer_handles: (arcpy layer, long name) of every layer in the document, None to leave out the layers
+    :type layer_handles: list
+    :param toc_tree: tree of the layer handles, to skip unchanged subtrees when replaying
+    :type toc_tree: toc_tree.TocTree
+    :rtype: ApplyPlan
+    """
+    plan = ApplyPlan(layout, element_handles, layer_handles, toc_tree)
+    layout_items = layout.get('layout_items', {})
+    for handle, element_type, name in element_handles or ():
+        item_key = (element_type, name)
+        layout_element = layout_items.get(element_type, {}).get(name)
+        if layout_element is None:
+            plan.missing_elements.append((handle, element_type, name))
+            continue
+        plan.applied_elements[item_key] = layout_element
+        for prop, value in layout_element.setter_operations():
+            plan.element_operations.append((handle, element_type, item_key, prop, value))
+
+    toc_items = layout.get('toc_items', {})
+    toc_states = []
+    for handle, long_name in layer_handles or ():
+        toc_item = toc_items.get(long_name)
+        if toc_item is None:
+            plan.missing_layers.append(long_name)
+            toc_states.append(None)
+            continue
+        plan.applied_toc[toc_item.long_name] = toc_item
+        operations = toc_item.setter_operations()
+        toc_states.append(tuple(operations))
+        for prop, value in operations:
+            plan.toc_operations.append((handle, toc_item.long_name, prop, value))
+
+    if toc_tree is not None:
+        plan.toc_states = toc_states
+        plan.toc_signatures = toc_tree.signatures(toc_states)
+    return plan
+
+
+def _unchanged(previous, prop, value):
+    if prop == "extent":
+        return tuple(getattr(previous, field) for field in EXTENT_FIELDS) == value
+    return getattr(previous, prop) == value
+
+
+def replay_elements(plan, applied_elements=None, stats=None):
+    """
+    Write the element properties of a plan
+    :param applied_elements: item key to the element last applied, only properties that differ are written if given
+    :type applied_elements: dict
+    :return: number of properties written
+    :rtype: int
+    """
+    written = 0
+    for handle, element_type, item_key, prop, value in plan.element_operations:
+        if applied_elements is not None:
+            previous = applied_elements.get(item_key)
+            if previous is not None and type(previous) is type(plan.applied_elements[item_key]) \
+                    and _unchanged(previous, prop, value):
+                continue
+        if prop == "extent":
+            df_extent = handle.extent
+            df_extent.XMin, df_extent.XMax, df_extent.YMin, df_extent.YMax = value
+            handle.extent = df_extent
+            count = len(EXTENT_FIELDS)
+        else:
+            setattr(handle, prop, value)
+            count = 1
+        written += count
+        if stats is not None:
+            stats.count_writes(element_type, count)
+    return written
+
+
+def replay_toc(plan, applied_toc=None, stats=None):
+    """
+    Write the table of contents properties of a plan
+    :param applied_toc: long name to the item last applied, only properties that differ are written if given
+    :type applied_toc: dict
+    :return: number of properties written
+    :rtype: int
+    """
+    written = 0
+    for handle, long_name, prop, value in plan.toc_operations:
+        if applied_toc is not None:
+            previous = applied_toc.get(long_name)
+            if previous is not None and getattr(previous, prop) == value:
+                continue
+        setattr(handle, prop, value)
+        written += 1
+        if stats is not None:
+            stats.count_writes("LAYER")
+    return written
+
+
+def replay_toc_tree(plan, previous_plan, stats=None):
+    """
+    Write the table of contents properties of a plan that differ from a plan applied before it, compiled against
+    the same toc tree and with every layer in its layout. Subtrees with the same signature in both are skipped.
+    :type previous_plan: ApplyPlan
+    :return: number of properties written
+    :rtype: int
+    """
+    tree = plan.toc_tree
+    states = plan.toc_states
+    signatures = plan.toc_signatures
+    previous_states = previous_plan.toc_states
+    previous_signatures = previous_plan.toc_signatures
+    subtree_end = tree.subtree_end
+    skippable = tree.skippable
+
+    written = 0
+    index = 0
+    layer_count = len(tree)
+    while index < layer_count:
+        if signatures[index] == previous_signatures[index] and skippable[index]:
+            index = subtree_end[index]
+            continue
+        state = states[index]
+        previous_state = previous_states[index]
+        if state is not None and state != previous_state:
+            handle = tree.handles[index][0]
+            for operation in state:
+                if operation in previous_state:
+                    continue
+                setattr(handle, operation[0], operation[1])
+                written += 1
+                if stats is not None:
+                    stats.count_writes("LAYER")
+        index += 1
+    return written
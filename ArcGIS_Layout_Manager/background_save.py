@@ -0,0 +1,149 @@
+from __future__ import print_function
+from __future__ import division
+
+import logging
+import threading
+import time
+
+"""
+Background writer for the layout storage
+save_layout_json hands a snapshot of the layouts to the writer thread and returns. Saves arriving while a save is
+waiting are coalesced into one write of the latest snapshot, covering the changed layouts of all of them.
+The writer waits delay seconds after the first save of a burst before writing.
+The check and the write run holding the writer's lock, the manager holds the same lock while it reads or records
+the state of the storage.
+Layouts are replaced rather than changed in place, so a snapshot is a shallow copy of the layout collection.
+"""
+
+_clock = getattr(time, "monotonic", time.time)
+
+
+class StorageChanged(Exception):
+    """
+    The storage was changed by another process before a background write, the write was skipped
+    """
+    pass
+
+
+class BackgroundWriter(object):
+    def __init__(self, write, check=None, delay=0.5, lock=None):
+        """
+        :param write: function called as write(layouts, changed_layouts, settings, format_version) on the writer thread
+        :param check: function called before each write, returning False when the write must be skipped
+        :param delay: seconds to wait for more saves before writing
+        :type delay: float
+        :param lock: lock held during the check and write (default: a new lock)
+        """
+        self.delay = delay
+        self.lock = threading.RLock() if lock is None else lock
+        self.writes = 0
+        self.submits = 0
+        self._write = write
+        self._check = check
+        self._condition = threading.Condition()
+        self._pending = None
+        self._writing = False
+        self._flushing = False
+        self._closed = False
+        self._failed_layouts = set()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="layout-save-writer")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, layouts, changed_layouts, settings, format_version, force=False):
+        """
+        Queue a save, merged with a save still waiting to be written
+        :param layouts: snapshot of the layouts
+        :type layouts: layout_storage.LayoutCollection
+        :param changed_layouts: names of the layouts changed since the last save
+        :type changed_layouts: set
+        :param force: write without the check
+        """
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Background writer is closed")
+            self.submits += 1
+            if self._pending is None:
+                self._pending = {'changed_layouts': set(), 'force': False}
+            self._pending['layouts'] = layouts
+            self._pending['changed_layouts'].update(changed_layouts)
+            self._pending['settings'] = settings
+            self._pending['format_version'] = format_version
+            self._pending['force'] = self._pending['force'] or force
+            self._condition.notify_all()
+
+    def busy(self):
+        with self._condition:
+            return self._pending is not None or self._writing
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None and not self._closed:
+                    self._condition.wait()
+                if self._pending is None:
+                    return
+                if self.delay:
+                    # let a burst of saves collect into the pending save, each submit wakes the wait so it's
+                    # repeated until the delay has passed
+                    deadline = _clock() + self.delay
+                    while not self._flushing and not self._closed:
+                        remaining = deadline - _clock()
+                        if remaining <= 0:
+                            break
+                        self._condition.wait(remaining)
+                job = self._pending
+                self._pending = None
+                self._writing = True
+
+            try:
+                with self.lock:
+                    if not job['force'] and self._check is not None and not self._check():
+                        raise StorageChanged()
+                    self._write(job['layouts'], job['changed_layouts'], job['settings'], job['format_version'])
+                self.writes += 1
+            except Exception as e:
+                if not isinstance(e, StorageChanged):
+                    logging.error("Background layout save failed: {}".format(str(e)))
+                with self._condition:
+                    self._failed_layouts.update(job['changed_layouts'])
+                    self._error = e
+            finally:
+                with self._condition:
+                    self._writing = False
+                    self._condition.notify_all()
+
+    def flush(self):
+        """
+        Write any waiting save now and wait until the writer is idle
+        """
+        with self._condition:
+            self._flushing = True
+            self._condition.notify_all()
+            try:
+                while self._pending is not None or self._writing:
+                    self._condition.wait()
+            finally:
+                self._flushing = False
+
+    def take_failure(self):
+        """
+        Layouts of the saves that failed since the last call and the last error
+        :rtype: (set, Exception)
+        """
+        with self._condition:
+            failed_layouts, error = self._failed_layouts, self._error
+            self._failed_layouts = set()
+            self._error = None
+        return failed_layouts, error
+
+    def close(self):
+        """
+        Flush and stop the writer thread
+        """
+        self.flush()
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
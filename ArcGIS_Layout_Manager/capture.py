@@ -0,0 +1,200 @@
+from __future__ import print_function
+from __future__ import division
+
+import fnmatch
+
+from . import layout_elements, table_of_contents_elements
+from .interning import intern_string
+
+"""
+Scoped capture of a map document for update_layout and create_layout
+A scope limits the capture to element types, an element name pattern, a table of contents subtree and/or groups of
+properties. Only the properties in scope are read from arcpy, the rest of the layout is kept from the stored layout.
+Property groups:
+    position - elementPositionX, elementPositionY
+    size - elementWidth, elementHeight
+    extent - data frame XMin, XMax, YMin, YMax
+    title - legend title
+    source - picture sourceImage
+    text - text, angle and fontSize of text elements
+    visibility - layer visible
+    transparency - layer transparency
+"""
+
+PROPERTY_GROUPS = {
+    "position": ("elementPositionX", "elementPositionY"),
+    "size": ("elementWidth", "elementHeight"),
+    "extent": layout_elements.DataFrameElement._extent_properties,
+    "title": ("title",),
+    "source": ("sourceImage",),
+    "text": layout_elements.TextElement._text_properties,
+    "visibility": ("visible",),
+    "transparency": ("transparency",),
+}
+
+ELEMENT_GROUPS = ("position", "size", "extent", "title", "source", "text")
+TOC_GROUPS = ("visibility", "transparency")
+
+
+class CaptureScope(object):
+    """
+    Part of the map document to capture
+    Giving only element options captures no layers and giving only layer options captures no elements,
+    a scope without options is the whole document
+    """
+
+    def __init__(self, element_types=None, name_pattern=None, toc_root=None, properties=None):
+        """
+        :param element_types: element types to capture, Ex: ["DATAFRAME_ELEMENT"]
+        :type element_types: list
+        :param name_pattern: fnmatch pattern of the element names to capture, Ex: "Inset*"
+        :type name_pattern: str
+        :param toc_root: long name of the group layer whose layers are captured, Ex: "Basemap"
+        :type toc_root: str
+        :param properties: property groups to capture, Ex: ["extent"] or ["visibility"]
+        :type properties: list
+        """
+        properties = list(properties or [])
+        unknown = [group for group in properties if group not in PROPERTY_GROUPS]
+        if unknown:
+            raise ValueError("Unknown property groups {}, use {}".format(unknown, sorted(PROPERTY_GROUPS)))
+
+        self.element_types = tuple(element_types) if element_types else None
+        self.name_pattern = name_pattern
+        self.toc_root = toc_root
+
+        element_groups = [group for group in properties if group in ELEMENT_GROUPS]
+        toc_groups = [group for group in properties if group in TOC_GROUPS]
+        element_scoped = bool(self.element_types or name_pattern or element_groups)
+        toc_scoped = bool(toc_root is not None or toc_groups)
+        self.capture_elements = element_scoped or not toc_scoped
+        self.capture_toc = toc_scoped or not element_scoped
+
+        # None reads every property
+        self.element_properties = _group_fields(element_groups)
+        self.toc_properties = _group_fields(toc_groups)
+
+    def is_full(self):
+        return self.capture_elements and self.capture_toc and self.element_types is None \
+            and self.name_pattern is None and self.toc_root is None \
+            and self.element_properties is None and self.toc_properties is None
+
+    def includes_element(self, name):
+        return self.name_pattern is None or fnmatch.fnmatchcase(name or "", self.name_pattern)
+
+    def includes_layer(self, long_name):
+        if self.toc_root is None:
+            return True
+        if long_name is None:
+            return False
+        return long_name == self.toc_root or long_name.startswith(self.toc_root + "\\")
+
+
+class UniqueNames(object):
+    """
+    Names of the elements captured so far, unnamed elements and elements repeating a name get the first free
+    <element type>_LAYOUT_<n> name
+    Each element type keeps its last number, numbers below it are all taken, so naming stays linear in the
+    number of elements
+    """
+
+    def __init__(self):
+        self._names = set()
+        self._counters = {}
+        self.renamed = 0
+
+    def claim(self, name, element_type):
+        """
+        :return: the name if it's unique, otherwise a new unique name
+        :rtype: str
+        """
+        if name and name not in self._names:
+            self._names.add(name)
+            return name
+
+        counter = self._counters.get(element_type, 0)
+        while True:
+            counter += 1
+            new_name = "{}_LAYOUT_{}".format(element_type, counter)
+            if new_name not in self._names:
+                break
+        self._counters[element_type] = counter
+        self._names.add(new_name)
+        self.renamed += 1
+        return intern_string(new_name)
+
+
+def _group_fields(groups):
+    if not groups:
+        return None
+    fields = set()
+    for group in groups:
+        fields.update(PROPERTY_GROUPS[group])
+    return fields
+
+
+def read_element(arcpy_element, element_type, stored, properties):
+    """
+    Capture an element, reading only the properties in scope when the element is already stored
+    :param arcpy_element: arcpy layout element
+    :param stored: stored element of the same name, None to capture the whole element
+    :type stored: layout_elements.BaseElement
+    :param properties: property names to read, None for every property
+    :type properties: set
+    :return: new element and number of properties read
+    :rtype: (layout_elements.BaseElement, int)
+    """
+    element_class = layout_elements.layout_object_mapper[element_type]
+    if stored is None or properties is None or type(stored) is not element_class:
+        element = element_class(arcpy_element)
+        return element, len(element._properties)
+
+    values = {}
+    extent = None
+    for prop in stored._properties:
+        if prop not in properties:
+            continue
+        if prop in layout_elements.DataFrameElement._extent_properties:
+            if extent is None:
+                extent = arcpy_element.extent
+            values[prop] = getattr(extent, prop)
+        else:
+            values[prop] = getattr(arcpy_element, prop)
+    return stored.with_properties(values), len(values)
+
+
+def read_layer(arcpy_layer, stored, properties):
+    """
+    Capture a table of contents item, reading only the properties in scope when the item is already stored
+    :return: new item and number of properties read
+    :rtype: (table_of_contents_elements.TableOfContentsItem, int)
+    """
+    if stored is None or properties is None:
+        return table_of_contents_elements.TableOfContentsItem(arcpy_layer), 5
+
+    values = {}
+    for prop in properties:
+        if arcpy_layer.supports(prop.upper()):
+            values[prop] = getattr(arcpy_layer, prop)
+        else:
+            values[prop] = None
+    return stored.with_properties(values), len(values)
+
+
+def known_state(applied, captured, properties):
+    """
+    State of a map document item known after capturing it, for the items diff_switch takes as applied
+    Properties outside the scope come from the stored layout rather than the map document, so only the properties
+    read are taken, on top of the item last applied
+    :param applied: item last applied to (or captured from) the map, None if unknown
+    :param captured: item from read_element or read_layer
+    :param properties: property names read, None when every property was read
+    :type properties: set
+    :return: the item as it is in the map document, None if that isn't known
+    """
+    if properties is None:
+        return captured
+    if applied is None or type(applied) is not type(captured):
+        return None
+    return applied.with_properties(dict((prop, getattr(captured, prop)) for prop in properties
+                                        if hasattr(captured, prop)))
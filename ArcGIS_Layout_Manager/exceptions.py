@@ -8,3 +8,14 @@ class LayoutExists(Exception):
 
 class MissingLayout(Exception):
     pass
+
+
+class LayoutConflict(Exception):
+    """
+    Layouts changed in this manager were also changed in the layout storage by another process
+    """
+    def __init__(self, layout_names):
+        self.layout_names = list(layout_names)
+        super(LayoutConflict, self).__init__(
+            "Layouts changed by another process: {}".format(", ".join(str(name) for name in self.layout_names))
+        )
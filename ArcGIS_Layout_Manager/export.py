@@ -0,0 +1,166 @@
+from __future__ import print_function
+from __future__ import division
+
+import collections
+import logging
+import os
+import traceback
+
+from . import layout_storage, lazy_import, planning, storage_backends
+
+# workers import arcview before arcpy like the LayoutManager, so the license level is the same in every process
+arcpy = lazy_import.LazyModule("arcpy", requires=("arcview",))
+
+"""
+Parallel export of the layouts of a map document
+The layout list is split into one contiguous chunk per worker process. Each worker opens its own MapDocument
+and a read only LayoutManager on the same layout storage, then switches to and exports each layout of its chunk
+with diff_switch on.
+Layouts that fail are retried in a new round across the pool.
+
+When run from a script on Windows the calling code must be guarded by if __name__ == "__main__":
+and python (not ArcMap) must be the running executable, so it can't be used from the ArcMap python window.
+Changes are exported as saved, save the map document and layouts before exporting. Workers reload layouts
+changed in the layout storage while the export runs before switching to them.
+"""
+
+ExportResult = collections.namedtuple("ExportResult", ["layout_name", "path", "success", "error", "attempts"])
+
+
+def export_layouts(mxd_path, output_template, layouts=None, workers=None, export_format="JPEG", retries=1,
+                   storage="json", export_options=None, plan_order=True):
+    """
+    Export layouts of a map document using a pool of processes
+    :param mxd_path: path to the map document
+    :type mxd_path: str
+    :param output_template: output path, formatted with the layout name Ex: r"C:\\maps\\{layout}.jpg"
+    :type output_template: str
+    :param layouts: layout names in export order (default: every stored layout)
+    :type layouts: list
+    :param plan_order: when exporting every stored layout, order them with planning.plan_switch_order so each
+    worker's chunk changes as few properties as possible between exports (default: True)
+    :type plan_order: bool
+    :param workers: number of worker processes (default: cpu count), 1 exports in this process
+    :type workers: int
+    :param export_format: arcpy.mapping export function suffix, JPEG, PNG, PDF, ...
+    :type export_format: str
+    :param retries: times a failed layout is retried
+    :type retries: int
+    :param storage: layout storage, "json", "sqlite" or a storage_backends.LayoutStorage
+    :param export_options: keyword arguments passed to the export function
+    :type export_options: dict
+    :return: one result per layout, in the order of layouts
+    :rtype: list of ExportResult
+    """
+    # imported here, multiprocessing is slow to import for callers that never export
+    import multiprocessing
+
+    if layouts is None:
+        layouts = _stored_layouts(storage_backends.storage_for_document(mxd_path, storage), plan_order)
+    layouts = list(layouts)
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    workers = max(1, min(workers, len(layouts)))
+
+    results = {}
+    attempts = collections.Counter()
+    pending = layouts
+    for attempt in range(retries + 1):
+        if not pending:
+            break
+        for layout_name in pending:
+            attempts[layout_name] += 1
+        jobs = [(mxd_path, chunk, output_template, export_format, storage, export_options)
+                for chunk in _split(pending, workers)]
+        if workers == 1:
+            chunk_results = [_export_chunk(job) for job in jobs]
+        else:
+            pool = multiprocessing.Pool(workers)
+            try:
+                chunk_results = pool.map(_export_chunk, jobs)
+            finally:
+                pool.close()
+                pool.join()
+
+        for chunk in chunk_results:
+            for layout_name, path, success, error in chunk:
+                results[layout_name] = ExportResult(layout_name, path, success, error, attempts[layout_name])
+        pending = [layout_name for layout_name in pending if not results[layout_name].success]
+        if pending:
+            logging.warning("{} layouts failed to export on attempt {}".format(len(pending), attempt + 1))
+
+    return [results[layout_name] for layout_name in layouts]
+
+
+def _stored_layouts(storage, plan_order):
+    if not plan_order:
+        return storage.list_layouts()
+    index = storage.read_index()[0]
+    collection = layout_storage.LayoutCollection(index, storage.read_record)
+    # records are read one at a time, the planner only keeps the state of each item
+    return planning.plan_switch_order((layout_name, collection.record(layout_name)) for layout_name in collection)[0]
+
+
+def _split(items, count):
+    """
+    Split items into count contiguous chunks of near equal size
+    """
+    chunk_size, remainder = divmod(len(items), count)
+    chunks = []
+    start = 0
+    for index in range(count):
+        end = start + chunk_size + (1 if index < remainder else 0)
+        if end > start:
+            chunks.append(items[start:end])
+        start = end
+    return chunks
+
+
+def _export_chunk(job):
+    """
+    Worker, export a chunk of layouts from its own map document
+    :return: (layout name, path, success, error) for each layout
+    """
+    mxd_path, layout_names, output_template, export_format, storage, export_options = job
+    from .LayoutManager import LayoutManager
+
+    results = []
+    try:
+        mxd = arcpy.mapping.MapDocument(mxd_path)
+        lm = LayoutManager(mxd=mxd, storage=storage, apply_first_layout=False, read_only=True,
+                           inventory=True)
+        # nothing else edits the worker's document, so each switch only writes what differs from the last layout,
+        # which is what the planned order keeps small
+        lm.diff_switch = True
+        export_function = getattr(arcpy.mapping, "ExportTo{}".format(export_format))
+    except Exception:
+        error = traceback.format_exc()
+        return [(layout_name, None, False, error) for layout_name in layout_names]
+
+    for layout_name in layout_names:
+        path = output_template.format(layout=layout_name)
+        try:
+            lm.reload(apply=False)
+            if layout_name not in lm._layouts:
+                raise KeyError("Layout \"{}\" doesnt exists".format(layout_name))
+            # a read only manager raises switch errors, the result covers anything logged instead
+            if not lm.switch_layout(layout_name):
+                raise RuntimeError("Could not switch to layout \"{}\"".format(layout_name))
+            _make_folder(os.path.dirname(path))
+            export_function(mxd, path, **(export_options or {}))
+            results.append((layout_name, path, True, None))
+        except Exception:
+            results.append((layout_name, path, False, traceback.format_exc()))
+    del mxd
+    return results
+
+
+def _make_folder(folder):
+    # workers may race to create the same folder
+    if not folder or os.path.isdir(folder):
+        return
+    try:
+        os.makedirs(folder)
+    except OSError:
+        if not os.path.isdir(folder):
+            raise
@@ -0,0 +1,261 @@
+from __future__ import print_function
+from __future__ import division
+
+from . import layout_elements, lazy_import
+
+# numpy is optional, only needed once a geometry view is built
+numpy = lazy_import.LazyModule("numpy")
+
+"""
+Columnar geometry of layout elements across many layouts, backed by numpy arrays
+One row per element, with the element position, size and for data frames the extent as float columns (nan where a
+property isn't set). Transforms change the columns for every row (or the rows of a mask) at once, the changed rows are
+then written back as new element objects, elements are shared between layouts so are never changed in place.
+Ex:
+    view = lm.geometry_view()
+    view.scale(11 / 8.5, origin=(0, 0))
+    view.translate(0.25, 0, view.mask(element_types=["TEXT_ELEMENT"]))
+    print(view.rows(view.off_page(page_size=(11, 8.5))))
+    lm.apply_geometry(view)
+"""
+
+POSITION_FIELDS = ("elementPositionX", "elementPositionY", "elementWidth", "elementHeight")
+EXTENT_FIELDS = layout_elements.DataFrameElement._extent_properties
+
+# view column of each element property
+COLUMNS = {
+    "elementPositionX": "x",
+    "elementPositionY": "y",
+    "elementWidth": "width",
+    "elementHeight": "height",
+    "XMin": "xmin",
+    "XMax": "xmax",
+    "YMin": "ymin",
+    "YMax": "ymax",
+}
+
+
+class GeometryView(object):
+    """
+    Columns:
+    layout_names, element_types, names - object arrays naming the element of each row
+    x, y, width, height - element position and size in page units
+    xmin, xmax, ymin, ymax - data frame extent in map units, nan for other elements
+    """
+
+    def __init__(self, layouts, layout_names=None, element_types=None):
+        """
+        :param layouts: layouts by name, a dictionary or layout_storage.LayoutCollection
+        :param layout_names: layouts to include (default: every layout)
+        :type layout_names: list
+        :param element_types: element types to include (default: every type)
+        :type element_types: list
+        """
+        if layout_names is None:
+            layout_names = list(layouts)
+        self._elements = []
+        row_layouts = []
+        row_types = []
+        row_names = []
+        values = dict((column, []) for column in COLUMNS.values())
+
+        for layout_name in layout_names:
+            layout_items = layouts[layout_name].get('layout_items', {})
+            for element_type in layout_items:
+                if element_types is not None and element_type not in element_types:
+                    continue
+                for name, element in layout_items[element_type].items():
+                    self._elements.append(element)
+                    row_layouts.append(layout_name)
+                    row_types.append(element_type)
+                    row_names.append(name)
+                    for prop, column in COLUMNS.items():
+                        values[column].append(getattr(element, prop, None))
+
+        self.layout_names = _object_array(row_layouts)
+        self.element_types = _object_array(row_types)
+        self.names = _object_array(row_names)
+        # None becomes nan in a float array
+        for column in values:
+            setattr(self, column, numpy.array(values[column], dtype=float))
+        self._original = dict((column, getattr(self, column).copy()) for column in values)
+
+    def __len__(self):
+        return len(self._elements)
+
+    def mask(self, element_types=None, name=None, layout_names=None):
+        """
+        Rows of some element types, element name and/or layouts
+        :rtype: numpy.ndarray
+        """
+        selected = numpy.ones(len(self), dtype=bool)
+        if element_types is not None:
+            selected &= _isin(self.element_types, list(element_types))
+        if name is not None:
+            selected &= self.names == name
+        if layout_names is not None:
+            selected &= _isin(self.layout_names, list(layout_names))
+        return selected
+
+    def rows(self, mask):
+        """
+        (layout name, element type, element name) of the rows of a mask
+        :rtype: list
+        """
+        return [(self.layout_names[row], self.element_types[row], self.names[row])
+                for row in numpy.flatnonzero(mask)]
+
+    def translate(self, dx, dy, mask=None):
+        """
+        Move elements on the page
+        """
+        rows = _rows(mask)
+        self.x[rows] += dx
+        self.y[rows] += dy
+
+    def scale(self, sx, sy=None, origin=(0, 0), mask=None):
+        """
+        Scale element positions about an origin and element sizes, Ex: to reflow onto a larger page
+        """
+        sy = sx if sy is None else sy
+        rows = _rows(mask)
+        self.x[rows] = origin[0] + (self.x[rows] - origin[0]) * sx
+        self.y[rows] = origin[1] + (self.y[rows] - origin[1]) * sy
+        self.width[rows] *= sx
+        self.height[rows] *= sy
+
+    def offset_extents(self, dx, dy, mask=None):
+        """
+        Pan data frame extents in map units
+        """
+        rows = _rows(mask)
+        self.xmin[rows] += dx
+        self.xmax[rows] += dx
+        self.ymin[rows] += dy
+        self.ymax[rows] += dy
+
+    def scale_extents(self, factor, mask=None):
+        """
+        Zoom data frame extents about their centres, a factor above 1 zooms out
+        """
+        rows = _rows(mask)
+        centre_x = (self.xmin[rows] + self.xmax[rows]) / 2
+        centre_y = (self.ymin[rows] + self.ymax[rows]) / 2
+        half_width = (self.xmax[rows] - self.xmin[rows]) * factor / 2
+        half_height = (self.ymax[rows] - self.ymin[rows]) * factor / 2
+        self.xmin[rows] = centre_x - half_width
+        self.xmax[rows] = centre_x + half_width
+        self.ymin[rows] = centre_y - half_height
+        self.ymax[rows] = centre_y + half_height
+
+    def off_page(self, page_size, partly=False):
+        """
+        Rows of elements lying wholly (or with partly, at least partly) outside the page
+        :param page_size: (width, height) of the page, Ex: (mxd.pageSize.width, mxd.pageSize.height)
+        :type page_size: tuple
+        :rtype: numpy.ndarray
+        """
+        page_width, page_height = page_size
+        right = self.x + self.width
+        top = self.y + self.height
+        with numpy.errstate(invalid="ignore"):
+            if partly:
+                outside = (self.x < 0) | (self.y < 0) | (right > page_width) | (top > page_height)
+            else:
+                outside = (self.x >= page_width) | (self.y >= page_height) | (right <= 0) | (top <= 0)
+        # nan compares false, so elements without a position or size are never off the page
+        return outside
+
+    def overlaps(self, mask=None):
+        """
+        Pairs of elements of the same layout whose page rectangles overlap
+        :return: (layout name, (element type, name), (element type, name)) for each overlapping pair
+        :rtype: list
+        """
+        rows = numpy.flatnonzero(numpy.ones(len(self), dtype=bool) if mask is None else mask)
+        pairs = []
+        if not len(rows):
+            return pairs
+        # rows of a layout are next to each other
+        layout_names = self.layout_names[rows]
+        starts = numpy.flatnonzero(numpy.r_[True, layout_names[1:] != layout_names[:-1]])
+        ends = numpy.r_[starts[1:], len(rows)]
+        for start, end in zip(starts, ends):
+            group = rows[start:end]
+            left = self.x[group]
+            bottom = self.y[group]
+            right = left + self.width[group]
+            top = bottom + self.height[group]
+            with numpy.errstate(invalid="ignore"):
+                overlap = (left[:, None] < right[None, :]) & (left[None, :] < right[:, None]) & \
+                          (bottom[:, None] < top[None, :]) & (bottom[None, :] < top[:, None])
+            first, second = numpy.nonzero(numpy.triu(overlap, 1))
+            layout_name = layout_names[start]
+            for i, j in zip(group[first], group[second]):
+                pairs.append((layout_name, (self.element_types[i], self.names[i]),
+                              (self.element_types[j], self.names[j])))
+        return pairs
+
+    def changed(self):
+        """
+        Rows whose geometry changed since the view was built
+        :rtype: numpy.ndarray
+        """
+        changed = numpy.zeros(len(self), dtype=bool)
+        for column, original in self._original.items():
+            current = getattr(self, column)
+            changed |= ~((current == original) | (numpy.isnan(current) & numpy.isnan(original)))
+        return changed
+
+    def changed_layouts(self):
+        """
+        Names of the layouts with a changed row
+        :rtype: set
+        """
+        return set(self.layout_names[self.changed()])
+
+    def updated_layouts(self, layouts):
+        """
+        New layouts holding new element objects for the changed rows, the layouts given aren't changed
+        :param layouts: layouts the view was built from
+        :return: layout name to new layout for every layout with a changed row
+        :rtype: dict
+        """
+        updated = {}
+        for row in numpy.flatnonzero(self.changed()):
+            layout_name = self.layout_names[row]
+            element_type = self.element_types[row]
+            new_layout = updated.get(layout_name)
+            if new_layout is None:
+                new_layout = dict(layouts[layout_name])
+                new_layout['layout_items'] = dict(new_layout['layout_items'])
+                updated[layout_name] = new_layout
+            layout_items = new_layout['layout_items']
+            if layout_items[element_type] is layouts[layout_name]['layout_items'][element_type]:
+                layout_items[element_type] = dict(layout_items[element_type])
+
+            # the layout may have been changed since the view was built
+            element = layout_items[element_type].get(self.names[row], self._elements[row])
+            values = {}
+            for prop, column in COLUMNS.items():
+                if prop in element._properties:
+                    value = getattr(self, column)[row]
+                    values[prop] = None if numpy.isnan(value) else float(value)
+            layout_items[element_type][self.names[row]] = element.with_properties(values)
+        return updated
+
+
+def _isin(values, test_values):
+    # isin is numpy 1.13+, ArcMap ships numpy 1.9 and numpy 2.4 dropped in1d
+    isin = getattr(numpy, "isin", None) or numpy.in1d
+    return isin(values, test_values)
+
+
+def _object_array(values):
+    array = numpy.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def _rows(mask):
+    return slice(None) if mask is None else mask
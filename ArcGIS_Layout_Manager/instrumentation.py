@@ -0,0 +1,118 @@
+from __future__ import print_function
+from __future__ import division
+
+import collections
+import time
+
+"""
+Opt in timing and arcpy property counters for the LayoutManager
+Phases timed by the manager:
+    capture - reading a new layout in create_layout/create_layouts
+    recapture - update_layout and the auto save recapture before a switch
+    save - save_layout_json
+    compile - building the apply plan of a layout in switch_layout
+    apply_elements - writing layout element properties in switch_layout
+    apply_toc - writing table of contents properties in switch_layout
+    refresh - arcpy.RefreshTOC/RefreshActiveView
+    switch - the whole of switch_layout, also totalled per layout
+"""
+
+_perf_counter = getattr(time, "perf_counter", time.time)
+
+
+class _Phase(object):
+    def __init__(self, stats, name, layout_name):
+        self._stats = stats
+        self._name = name
+        self._layout_name = layout_name
+        self._start = None
+
+    def __enter__(self):
+        self._start = _perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stats.add_time(self._name, _perf_counter() - self._start, self._layout_name)
+        return False
+
+
+class LayoutStats(object):
+    """
+    Phase timings, per layout switch times and property reads/writes per element type
+    Hooks are called as hook(phase_name, seconds, layout_name) each time a phase ends
+    """
+
+    def __init__(self, hooks=None):
+        self.hooks = list(hooks or [])
+        self.reset()
+
+    def reset(self):
+        self.phase_seconds = collections.defaultdict(float)
+        self.phase_counts = collections.Counter()
+        self.layout_seconds = collections.defaultdict(float)
+        self.reads = collections.Counter()
+        self.writes = collections.Counter()
+
+    def phase(self, name, layout_name=None):
+        """
+        Context manager timing a phase
+        :param name: phase name
+        :param layout_name: layout the phase worked on, if any
+        """
+        return _Phase(self, name, layout_name)
+
+    def add_time(self, name, seconds, layout_name=None):
+        self.phase_seconds[name] += seconds
+        self.phase_counts[name] += 1
+        if name == "switch" and layout_name is not None:
+            self.layout_seconds[layout_name] += seconds
+        for hook in self.hooks:
+            hook(name, seconds, layout_name)
+
+    def count_reads(self, element_type, count=1):
+        self.reads[element_type] += count
+
+    def count_writes(self, element_type, count=1):
+        self.writes[element_type] += count
+
+    def to_dictionary(self):
+        return {
+            'phase_seconds': dict(self.phase_seconds),
+            'phase_counts': dict(self.phase_counts),
+            'layout_seconds': dict(self.layout_seconds),
+            'reads': dict(self.reads),
+            'writes': dict(self.writes)
+        }
+
+
+class _NullPhase(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+class NullStats(object):
+    """
+    Stand in used while instrumentation is off, every call is a no-op
+    """
+    _null_phase = _NullPhase()
+
+    def phase(self, name, layout_name=None):
+        return self._null_phase
+
+    def add_time(self, name, seconds, layout_name=None):
+        pass
+
+    def count_reads(self, element_type, count=1):
+        pass
+
+    def count_writes(self, element_type, count=1):
+        pass
+
+    def reset(self):
+        pass
+
+    def to_dictionary(self):
+        return {}
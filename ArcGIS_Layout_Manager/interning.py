@@ -0,0 +1,31 @@
+from __future__ import print_function
+from __future__ import division
+
+import sys
+
+"""
+Interning of strings repeated across layouts, such as element names, picture paths and layer long names,
+so every layout holding the same value shares a single string object
+"""
+
+try:
+    _intern = sys.intern
+    _string_types = (str,)
+except AttributeError:
+    # python 2, intern only accepts byte strings and json gives unicode
+    _intern = intern
+    _string_types = (str, unicode)
+
+# strings intern can't take (python 2 unicode), kept for the life of the process
+_strings = {}
+
+
+def intern_string(value):
+    """
+    Shared copy of a string, other values are returned as they are
+    """
+    if type(value) is str:
+        return _intern(value)
+    if isinstance(value, _string_types):
+        return _strings.setdefault(value, value)
+    return value
@@ -0,0 +1,183 @@
+from __future__ import print_function
+from __future__ import division
+
+import collections
+import json
+import os
+
+from . import storage_backends, toc_tree
+
+"""
+Inventory of a map document, the type and name of every layout element and the long name of every layer in
+document order, cached in <mxd>_inventory.json next to the layout file
+Element names are those the layouts use, after unnamed elements and elements repeating a name were named, with the
+names as listed from the document kept beside them.
+The cache is keyed by the map document path, size and modified time. While those match, a LayoutManager takes the
+element and layer names from the cache instead of reading them from each arcpy object, and stored layouts can be
+checked against the document without listing it.
+A cache that doesn't match the document is kept as stale and brought up to date a section at a time as the manager
+lists the elements or the layers, a stale elements section whose listed names still match is kept without reading
+the element types again.
+"""
+
+INVENTORY_VERSION = 2
+
+
+class LayoutValidation(collections.namedtuple(
+        "LayoutValidation", ("missing_elements", "new_elements", "missing_layers", "new_layers"))):
+    """
+    Differences between a stored layout and the map document
+    missing_elements - (element type, name) of layout elements not in the document
+    new_elements - (element type, name) of document elements not in the layout, moved off screen when switching
+    missing_layers - long names of layout layers not in the document
+    new_layers - long names of document layers not in the layout
+    """
+    __slots__ = ()
+
+    def is_valid(self):
+        return not any(self)
+
+
+def inventory_path(mxd_path):
+    """
+    Ex: C:\\sample.mxd -> C:\\sample_inventory.json
+    """
+    mxd_name = os.path.basename(mxd_path).replace(".mxd", "")
+    return os.path.join(os.path.dirname(mxd_path), "{}_inventory.json".format(mxd_name))
+
+
+def document_fingerprint(mxd_path):
+    """
+    Path, size and modified time of the map document on disk
+    :rtype: dict
+    """
+    stat = os.stat(mxd_path)
+    return {
+        'mxd_path': os.path.normcase(os.path.abspath(mxd_path)),
+        'size': stat.st_size,
+        'mtime': stat.st_mtime
+    }
+
+
+class DocumentInventory(object):
+    """
+    elements - (element type, name) of every layout element in ListLayoutElements order, None until listed
+    listed_names - name of every layout element as listed from the document, before naming
+    layers - long name of every layer in ListLayers order, None until listed
+    stale - DocumentInventory cached for another version of the document, None if there's none
+    """
+
+    def __init__(self, path, fingerprint, elements=None, listed_names=None, layers=None, stale=None):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.elements = elements
+        self.listed_names = listed_names
+        self.layers = layers
+        self.stale = stale
+
+    @classmethod
+    def for_document(cls, mxd_path):
+        """
+        Cached inventory of a map document, empty if there's no cache or it's for another version of the document,
+        with the cache for another version as stale
+        :rtype: DocumentInventory
+        """
+        path = inventory_path(mxd_path)
+        fingerprint = document_fingerprint(mxd_path)
+        try:
+            with open(path, 'r') as fl:
+                data = json.loads(fl.read())
+        except (IOError, OSError, ValueError):
+            return cls(path, fingerprint)
+        if data.get('inventory_version') != INVENTORY_VERSION:
+            return cls(path, fingerprint)
+
+        elements = data.get('elements')
+        if elements is not None:
+            elements = [tuple(element) for element in elements]
+        cached = cls(path, data.get('fingerprint'), elements, data.get('listed_names'), data.get('layers'))
+        if cached.fingerprint != fingerprint:
+            return cls(path, fingerprint, stale=cached)
+        return cached
+
+    def is_complete(self):
+        return self.elements is not None and self.layers is not None
+
+    def group_layers(self):
+        """
+        Long names of the layers holding other layers, from the long name paths
+        :rtype: list
+        """
+        if self.layers is None:
+            return None
+        tree = toc_tree.TocTree([(None, long_name) for long_name in self.layers])
+        return [self.layers[index] for index in range(len(tree)) if tree.children[index]]
+
+    def element_types(self, listed_names):
+        """
+        Types of the elements of a document listing these names, from the elements section or the stale one when
+        its listed names are the same
+        :param listed_names: name of every layout element as listed from the document
+        :return: element types in listing order, None if neither section matches
+        :rtype: list
+        """
+        for inventory in (self, self.stale):
+            if inventory is not None and inventory.elements is not None and inventory.listed_names == listed_names:
+                return [element[0] for element in inventory.elements]
+        return None
+
+    def record_elements(self, elements, listed_names):
+        """
+        Store the elements as named by the manager and their names as listed from the document, ignored once the
+        section is known
+        :return: True if the inventory changed
+        """
+        if self.elements is not None:
+            return False
+        self.elements = [tuple(element) for element in elements]
+        self.listed_names = list(listed_names)
+        return True
+
+    def record_layers(self, layers):
+        if self.layers is not None:
+            return False
+        self.layers = list(layers)
+        return True
+
+    def save(self):
+        data = {
+            'inventory_version': INVENTORY_VERSION,
+            'fingerprint': self.fingerprint,
+            'elements': self.elements,
+            'listed_names': self.listed_names,
+            'layers': self.layers,
+            'group_layers': self.group_layers()
+        }
+        text = json.dumps(data, separators=(",", ":"))
+        storage_backends._write_atomic(self.path, lambda fl: fl.write(text.encode("utf-8")))
+
+
+def validate_layout(record, elements, layers):
+    """
+    Compare a stored layout with the elements and layers of the document
+    :param record: flat record of the layout
+    :type record: dict
+    :param elements: (element type, name) of the document elements
+    :param layers: long names of the document layers
+    :rtype: LayoutValidation
+    """
+    layout_elements = []
+    for element_type, element_dicts in record.get('layout_items', {}).items():
+        layout_elements.extend((element_type, element_dict.get('name')) for element_dict in element_dicts)
+    layout_layers = list(record.get('toc_items', {}))
+
+    element_set = set(elements)
+    layout_element_set = set(layout_elements)
+    layer_set = set(layers)
+    layout_layer_set = set(layout_layers)
+    return LayoutValidation(
+        [element for element in layout_elements if element not in element_set],
+        [element for element in elements if element not in layout_element_set],
+        [long_name for long_name in layout_layers if long_name not in layer_set],
+        [long_name for long_name in layers if long_name not in layout_layer_set]
+    )
@@ -0,0 +1,444 @@
+from __future__ import print_function
+from __future__ import division
+
+import bisect
+import codecs
+import gzip
+import json
+import re
+import zlib
+
+from . import layout_storage
+
+"""
+Streaming reader and writer for layout json files
+The reader parses a file a chunk at a time and hands back one layout record at a time, so the file is never held in
+memory as a single string. The writer serializes records as they come from a generator, without building the whole
+document first.
+A gzip file can't be read from an offset without decompressing it from the start, so while it's streamed a GzipIndex
+keeps a copy of the decompressor every GZIP_POINT_SPACING bytes, a record is then read by decompressing from the
+nearest copy.
+Files in any format are read, plain or gzip compressed, the format and compression are detected from the content:
+Format 1 (flat) and format 2 (overrides) - a single json document, see layout_storage
+Format 3 (json lines) - a header line with the settings and the shared base layout, then one line per layout
+holding its overrides of the base
+Ex:
+    {"format_version":3,"toc_active":true,"lyr_active":true,"base":{"layout_items":{...},"toc_items":{...}}}
+    {"layout_name":"Layout One","layout_items":{"TEXT_ELEMENT":{"Title":{"text":"One"}}},"toc_items":{}}
+    {"layout_name":"Layout Two","layout_items":{},"toc_items":{"Roads":{"visible":false}}}
+"""
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+CHUNK_SIZE = 1024 * 1024
+# compressed bytes read at a time, points of a GzipIndex are taken between reads
+GZIP_INPUT_SIZE = 64 * 1024
+# decompressed bytes between the points of a GzipIndex, each point takes about 40KB
+GZIP_POINT_SPACING = 256 * 1024
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+PRETTY_SEPARATORS = (",", ": ")
+COMPACT_SEPARATORS = (",", ":")
+
+
+def is_compressed(path):
+    with open(path, 'rb') as fl:
+        return fl.read(2) == GZIP_MAGIC
+
+
+def open_file(path):
+    """
+    Open a layout file for reading in binary, decompressing it if it's gzip compressed
+    """
+    if is_compressed(path):
+        return gzip.GzipFile(path, 'rb')
+    return open(path, 'rb')
+
+
+class GzipIndex(object):
+    """
+    Points a gzip file can be decompressed from, taken while the file is streamed once with iter_file
+    Each point is (decompressed offset, compressed offset, copy of the decompressor), at least spacing decompressed
+    bytes apart, a point holds the decompressor state and its 32KB window
+    """
+
+    def __init__(self, spacing=GZIP_POINT_SPACING):
+        self.spacing = spacing
+        self.points = []
+        self._offsets = []
+
+    def add_point(self, offset, compressed_offset, decompressor):
+        self.points.append((offset, compressed_offset, decompressor.copy()))
+        self._offsets.append(offset)
+
+    def read(self, path, start, end):
+        """
+        Decompressed bytes between two offsets, decompressing from the nearest point before start
+        """
+        position = bisect.bisect_right(self._offsets, start) - 1
+        with open(path, 'rb') as fl:
+            if position < 0:
+                stream = _GzipStream(fl)
+            else:
+                offset, compressed_offset, decompressor = self.points[position]
+                fl.seek(compressed_offset)
+                # copied again so the point can be used by later reads
+                stream = _GzipStream(fl, decompressor=decompressor.copy(), offset=offset)
+            while stream.offset < start:
+                if not stream.read(min(start - stream.offset, CHUNK_SIZE)):
+                    raise ValueError("Layout file ends before offset {}".format(start))
+            return stream.read(end - start)
+
+
+class _GzipStream(object):
+    """
+    Decompressed content of a gzip file (of one or more members), adding points to an index
+    """
+
+    def __init__(self, fl, index=None, decompressor=None, offset=0):
+        self._file = fl
+        self._index = index
+        self._decompressor = decompressor or _gzip_decompressor()
+        # input not yet used by the decompressor and its offset in the file
+        self._input = b""
+        self._input_offset = fl.tell()
+        self.offset = offset
+        self._next_point = offset
+
+    def read(self, size):
+        """
+        Up to size decompressed bytes, fewer only at the end of the file
+        """
+        output = []
+        wanted = size
+        while wanted > 0:
+            # output held back by an earlier limit comes first, then more input is read
+            data = self._decompressor.decompress(self._input, wanted)
+            self._used_input()
+            if not data and not self._input:
+                self._input_offset = self._file.tell()
+                if self._index is not None and self.offset >= self._next_point:
+                    # all input used and no output held back, a copy now doesn't keep any input alive
+                    self._index.add_point(self.offset, self._input_offset, self._decompressor)
+                    self._next_point = self.offset + self._index.spacing
+                self._input = self._file.read(GZIP_INPUT_SIZE)
+                if not self._input:
+                    break
+                continue
+            output.append(data)
+            self.offset += len(data)
+            wanted -= len(data)
+        return b"".join(output)
+
+    def _used_input(self):
+        decompressor = self._decompressor
+        if decompressor.unused_data:
+            # the member ended, the rest of the input starts the next member
+            rest = decompressor.unused_data
+            self._decompressor = _gzip_decompressor()
+        else:
+            rest = decompressor.unconsumed_tail
+        self._input_offset += len(self._input) - len(rest)
+        self._input = rest
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+
+def _gzip_decompressor():
+    # 16 + MAX_WBITS reads the gzip header and trailer
+    return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+
+class _StreamReader(object):
+    """
+    Json values read one at a time from a file, holding only the part of the file not yet parsed
+    """
+
+    def __init__(self, fl, chunk_size=CHUNK_SIZE):
+        self._file = fl
+        self._chunk_size = chunk_size
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._decoder = json.JSONDecoder()
+        self.buffer = u""
+        self.pos = 0
+        self.eof = False
+        # byte offset in the file of a position in the buffer, advanced as byte_offset is asked for
+        self._cursor = 0
+        self._cursor_bytes = 0
+
+    def byte_offset(self, pos=None):
+        """
+        Offset in the (decompressed) file of a position in the buffer, positions must not go backwards
+        """
+        pos = self.pos if pos is None else pos
+        self._cursor_bytes += len(self.buffer[self._cursor:pos].encode("utf-8"))
+        self._cursor = pos
+        return self._cursor_bytes
+
+    def _fill(self, minimum=0):
+        """
+        Read at least one chunk, or minimum characters, dropping the parsed part of the buffer
+        """
+        text = []
+        read = 0
+        while not self.eof and (read == 0 or read < minimum):
+            data = self._file.read(self._chunk_size)
+            if not data:
+                text.append(self._utf8.decode(b"", final=True))
+                self.eof = True
+                break
+            decoded = self._utf8.decode(data)
+            text.append(decoded)
+            read += len(decoded)
+        self.byte_offset(self.pos)
+        self.buffer = self.buffer[self.pos:] + u"".join(text)
+        self.pos = 0
+        self._cursor = 0
+
+    def peek(self):
+        """
+        Next character that isn't whitespace, None at the end of the file
+        """
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if self.eof:
+                return None
+            self._fill()
+
+    def expect(self, character):
+        found = self.peek()
+        if found != character:
+            raise ValueError("Expected '{}' but found '{}' in layout file".format(character, found))
+        self.pos += 1
+
+    def value(self):
+        """
+        Parse the next json value
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buffer, self.pos)
+            except ValueError:
+                if self.eof:
+                    raise
+                # the value continues past the buffer, read at least as much again so a large value
+                # is only parsed a few times
+                self._fill(len(self.buffer) - self.pos)
+                continue
+            if end == len(self.buffer) and not self.eof:
+                # a number or literal may continue in the next chunk
+                self._fill()
+                continue
+            self.pos = end
+            return value
+
+    def located_value(self):
+        """
+        Parse the next json value
+        :return: value and its start and end offsets in the file
+        :rtype: (object, int, int)
+        """
+        self.peek()
+        start = self.byte_offset()
+        value = self.value()
+        return value, start, self.byte_offset()
+
+    def array(self, located=False):
+        """
+        Yield the values of a json array one at a time, with located as (value, start, end)
+        """
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.located_value() if located else self.value()
+            if self.peek() == ",":
+                self.pos += 1
+                continue
+            self.expect("]")
+            return
+
+
+def iter_file(path, chunk_size=CHUNK_SIZE, located=False, gzip_index=None):
+    """
+    Parse a layout file in any format, one layout at a time
+    Yields ("header", (key, value)) for the top level settings of formats 2 and 3 (format_version, toc_active,
+    lyr_active, base) and ("layout", record) for each layout record as stored
+    :param located: yield ("layout", (record, start, end)) with the offsets of the record in the (decompressed)
+    file, see read_located
+    :param gzip_index: index to add the points of a compressed file to, see read_located
+    :type gzip_index: GzipIndex
+    """
+    if gzip_index is not None and is_compressed(path):
+        fl = _GzipStream(open(path, 'rb'), gzip_index)
+    else:
+        fl = open_file(path)
+    with fl:
+        reader = _StreamReader(fl, chunk_size)
+        if reader.peek() == "[":
+            for record in reader.array(located):
+                yield "layout", record
+            return
+
+        format_version = None
+        reader.expect("{")
+        while reader.peek() != "}":
+            key = reader.value()
+            reader.expect(":")
+            if key == "layouts":
+                for record in reader.array(located):
+                    yield "layout", record
+            else:
+                value = reader.value()
+                if key == "format_version":
+                    format_version = value
+                yield "header", (key, value)
+            if reader.peek() == ",":
+                reader.pos += 1
+        reader.expect("}")
+
+        if format_version == layout_storage.STREAM_FORMAT:
+            while reader.peek() is not None:
+                yield "layout", reader.located_value() if located else reader.value()
+
+
+def read_located(path, start, end, gzip_index=None):
+    """
+    Parse the json value between two offsets of a layout file, from iter_file with located
+    :param gzip_index: index of a compressed file filled by iter_file
+    :type gzip_index: GzipIndex
+    """
+    if gzip_index is not None:
+        return json.loads(gzip_index.read(path, start, end).decode("utf-8"))
+    with open(path, 'rb') as fl:
+        fl.seek(start)
+        return json.loads(fl.read(end - start).decode("utf-8"))
+
+
+def load(path, chunk_size=CHUNK_SIZE):
+    """
+    Read a layout file into the same data json.loads gives for formats 1 and 2, format 3 is read as format 2
+    :return: list of flat records or a dictionary with the settings, base and layouts
+    """
+    header = {}
+    records = []
+    for kind, value in iter_file(path, chunk_size):
+        if kind == "layout":
+            records.append(value)
+        else:
+            header[value[0]] = value[1]
+    if not header:
+        return records
+    header['layouts'] = records
+    return header
+
+
+def iter_records(path, chunk_size=CHUNK_SIZE):
+    """
+    Flat records of a layout file one at a time
+    The base layout of a format 2 file written with the layouts before it is only known at the end, the layouts
+    of such a file are held until then
+    """
+    base = None
+    settings = {}
+    held = []
+    for kind, value in iter_file(path, chunk_size):
+        if kind == "header":
+            key, header_value = value
+            if key == "base":
+                base = header_value
+            settings[key] = header_value
+            continue
+        if not settings:
+            yield value
+        elif base is None:
+            held.append(value)
+        else:
+            yield layout_storage.resolve_record(value, base)
+    for record in held:
+        yield layout_storage.resolve_record(record, base or {})
+
+
+def write_layouts(fl, records, settings, format_version=layout_storage.OVERRIDE_FORMAT, compact=False,
+                  on_record=None):
+    """
+    Serialize layouts to a binary file as they are produced
+    :param fl: file opened for writing in binary
+    :param records: function returning an iterable of flat records, called twice for formats 2 and 3
+    (once to build the base layout)
+    :type records: function
+    :param settings: toc_active and lyr_active settings
+    :type settings: dict
+    :param format_version: FLAT_FORMAT, OVERRIDE_FORMAT or STREAM_FORMAT
+    :param compact: no indentation or spaces, format 3 is always compact
+    :type compact: bool
+    :param on_record: function called with each flat record as it's written
+    """
+    toc_active = settings.get('toc_active', True)
+    lyr_active = settings.get('lyr_active', True)
+    compact = compact or format_version == layout_storage.STREAM_FORMAT
+
+    def dump(value, depth):
+        if compact:
+            return json.dumps(value, separators=COMPACT_SEPARATORS)
+        text = json.dumps(value, indent=4, separators=PRETTY_SEPARATORS)
+        return text.replace("\n", "\n" + " " * 4 * depth)
+
+    def write(text):
+        fl.write(text if isinstance(text, bytes) else text.encode("utf-8"))
+
+    newline = "" if compact else "\n"
+    indent = "" if compact else " " * 4
+
+    if format_version == layout_storage.FLAT_FORMAT:
+        write("[")
+        first = True
+        for record in records():
+            if on_record is not None:
+                on_record(record)
+            out_record = dict(record)
+            out_record['toc_active'] = toc_active
+            out_record['lyr_active'] = lyr_active
+            write(("" if first else ",") + newline + indent + dump(out_record, 1))
+            first = False
+        write(newline + "]")
+        return
+
+    base = layout_storage._build_base(records())
+
+    if format_version == layout_storage.STREAM_FORMAT:
+        header = [("format_version", layout_storage.STREAM_FORMAT), ("toc_active", toc_active),
+                  ("lyr_active", lyr_active), ("base", base)]
+        write("{" + ",".join(json.dumps(key) + ":" + dump(value, 0) for key, value in header) + "}\n")
+        for record in records():
+            if on_record is not None:
+                on_record(record)
+            write(dump(layout_storage._record_overrides(record, base), 0) + "\n")
+        return
+
+    separator = PRETTY_SEPARATORS[1] if not compact else COMPACT_SEPARATORS[1]
+    header = [("format_version", layout_storage.OVERRIDE_FORMAT), ("toc_active", toc_active),
+              ("lyr_active", lyr_active), ("base", base)]
+    write("{")
+    for key, value in header:
+        write(newline + indent + json.dumps(key) + separator + dump(value, 1) + ",")
+    write(newline + indent + json.dumps("layouts") + separator + "[")
+    first = True
+    for record in records():
+        if on_record is not None:
+            on_record(record)
+        write(("" if first else ",") + newline + indent * 2 + dump(layout_storage._record_overrides(record, base), 2))
+        first = False
+    write(newline + indent + "]" + newline + "}")
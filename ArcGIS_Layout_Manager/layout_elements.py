@@ -1,19 +1,22 @@
+from .interning import intern_string
+
+
 class BaseElement(object):
-    elementHeight = 0.0
-    elementPositionX = 0.0
-    elementPositionY = 0.0
-    elementWidth = 0.0
-    name = ""
+    # slots instead of a per instance __dict__, there is one element object per element per layout
+    __slots__ = ("name", "elementHeight", "elementWidth", "elementPositionX", "elementPositionY")
+
+    # properties written to the arcpy element by update_map_feature
+    _properties = ("name", "elementHeight", "elementWidth", "elementPositionX", "elementPositionY")
 
     def __init__(self, layout_object):
         if type(layout_object) is dict:
-            self.name = layout_object.get("name")
+            self.name = intern_string(layout_object.get("name"))
             self.elementHeight = layout_object.get("elementHeight")
             self.elementWidth = layout_object.get("elementWidth")
             self.elementPositionX = layout_object.get("elementPositionX")
             self.elementPositionY = layout_object.get("elementPositionY")
         else:
-            self.name = layout_object.name
+            self.name = intern_string(layout_object.name)
             self.elementHeight = layout_object.elementHeight
             self.elementWidth = layout_object.elementWidth
             self.elementPositionX = layout_object.elementPositionX
@@ -29,19 +32,62 @@ class BaseElement(object):
         }
         return dict_item
 
-    def update_map_feature(self, arcpy_layout_object):
-        arcpy_layout_object.name = self.name
-        arcpy_layout_object.elementHeight = self.elementHeight
-        arcpy_layout_object.elementWidth = self.elementWidth
-        arcpy_layout_object.elementPositionX = self.elementPositionX
-        arcpy_layout_object.elementPositionY = self.elementPositionY
+    def changed_properties(self, previous, properties=None):
+        """
+        List the properties that differ from a previously applied element
+        :param previous: element last applied to (or captured from) the map, None if unknown
+        :type previous: BaseElement
+        :param properties: properties to compare, defaults to all of the element properties
+        :type properties: tuple
+        :return: names of the properties that need to be written
+        :rtype: list
+        """
+        if properties is None:
+            properties = self._properties
+        if previous is None or type(previous) is not type(self):
+            return list(properties)
+        return [prop for prop in properties if getattr(previous, prop) != getattr(self, prop)]
+
+    def with_properties(self, values):
+        """
+        Copy of the element with some properties replaced, elements are shared between layouts so aren't changed
+        :param values: property name to new value
+        :type values: dict
+        :rtype: BaseElement
+        """
+        element = object.__new__(type(self))
+        for cls in type(self).__mro__:
+            for slot in getattr(cls, "__slots__", ()):
+                setattr(element, slot, values[slot] if slot in values else getattr(self, slot))
+        return element
+
+    def setter_operations(self):
+        """
+        Properties written by update_map_feature as (property, value) in write order, used by compiled apply plans
+        :rtype: list
+        """
+        return [(prop, getattr(self, prop)) for prop in self._properties]
+
+    def update_map_feature(self, arcpy_layout_object, previous=None):
+        """
+        Write the element properties to the arcpy element
+        :param arcpy_layout_object: arcpy layout element
+        :param previous: element last applied to the arcpy element, only changed properties are written if given
+        :type previous: BaseElement
+        :return: names of the properties written
+        :rtype: list
+        """
+        written = self.changed_properties(previous, BaseElement._properties)
+        for prop in written:
+            setattr(arcpy_layout_object, prop, getattr(self, prop))
+        return written
 
 
 class DataFrameElement(BaseElement):
-    XMin = 0.0
-    XMax = 0.0
-    YMin = 0.0
-    YMax = 0.0
+    __slots__ = ("XMin", "XMax", "YMin", "YMax")
+
+    _extent_properties = ("XMin", "XMax", "YMin", "YMax")
+    _properties = BaseElement._properties + _extent_properties
 
     def __init__(self, layout_object):
         super(DataFrameElement, self).__init__(layout_object)
@@ -66,17 +112,29 @@ class DataFrameElement(BaseElement):
         dict_item['YMax'] = self.YMax
         return dict_item
 
-    def update_map_feature(self, arcpy_layout_object):
-        super(DataFrameElement, self).update_map_feature(arcpy_layout_object)
-        df_extent = arcpy_layout_object.extent
-        df_extent.XMin = self.XMin
-        df_extent.XMax = self.XMax
-        df_extent.YMin = self.YMin
-        df_extent.YMax = self.YMax
-        arcpy_layout_object.extent = df_extent
+    def setter_operations(self):
+        # the extent can only be set as a whole
+        operations = [(prop, getattr(self, prop)) for prop in BaseElement._properties]
+        operations.append(("extent", (self.XMin, self.XMax, self.YMin, self.YMax)))
+        return operations
+
+    def update_map_feature(self, arcpy_layout_object, previous=None):
+        written = super(DataFrameElement, self).update_map_feature(arcpy_layout_object, previous)
+        # the extent can only be set as a whole
+        if self.changed_properties(previous, self._extent_properties):
+            df_extent = arcpy_layout_object.extent
+            df_extent.XMin = self.XMin
+            df_extent.XMax = self.XMax
+            df_extent.YMin = self.YMin
+            df_extent.YMax = self.YMax
+            arcpy_layout_object.extent = df_extent
+            written.extend(self._extent_properties)
+        return written
 
 
 class GraphicElement(BaseElement):
+    __slots__ = ()
+
     def __init__(self, layout_object):
         super(GraphicElement, self).__init__(layout_object)
 
@@ -84,31 +142,38 @@ class GraphicElement(BaseElement):
         dict_item = super(GraphicElement, self).to_dictionary()
         return dict_item
 
-    def update_map_feature(self, arcpy_layout_object):
-        super(GraphicElement, self).update_map_feature(arcpy_layout_object)
+    def update_map_feature(self, arcpy_layout_object, previous=None):
+        return super(GraphicElement, self).update_map_feature(arcpy_layout_object, previous)
 
 
 class LegendElement(BaseElement):
-    title = ""
+    __slots__ = ("title",)
+
+    _properties = BaseElement._properties + ("title",)
 
     def __init__(self, layout_object):
         super(LegendElement, self).__init__(layout_object)
         if type(layout_object) is dict:
-            self.title = layout_object.get('title')
+            self.title = intern_string(layout_object.get('title'))
         else:
-            self.title = layout_object.title
+            self.title = intern_string(layout_object.title)
 
     def to_dictionary(self):
         dict_item = super(LegendElement, self).to_dictionary()
         dict_item["title"] = self.title
         return dict_item
 
-    def update_map_feature(self, arcpy_layout_object):
-        super(LegendElement, self).update_map_feature(arcpy_layout_object)
-        arcpy_layout_object.title = self.title
+    def update_map_feature(self, arcpy_layout_object, previous=None):
+        written = super(LegendElement, self).update_map_feature(arcpy_layout_object, previous)
+        if self.changed_properties(previous, ("title",)):
+            arcpy_layout_object.title = self.title
+            written.append("title")
+        return written
 
 
 class MapSurroundElement(BaseElement):
+    __slots__ = ()
+
     def __init__(self, layout_object):
         super(MapSurroundElement, self).__init__(layout_object)
 
@@ -116,45 +181,51 @@ class MapSurroundElement(BaseElement):
         dict_item = super(MapSurroundElement, self).to_dictionary()
         return dict_item
 
-    def update_map_feature(self, arcpy_layout_object):
-        super(MapSurroundElement, self).update_map_feature(arcpy_layout_object)
+    def update_map_feature(self, arcpy_layout_object, previous=None):
+        return super(MapSurroundElement, self).update_map_feature(arcpy_layout_object, previous)
 
 
 class PictureElement(BaseElement):
-    sourceImage = ""
+    __slots__ = ("sourceImage",)
+
+    _properties = BaseElement._properties + ("sourceImage",)
 
     def __init__(self, layout_object):
         super(PictureElement, self).__init__(layout_object)
         if type(layout_object) is dict:
-            self.sourceImage = layout_object.get('sourceImage')
+            self.sourceImage = intern_string(layout_object.get('sourceImage'))
         else:
-            self.sourceImage = layout_object.sourceImage
+            self.sourceImage = intern_string(layout_object.sourceImage)
 
     def to_dictionary(self):
         dict_item = super(PictureElement, self).to_dictionary()
         dict_item['sourceImage'] = self.sourceImage
         return dict_item
 
-    def update_map_feature(self, arcpy_layout_object):
-        super(PictureElement, self).update_map_feature(arcpy_layout_object)
-        arcpy_layout_object.sourceImage = self.sourceImage
+    def update_map_feature(self, arcpy_layout_object, previous=None):
+        written = super(PictureElement, self).update_map_feature(arcpy_layout_object, previous)
+        if self.changed_properties(previous, ("sourceImage",)):
+            arcpy_layout_object.sourceImage = self.sourceImage
+            written.append("sourceImage")
+        return written
 
 
 class TextElement(BaseElement):
-    angle = 0.0
-    fontSize = 0.0
-    text = ""
+    __slots__ = ("angle", "fontSize", "text")
+
+    _text_properties = ("angle", "fontSize", "text")
+    _properties = BaseElement._properties + _text_properties
 
     def __init__(self, layout_object):
         super(TextElement, self).__init__(layout_object)
         if type(layout_object) is dict:
             self.angle = layout_object.get('angle')
             self.fontSize = layout_object.get('fontSize')
-            self.text = layout_object.get('text')
+            self.text = intern_string(layout_object.get('text'))
         else:
             self.angle = layout_object.angle
             self.fontSize = layout_object.fontSize
-            self.text = layout_object.text
+            self.text = intern_string(layout_object.text)
 
     def to_dictionary(self):
         dict_item = super(TextElement, self).to_dictionary()
@@ -163,8 +234,19 @@ class TextElement(BaseElement):
         dict_item['text'] = self.text
         return dict_item
 
-    def update_map_feature(self, arcpy_layout_object):
-        super(TextElement, self).update_map_feature(arcpy_layout_object)
-        arcpy_layout_object.angle = self.angle
-        arcpy_layout_object.fontSize = self.fontSize
-        arcpy_layout_object.text = self.text
+    def update_map_feature(self, arcpy_layout_object, previous=None):
+        written = super(TextElement, self).update_map_feature(arcpy_layout_object, previous)
+        for prop in self.changed_properties(previous, self._text_properties):
+            setattr(arcpy_layout_object, prop, getattr(self, prop))
+            written.append(prop)
+        return written
+
+
+layout_object_mapper = {
+    "DATAFRAME_ELEMENT": DataFrameElement,
+    "GRAPHIC_ELEMENT": GraphicElement,
+    "LEGEND_ELEMENT": LegendElement,
+    "MAPSURROUND_ELEMENT": MapSurroundElement,
+    "PICTURE_ELEMENT": PictureElement,
+    "TEXT_ELEMENT": TextElement
+}
@@ -0,0 +1,268 @@
+from __future__ import print_function
+from __future__ import division
+
+import collections
+
+from . import layout_storage, storage_backends
+
+"""
+Inverted index over stored layouts, answering which layouts show a layer, use an image, hold some text, ...
+without building the layouts. Works from the layout storage alone, arcpy isn't needed.
+Each layout is indexed under terms, a term is a tuple starting with its kind:
+    ("layer", long_name) - the layout has the layer in its table of contents
+    ("visible", long_name, visible) - the layer visibility in the layout
+    ("transparency", long_name, transparency) - the layer transparency in the layout
+    ("element", name) - the layout has a layout element with the name
+    ("element_type", element_type, name) - the layout has an element of the type with the name
+    ("source_image", path) - a picture element shows the image
+    ("text", text) - a text element holds exactly the text
+    ("text_word", word) - a text element holds the word, lower case
+    ("off_page", name) - the element lies wholly outside the page, only indexed when the page size is known
+Queries combine terms with & (and), | (or) and ~ (not)
+Ex:
+    index = layout_index.LayoutIndex.from_document(r"C:\\maps\\map.mxd", page_size=(11, 8.5))
+    index.query(layout_index.visible("Roads", True) & ~layout_index.source_image(r"C:\\images\\logo.png"))
+    index.query(layout_index.off_page("Legend") | layout_index.text_contains("draft"))
+"""
+
+
+def record_terms(record, page_size=None):
+    """
+    Index terms of a flat layout record
+    :param record: flat record from layout_storage
+    :type record: dict
+    :param page_size: (width, height) of the page, to index elements placed off the page
+    :type page_size: tuple
+    :rtype: set
+    """
+    terms = set()
+    layout_items = record.get('layout_items', {})
+    for element_type in layout_items:
+        for element_dict in layout_items[element_type]:
+            name = element_dict.get('name')
+            terms.add(("element", name))
+            terms.add(("element_type", element_type, name))
+            if element_dict.get('sourceImage') is not None:
+                terms.add(("source_image", element_dict.get('sourceImage')))
+            text = element_dict.get('text')
+            if text is not None:
+                terms.add(("text", text))
+                terms.update(("text_word", word) for word in text.lower().split())
+            if page_size is not None and _off_page(element_dict, page_size):
+                terms.add(("off_page", name))
+
+    toc_items = record.get('toc_items', {})
+    for long_name in toc_items:
+        toc_dict = toc_items[long_name]
+        terms.add(("layer", long_name))
+        terms.add(("visible", long_name, toc_dict.get('visible')))
+        terms.add(("transparency", long_name, toc_dict.get('transparency')))
+    return terms
+
+
+def _off_page(element_dict, page_size):
+    try:
+        x = element_dict['elementPositionX']
+        y = element_dict['elementPositionY']
+        width = element_dict['elementWidth']
+        height = element_dict['elementHeight']
+    except KeyError:
+        return False
+    if None in (x, y, width, height):
+        return False
+    page_width, page_height = page_size
+    return x >= page_width or y >= page_height or x + width <= 0 or y + height <= 0
+
+
+class LayoutIndex(object):
+    """
+    Term to layout names, updated one layout at a time
+    """
+
+    def __init__(self, page_size=None):
+        """
+        :param page_size: (width, height) of the page, to index elements placed off the page
+        :type page_size: tuple
+        """
+        self.page_size = page_size
+        self._postings = collections.defaultdict(set)
+        # terms of each layout in layout order, to remove a layout's old terms on update
+        self._layout_terms = collections.OrderedDict()
+
+    @classmethod
+    def from_records(cls, records, page_size=None):
+        """
+        :param records: iterable of flat records
+        """
+        index = cls(page_size)
+        for record in records:
+            index.update(record.get('layout_name'), record)
+        return index
+
+    @classmethod
+    def from_storage(cls, storage, page_size=None):
+        """
+        Index every layout of a layout storage
+        :type storage: storage_backends.LayoutStorage
+        """
+        stored_index = storage.read_index()[0]
+        collection = layout_storage.LayoutCollection(stored_index, storage.read_record)
+        return cls.from_records((collection.record(layout_name) for layout_name in collection), page_size)
+
+    @classmethod
+    def from_document(cls, mxd_path, storage="json", page_size=None):
+        """
+        Index the layouts stored next to a map document, the map document itself isn't opened
+        :param storage: "json", "sqlite" or a storage_backends.LayoutStorage
+        """
+        return cls.from_storage(storage_backends.storage_for_document(mxd_path, storage), page_size)
+
+    def update(self, layout_name, record):
+        """
+        Index a new or changed layout, a record of None removes the layout
+        """
+        self.remove(layout_name)
+        if record is None:
+            return
+        terms = record_terms(record, self.page_size)
+        for term in terms:
+            self._postings[term].add(layout_name)
+        self._layout_terms[layout_name] = terms
+
+    def remove(self, layout_name):
+        terms = self._layout_terms.pop(layout_name, ())
+        for term in terms:
+            layouts = self._postings[term]
+            layouts.discard(layout_name)
+            if not layouts:
+                del self._postings[term]
+
+    def __call__(self, layout_name, record):
+        # layout listener of a LayoutManager
+        self.update(layout_name, record)
+
+    def __contains__(self, layout_name):
+        return layout_name in self._layout_terms
+
+    def __len__(self):
+        return len(self._layout_terms)
+
+    def layouts(self, term):
+        """
+        Layouts indexed under a term
+        :rtype: set
+        """
+        return set(self._postings.get(term, ()))
+
+    def all_layouts(self):
+        return set(self._layout_terms)
+
+    def terms(self, kind=None):
+        """
+        Indexed terms, optionally only those of a kind, Ex: index.terms("source_image")
+        """
+        return [term for term in self._postings if kind is None or term[0] == kind]
+
+    def query(self, query):
+        """
+        Layouts matching a query, in layout order
+        :param query: Term or a combination of terms
+        :rtype: list
+        """
+        matches = query.evaluate(self)
+        return [layout_name for layout_name in self._layout_terms if layout_name in matches]
+
+
+class Query(object):
+    def evaluate(self, index):
+        raise NotImplementedError()
+
+    def __and__(self, other):
+        return And(self, other)
+
+    def __or__(self, other):
+        return Or(self, other)
+
+    def __invert__(self):
+        return Not(self)
+
+
+class Term(Query):
+    def __init__(self, *term):
+        self.term = term
+
+    def evaluate(self, index):
+        return index.layouts(self.term)
+
+    def __repr__(self):
+        return "Term{}".format(self.term)
+
+
+class And(Query):
+    def __init__(self, *queries):
+        self.queries = queries
+
+    def evaluate(self, index):
+        # the smallest set first keeps the intersections small
+        results = sorted((query.evaluate(index) for query in self.queries), key=len)
+        if not results:
+            return index.all_layouts()
+        matches = results[0]
+        for result in results[1:]:
+            if not matches:
+                break
+            matches = matches & result
+        return matches
+
+
+class Or(Query):
+    def __init__(self, *queries):
+        self.queries = queries
+
+    def evaluate(self, index):
+        matches = set()
+        for query in self.queries:
+            matches |= query.evaluate(index)
+        return matches
+
+
+class Not(Query):
+    def __init__(self, query):
+        self.query = query
+
+    def evaluate(self, index):
+        return index.all_layouts() - self.query.evaluate(index)
+
+
+def layer(long_name):
+    return Term("layer", long_name)
+
+
+def visible(long_name, is_visible=True):
+    return Term("visible", long_name, is_visible)
+
+
+def transparency(long_name, value):
+    return Term("transparency", long_name, value)
+
+
+def element(name, element_type=None):
+    if element_type is None:
+        return Term("element", name)
+    return Term("element_type", element_type, name)
+
+
+def source_image(path):
+    return Term("source_image", path)
+
+
+def text(value):
+    return Term("text", value)
+
+
+def text_contains(word):
+    return Term("text_word", word.lower())
+
+
+def off_page(name):
+    return Term("off_page", name)
@@ -0,0 +1,389 @@
+from __future__ import print_function
+from __future__ import division
+
+import collections
+
+from . import layout_elements, table_of_contents_elements
+
+"""
+Conversion between in memory layouts and the records stored in the layout json
+
+Format 1 (flat) is a list with the full property set of every element and table of contents item for each layout.
+Format 2 (overrides) stores a shared base layout with the most common value of each property,
+and for each layout only the properties that differ from the base, plus the base items missing from that layout.
+Format 3 (json lines) holds the same base and overrides as format 2, written a line per layout, see layout_codec.
+Ex:
+{
+    "format_version": 2,
+    "toc_active": true,
+    "lyr_active": true,
+    "base": {"layout_items": {"TEXT_ELEMENT": {"Title": {...}}}, "toc_items": {"Roads": {...}}},
+    "layouts": [
+        {"layout_name": "Layout One", "layout_items": {"TEXT_ELEMENT": {"Title": {"text": "One"}}},
+         "toc_items": {"Roads": {"visible": false}}, "missing_items": {"PICTURE_ELEMENT": ["Logo"]}}
+    ]
+}
+"""
+
+FLAT_FORMAT = 1
+OVERRIDE_FORMAT = 2
+STREAM_FORMAT = 3
+
+
+def layout_to_record(layout):
+    """
+    Convert a layout to its flat json record
+    :param layout: layout with layout_name, layout_items and toc_items
+    :type layout: dict
+    :return: flat record
+    :rtype: dict
+    """
+    layouts = {}
+    layout_items = layout.get('layout_items')
+    for element_type in layout_items:
+        layout_sub = []
+        for element_name in layout_items[element_type]:
+            layout_sub.append(layout_items[element_type][element_name].to_dictionary())
+        layouts[element_type] = layout_sub
+
+    toc = {}
+    toc_items = layout.get('toc_items', {})
+    for long_name in toc_items:
+        toc_val = toc_items[long_name]
+        toc[toc_val.long_name] = toc_val.to_dictionary()
+
+    return {
+        "layout_name": layout.get('layout_name'),
+        "layout_items": layouts,
+        'toc_items': toc
+    }
+
+
+def record_to_layout(record):
+    """
+    Build the layout element and table of contents objects for a flat json record
+    :param record: flat record
+    :type record: dict
+    :return: layout with layout_name, layout_items and toc_items
+    :rtype: dict
+    """
+    layout_types = {}
+    layout_items = record.get('layout_items')
+    for element_type in layout_items:
+        layout_type_dct = {}
+        for element_dict in layout_items[element_type]:
+            obj = layout_elements.layout_object_mapper[element_type](element_dict)
+            layout_type_dct[obj.name] = obj
+        layout_types[element_type] = layout_type_dct
+
+    toc_types = {}
+    toc_items = record.get('toc_items', {})
+    for long_name in toc_items:
+        toc_val = table_of_contents_elements.TableOfContentsItem(toc_items[long_name])
+        toc_types[toc_val.long_name] = toc_val
+
+    return {
+        'layout_name': record.get('layout_name'),
+        'layout_items': layout_types,
+        'toc_items': toc_types,
+    }
+
+
+def encode_layouts(records, toc_active=True, lyr_active=True, format_version=OVERRIDE_FORMAT):
+    """
+    Build the json data for a list of flat records
+    :param records: flat records from layout_to_record
+    :type records: list
+    :param toc_active: LayoutManager.toc_active setting to store
+    :param lyr_active: LayoutManager.lyr_active setting to store
+    :param format_version: FLAT_FORMAT or OVERRIDE_FORMAT
+    :type format_version: int
+    :return: json serializable data
+    """
+    if format_version == FLAT_FORMAT:
+        out_data = []
+        for record in records:
+            out_record = dict(record)
+            out_record['toc_active'] = toc_active
+            out_record['lyr_active'] = lyr_active
+            out_data.append(out_record)
+        return out_data
+
+    base = _build_base(records)
+    return {
+        "format_version": OVERRIDE_FORMAT,
+        "toc_active": toc_active,
+        "lyr_active": lyr_active,
+        "base": base,
+        "layouts": [_record_overrides(record, base) for record in records]
+    }
+
+
+def decode_layouts(data):
+    """
+    Read json data in any supported format back into flat records
+    :param data: parsed json
+    :return: flat records and the stored settings (toc_active, lyr_active)
+    :rtype: (list, dict)
+    """
+    if isinstance(data, list):
+        settings = {}
+        for record in data:
+            settings['toc_active'] = record.get('toc_active', True)
+            settings['lyr_active'] = record.get('lyr_active', True)
+        return data, settings
+
+    settings = {
+        'toc_active': data.get('toc_active', True),
+        'lyr_active': data.get('lyr_active', True)
+    }
+    base = data.get('base', {})
+    return [resolve_record(record, base) for record in data.get('layouts', [])], settings
+
+
+def index_layouts(data):
+    """
+    Index json data in any supported format by layout name without building any layout objects
+    :param data: parsed json
+    :return: layout name to (record, base) where base is None for flat records, and the stored settings
+    :rtype: (collections.OrderedDict, dict)
+    """
+    index = collections.OrderedDict()
+    if isinstance(data, list):
+        records, settings = decode_layouts(data)
+        for record in records:
+            index[record.get('layout_name')] = (record, None)
+        return index, settings
+
+    settings = {
+        'toc_active': data.get('toc_active', True),
+        'lyr_active': data.get('lyr_active', True)
+    }
+    base = data.get('base', {})
+    for record in data.get('layouts', []):
+        index[record.get('layout_name')] = (record, base)
+    return index, settings
+
+
+def resolve_record(overrides, base):
+    """
+    Apply a layout's sparse overrides to the base layout
+    :param overrides: layout record in the overrides format
+    :type overrides: dict
+    :param base: shared base layout
+    :type base: dict
+    :return: flat record
+    :rtype: dict
+    """
+    base_items = base.get('layout_items', {})
+    item_overrides = overrides.get('layout_items', {})
+    missing_items = overrides.get('missing_items', {})
+    layout_items = {}
+    for element_type in set(base_items) | set(item_overrides):
+        layout_items[element_type] = _resolve_group(
+            base_items.get(element_type, {}),
+            item_overrides.get(element_type, {}),
+            missing_items.get(element_type, []),
+            'name'
+        )
+
+    toc_items = {}
+    for toc_dict in _resolve_group(base.get('toc_items', {}), overrides.get('toc_items', {}),
+                                   overrides.get('missing_toc_items', []), 'long_name'):
+        toc_items[toc_dict.get('long_name')] = toc_dict
+
+    return {
+        'layout_name': overrides.get('layout_name'),
+        'layout_items': layout_items,
+        'toc_items': toc_items
+    }
+
+
+def _resolve_group(base_group, override_group, missing, key_field):
+    missing = set(missing)
+    resolved = []
+    for name in base_group:
+        if name in missing:
+            continue
+        item = dict(base_group[name])
+        item.update(override_group.get(name, {}))
+        resolved.append(item)
+    for name in override_group:
+        if name not in base_group:
+            item = dict(override_group[name])
+            item.setdefault(key_field, name)
+            resolved.append(item)
+    return resolved
+
+
+def _record_groups(record):
+    """
+    Yield (section, group, key, item dictionary) for every element and toc item of a flat record
+    """
+    layout_items = record.get('layout_items', {})
+    for element_type in layout_items:
+        for element_dict in layout_items[element_type]:
+            yield 'layout_items', element_type, element_dict.get('name'), element_dict
+    toc_items = record.get('toc_items', {})
+    for long_name in toc_items:
+        yield 'toc_items', None, long_name, toc_items[long_name]
+
+
+def _build_base(records):
+    """
+    Base layout holding the most common value of every property across all layouts
+    """
+    value_counts = collections.OrderedDict()
+    element_types = set()
+    for record in records:
+        element_types.update(record.get('layout_items', {}))
+        for section, group, key, item in _record_groups(record):
+            field_counts = value_counts.setdefault((section, group, key), collections.OrderedDict())
+            for field in item:
+                field_counts.setdefault(field, collections.Counter())[item[field]] += 1
+
+    base = {
+        'layout_items': dict((element_type, {}) for element_type in element_types),
+        'toc_items': {}
+    }
+    for (section, group, key), field_counts in value_counts.items():
+        base_item = dict((field, counts.most_common(1)[0][0]) for field, counts in field_counts.items())
+        if section == 'layout_items':
+            base['layout_items'][group][key] = base_item
+        else:
+            base['toc_items'][key] = base_item
+    return base
+
+
+def _record_overrides(record, base):
+    overrides = {
+        'layout_name': record.get('layout_name'),
+        'layout_items': {},
+        'toc_items': {}
+    }
+    present = set()
+    for section, group, key, item in _record_groups(record):
+        present.add((section, group, key))
+        if section == 'layout_items':
+            base_item = base['layout_items'][group][key]
+            target = overrides['layout_items'].setdefault(group, {})
+        else:
+            base_item = base['toc_items'][key]
+            target = overrides['toc_items']
+        changed = dict((field, item[field]) for field in item
+                       if field not in base_item or base_item[field] != item[field])
+        if changed:
+            target[key] = changed
+
+    for element_type, elements in list(overrides['layout_items'].items()):
+        if not elements:
+            del overrides['layout_items'][element_type]
+
+    missing_items = {}
+    for element_type in base['layout_items']:
+        missing = [key for key in base['layout_items'][element_type]
+                   if ('layout_items', element_type, key) not in present]
+        if missing:
+            missing_items[element_type] = missing
+    if missing_items:
+        overrides['missing_items'] = missing_items
+
+    missing_toc = [key for key in base['toc_items'] if ('toc_items', None, key) not in present]
+    if missing_toc:
+        overrides['missing_toc_items'] = missing_toc
+
+    return overrides
+
+
+class LayoutCollection(object):
+    """
+    Layouts keyed by layout name, behaving like a dictionary
+    Stored records are only turned into layout element and table of contents objects the first time a layout is used,
+    layouts that are never used are saved back from their records without being built
+    """
+
+    def __init__(self, index=None, loader=None):
+        """
+        :param index: layout name to (record, base) as returned by index_layouts, or None for records from the loader
+        :type index: collections.OrderedDict
+        :param loader: function returning the flat record for a layout name
+        :type loader: function
+        """
+        self._index = collections.OrderedDict(index or {})
+        self._loaded = {}
+        self._loader = loader
+
+    def __contains__(self, layout_name):
+        return layout_name in self._index
+
+    def __iter__(self):
+        return iter(list(self._index))
+
+    def __len__(self):
+        return len(self._index)
+
+    def __getitem__(self, layout_name):
+        layout = self.get(layout_name)
+        if layout is None:
+            raise KeyError(layout_name)
+        return layout
+
+    def __setitem__(self, layout_name, layout):
+        self._index[layout_name] = None
+        self._loaded[layout_name] = layout
+
+    def __delitem__(self, layout_name):
+        del self._index[layout_name]
+        self._loaded.pop(layout_name, None)
+
+    def keys(self):
+        return list(self._index)
+
+    def copy(self):
+        """
+        Shallow copy, layouts are replaced rather than changed in place so they can be shared with the copy
+        """
+        collection = LayoutCollection(self._index, self._loader)
+        collection._loaded = dict(self._loaded)
+        return collection
+
+    def reindex(self, index, changed_layouts):
+        """
+        Replace the stored records after the store changed, keeping the built layouts of unchanged layouts
+        :param index: new layout index
+        :type index: collections.OrderedDict
+        :param changed_layouts: names of the layouts whose stored record changed
+        :type changed_layouts: set
+        """
+        loaded = self._loaded
+        self._index = collections.OrderedDict(index)
+        self._loaded = dict(
+            (layout_name, loaded[layout_name]) for layout_name in loaded
+            if layout_name in self._index and layout_name not in changed_layouts
+        )
+
+    def get(self, layout_name, default=None):
+        if layout_name not in self._index:
+            return default
+        if layout_name not in self._loaded:
+            self._loaded[layout_name] = record_to_layout(self.record(layout_name))
+        return self._loaded[layout_name]
+
+    def is_loaded(self, layout_name):
+        return layout_name in self._loaded
+
+    def record(self, layout_name):
+        """
+        Flat record for a layout, built from the layout objects if loaded, otherwise from the stored record
+        :param layout_name: name of the layout
+        :return: flat record
+        :rtype: dict
+        """
+        if layout_name in self._loaded:
+            return layout_to_record(self._loaded[layout_name])
+        if self._index[layout_name] is None:
+            return self._loader(layout_name)
+        record, base = self._index[layout_name]
+        if base is None:
+            return record
+        return resolve_record(record, base)
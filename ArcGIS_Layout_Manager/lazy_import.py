@@ -0,0 +1,51 @@
+from __future__ import print_function
+from __future__ import division
+
+import importlib
+
+"""
+Modules imported on first use, so the parts of the package that only work with layout json and storage
+load without arcpy (and without the license check out of importing it)
+Ex:
+    arcpy = LazyModule("arcpy", requires=("arcview",))
+    arcpy.mapping.MapDocument("CURRENT")  # arcview then arcpy are imported here
+"""
+
+
+class LazyModule(object):
+    """
+    Stand in for a module, the module is imported the first time one of its attributes is used
+    """
+
+    def __init__(self, name, requires=()):
+        """
+        :param name: module name
+        :type name: str
+        :param requires: modules imported first, Ex: arcview to set the license level before arcpy
+        :type requires: tuple
+        """
+        self.__dict__['_name'] = name
+        self.__dict__['_requires'] = tuple(requires)
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            for required in self._requires:
+                importlib.import_module(required)
+            module = importlib.import_module(self._name)
+            self.__dict__['_module'] = module
+        return module
+
+    def is_loaded(self):
+        return self.__dict__['_module'] is not None
+
+    def __getattr__(self, attribute):
+        return getattr(self._load(), attribute)
+
+    def __setattr__(self, attribute, value):
+        setattr(self._load(), attribute, value)
+
+    def __repr__(self):
+        state = "loaded" if self.is_loaded() else "not loaded"
+        return "<lazy module {} ({})>".format(self._name, state)
@@ -0,0 +1,180 @@
+from __future__ import print_function
+from __future__ import division
+
+import itertools
+import operator
+
+"""
+Ordering of layouts so that consecutive switches change as few properties as possible
+The transition cost between two layouts is the number of element and table of contents properties
+that differ between them, counting every property of an item only one of the layouts has.
+plan_switch_order builds a greedy nearest neighbour path through the layouts. Each layout is read once into a vector
+of item states shared between layouts, candidates are compared by the number of items in a different state, and only
+the chosen switch is costed field by field. Each step only looks at a window of the next remaining layouts, so
+planning stays linear in the number of layouts.
+"""
+
+# remaining layouts compared at each step of plan_switch_order
+PLAN_WINDOW = 64
+
+
+def record_fields(record):
+    """
+    Flatten a flat layout record into a set of ((section, group, key, field), value) pairs
+    :param record: flat record from layout_storage
+    :type record: dict
+    :rtype: frozenset
+    """
+    fields = []
+    layout_items = record.get('layout_items', {})
+    for element_type in layout_items:
+        for element_dict in layout_items[element_type]:
+            key = ('layout_items', element_type, element_dict.get('name'))
+            fields.extend((key + (field,), value) for field, value in element_dict.items())
+    toc_items = record.get('toc_items', {})
+    for long_name in toc_items:
+        key = ('toc_items', None, long_name)
+        fields.extend((key + (field,), value) for field, value in toc_items[long_name].items())
+    return frozenset(fields)
+
+
+def transition_cost(from_fields, to_fields):
+    """
+    Number of properties that differ between two layouts
+    :param from_fields: record_fields of the current layout
+    :param to_fields: record_fields of the next layout
+    :rtype: int
+    """
+    return len(set(field for field, value in from_fields ^ to_fields))
+
+
+def _item_states(record):
+    """
+    Yield (item key, item state) for every element and toc item of a flat record, the state holds the sorted fields
+    """
+    layout_items = record.get('layout_items', {})
+    for element_type in layout_items:
+        for element_dict in layout_items[element_type]:
+            yield ('layout_items', element_type, element_dict.get('name')), tuple(sorted(element_dict.items()))
+    toc_items = record.get('toc_items', {})
+    for long_name in toc_items:
+        yield ('toc_items', None, long_name), tuple(sorted(toc_items[long_name].items()))
+
+
+class _LayoutVectors(object):
+    """
+    names - layout names in the order read
+    vectors - for each layout the state id of every item key, -1 for items the layout doesn't have
+    states - fields of each distinct item state, shared by every layout with the item in that state
+    """
+
+    def __init__(self, records):
+        """
+        :param records: (layout name, flat record) pairs, each record is only read once
+        """
+        positions = {}
+        state_ids = {}
+        self.names = []
+        self.states = []
+        vectors = []
+        for layout_name, record in records:
+            vector = []
+            for key, state in _item_states(record):
+                position = positions.setdefault(key, len(positions))
+                if position >= len(vector):
+                    vector.extend([-1] * (position + 1 - len(vector)))
+                state_id = state_ids.get(state)
+                if state_id is None:
+                    state_id = state_ids[state] = len(self.states)
+                    self.states.append(dict(state))
+                vector[position] = state_id
+            self.names.append(layout_name)
+            vectors.append(vector)
+        width = len(positions)
+        self.vectors = [tuple(vector + [-1] * (width - len(vector))) for vector in vectors]
+        self._costs = {}
+
+    def _state_cost(self, from_state, to_state):
+        key = (from_state, to_state) if from_state < to_state else (to_state, from_state)
+        cost = self._costs.get(key)
+        if cost is None:
+            if key[0] == -1:
+                cost = len(self.states[key[1]])
+            else:
+                from_fields = self.states[from_state]
+                to_fields = self.states[to_state]
+                cost = sum(1 for field in set(from_fields) | set(to_fields)
+                           if field not in from_fields or field not in to_fields
+                           or from_fields[field] != to_fields[field])
+            self._costs[key] = cost
+        return cost
+
+    def changed_items(self, from_index, to_index):
+        """
+        Number of items in a different state in two layouts
+        """
+        return sum(map(operator.ne, self.vectors[from_index], self.vectors[to_index]))
+
+    def cost(self, from_index, to_index):
+        """
+        Transition cost between two layouts, as transition_cost
+        """
+        from_vector = self.vectors[from_index]
+        to_vector = self.vectors[to_index]
+        # items in the same state are skipped without looking at their fields
+        changed = itertools.compress(zip(from_vector, to_vector), map(operator.ne, from_vector, to_vector))
+        return sum(self._state_cost(from_state, to_state) for from_state, to_state in changed)
+
+
+def plan_switch_order(records, start=None, window=PLAN_WINDOW):
+    """
+    Order layouts so that each switch goes to the remaining layout with the fewest items in a different state
+    :param records: layout name to flat record, or (layout name, flat record) pairs so the records don't all have to be
+    held at once
+    :type records: dict
+    :param start: layout to start from (default: first layout)
+    :param window: number of remaining layouts, in the order given, compared at each step, None to compare every
+    remaining layout, O(n^2) in the number of layouts (default: PLAN_WINDOW)
+    :type window: int
+    :return: layout names in switch order and the total transition cost of the path
+    :rtype: (list, int)
+    """
+    layouts = _LayoutVectors(records.items() if hasattr(records, "items") else records)
+    if not layouts.names:
+        return [], 0
+
+    remaining = list(range(len(layouts.names)))
+    current = layouts.names.index(start) if start in layouts.names else 0
+    remaining.remove(current)
+    order = [current]
+    total_cost = 0
+    while remaining:
+        candidates = remaining if window is None else remaining[:window]
+        best_index = 0
+        best_changes = None
+        for index, candidate in enumerate(candidates):
+            changes = layouts.changed_items(current, candidate)
+            if best_changes is None or changes < best_changes:
+                best_index = index
+                best_changes = changes
+                if changes == 0:
+                    break
+        previous = current
+        current = remaining.pop(best_index)
+        order.append(current)
+        total_cost += layouts.cost(previous, current)
+    return [layouts.names[index] for index in order], total_cost
+
+
+def path_cost(records, order):
+    """
+    Total transition cost of switching through layouts in the given order
+    """
+    total_cost = 0
+    previous = None
+    for layout_name in order:
+        current = record_fields(records[layout_name])
+        if previous is not None:
+            total_cost += transition_cost(previous, current)
+        previous = current
+    return total_cost
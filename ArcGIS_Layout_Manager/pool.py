@@ -0,0 +1,215 @@
+from __future__ import print_function
+from __future__ import division
+
+import collections
+import contextlib
+import logging
+import os
+import threading
+
+from . import exceptions
+
+"""
+Pool of open map documents and their LayoutManagers for long running processes serving many map documents
+Managers are kept open keyed by map document path, up to max_size. When a new document is opened over the cap
+the least recently used manager not checked out is evicted, its unsaved layouts are saved and the map document
+is released.
+A manager is only ever checked out by one thread at a time, other threads asking for the same document wait.
+Ex:
+    pool = ManagerPool(max_size=4)
+    with pool.checkout(r"C:\\maps\\map.mxd") as lm:
+        lm.switch_layout("Layout One")
+    pool.close()
+"""
+
+
+class _PoolEntry(object):
+    def __init__(self, key):
+        self.key = key
+        self.manager = None
+        # held by the thread that has the manager checked out
+        self.lock = threading.Lock()
+        # threads holding or waiting for the entry, guarded by the pool lock
+        self.users = 0
+
+
+class ManagerPool(object):
+    """
+    max_size - number of managers kept open (default: 8)
+    manager_options - keyword arguments passed to every LayoutManager opened by the pool
+    """
+
+    def __init__(self, max_size=8, manager_factory=None, **manager_options):
+        """
+        :param max_size: number of managers kept open, more are only opened while all are checked out
+        :type max_size: int
+        :param manager_factory: function called as manager_factory(mxd_path, **manager_options) to open a manager
+        (default: LayoutManager)
+        :param manager_options: LayoutManager keyword arguments, Ex: storage="sqlite", apply_first_layout=False
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.manager_options = manager_options
+        self._manager_factory = manager_factory
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @staticmethod
+    def _key(mxd_path):
+        return os.path.normcase(os.path.abspath(mxd_path))
+
+    def _open_manager(self, mxd_path):
+        if self._manager_factory is not None:
+            return self._manager_factory(mxd_path, **self.manager_options)
+
+        from .LayoutManager import LayoutManager
+        manager = LayoutManager(mxd_path=mxd_path, **self.manager_options)
+        if not manager._is_active:
+            raise exceptions.MXD_ERROR("Could not open map document {}".format(mxd_path))
+        return manager
+
+    @contextlib.contextmanager
+    def checkout(self, mxd_path):
+        """
+        Check out the manager of a map document, opening it if it isn't in the pool
+        The manager is returned to the pool at the end of the with block
+        :param mxd_path: path to the map document
+        :type mxd_path: str
+        :rtype: LayoutManager
+        """
+        entry = self._reserve(mxd_path)
+        try:
+            with entry.lock:
+                if entry.manager is None:
+                    if self._closed:
+                        raise RuntimeError("Manager pool is closed")
+                    entry.manager = self._open_manager(mxd_path)
+                yield entry.manager
+        finally:
+            self._release(entry)
+
+    def _reserve(self, mxd_path):
+        key = self._key(mxd_path)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Manager pool is closed")
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _PoolEntry(key)
+                self._entries[key] = entry
+            else:
+                self._move_to_end(key)
+            entry.users += 1
+            evicted = self._take_evictions()
+        self._close_entries(evicted)
+        return entry
+
+    def _release(self, entry):
+        with self._lock:
+            entry.users -= 1
+            if entry.manager is None and entry.users == 0 and self._entries.get(entry.key) is entry:
+                # opening the document failed, don't keep an empty entry
+                del self._entries[entry.key]
+            evicted = self._take_evictions()
+        self._close_entries(evicted)
+
+    def _move_to_end(self, key):
+        entry = self._entries.pop(key)
+        self._entries[key] = entry
+
+    def _take_evictions(self):
+        """
+        Remove the least recently used idle entries over max_size, called with the pool lock held
+        """
+        evicted = []
+        excess = len(self._entries) - self.max_size
+        if excess <= 0:
+            return evicted
+        for key in list(self._entries):
+            if excess <= 0:
+                break
+            entry = self._entries[key]
+            if entry.users == 0:
+                del self._entries[key]
+                evicted.append(entry)
+                excess -= 1
+        return evicted
+
+    @staticmethod
+    def _close_entries(entries):
+        # entries are out of the pool and idle, so nothing else can check them out
+        for entry in entries:
+            with entry.lock:
+                if entry.manager is None:
+                    continue
+                logging.info("Releasing map document {}".format(entry.key))
+                try:
+                    entry.manager.close()
+                except Exception as e:
+                    logging.error("Error closing {}: {}".format(entry.key, str(e)))
+                entry.manager = None
+
+    def evict(self, mxd_path):
+        """
+        Save and release a map document now, if it is in the pool and not checked out
+        :return: True when the document was released
+        :rtype: bool
+        """
+        key = self._key(mxd_path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.users > 0:
+                return False
+            del self._entries[key]
+        self._close_entries([entry])
+        return True
+
+    def save_all(self):
+        """
+        Save the unsaved layouts of every manager not checked out
+        """
+        with self._lock:
+            entries = [entry for entry in self._entries.values() if entry.users == 0]
+        for entry in entries:
+            if not entry.lock.acquire(False):
+                continue
+            try:
+                if entry.manager is not None and entry.manager.has_unsaved_changes():
+                    entry.manager.save_layout_json()
+            finally:
+                entry.lock.release()
+
+    def open_documents(self):
+        """
+        :return: paths of the pooled map documents, least recently used first
+        :rtype: list
+        """
+        with self._lock:
+            return list(self._entries)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, mxd_path):
+        with self._lock:
+            return self._key(mxd_path) in self._entries
+
+    def close(self):
+        """
+        Save and release every map document, waiting for checked out managers to be returned
+        """
+        with self._lock:
+            self._closed = True
+            entries = list(self._entries.values())
+            self._entries.clear()
+        self._close_entries(entries)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
@@ -0,0 +1,236 @@
+from __future__ import print_function
+from __future__ import division
+
+import itertools
+import math
+
+from . import layout_storage, storage_backends
+
+"""
+Spatial index over the data frame extents of stored layouts, answering which layouts show a point or an area
+without scanning every layout. Works from the layout storage alone, arcpy isn't needed.
+The extents are packed into an R-tree (sort tile recursive packing). Extents added or changed after packing are
+kept in a short list searched as well, the tree is packed again once that list grows.
+Ex:
+    index = spatial_index.ExtentIndex.from_document(r"C:\\maps\\map.mxd")
+    index.layouts_at(512300.0, 4821000.0)
+    index.dataframes_intersecting(512000.0, 4820000.0, 513000.0, 4822000.0)
+"""
+
+DATAFRAME_ELEMENT = "DATAFRAME_ELEMENT"
+
+
+def record_extents(record):
+    """
+    Data frame extents of a flat layout record
+    :param record: flat record from layout_storage
+    :type record: dict
+    :return: (data frame name, (xmin, ymin, xmax, ymax)) of every data frame with a full extent
+    :rtype: list
+    """
+    extents = []
+    for element_dict in record.get('layout_items', {}).get(DATAFRAME_ELEMENT, ()):
+        bounds = (element_dict.get('XMin'), element_dict.get('YMin'), element_dict.get('XMax'),
+                  element_dict.get('YMax'))
+        if None in bounds:
+            continue
+        xmin, ymin, xmax, ymax = bounds
+        extents.append((element_dict.get('name'), (min(xmin, xmax), min(ymin, ymax), max(xmin, xmax),
+                                                   max(ymin, ymax))))
+    return extents
+
+
+def _pack(items, capacity):
+    """
+    Pack entries or nodes, each a tuple starting with xmin, ymin, xmax, ymax, into the nodes of the level above
+    A node is (xmin, ymin, xmax, ymax, children, is_leaf)
+    """
+    is_leaf = len(items[0]) == 5
+    node_count = int(math.ceil(len(items) / capacity))
+    slice_count = int(math.ceil(math.sqrt(node_count)))
+    slice_size = slice_count * capacity
+
+    items = sorted(items, key=lambda item: item[0] + item[2])
+    nodes = []
+    for slice_start in range(0, len(items), slice_size):
+        vertical_slice = sorted(items[slice_start:slice_start + slice_size], key=lambda item: item[1] + item[3])
+        for start in range(0, len(vertical_slice), capacity):
+            children = vertical_slice[start:start + capacity]
+            nodes.append((
+                min(child[0] for child in children), min(child[1] for child in children),
+                max(child[2] for child in children), max(child[3] for child in children),
+                children, is_leaf
+            ))
+    return nodes
+
+
+class ExtentIndex(object):
+    """
+    (layout name, data frame name) by data frame extent, updated one layout at a time
+    """
+
+    def __init__(self, node_capacity=16):
+        """
+        :param node_capacity: children per tree node
+        :type node_capacity: int
+        """
+        self.node_capacity = node_capacity
+        # entries are (xmin, ymin, xmax, ymax, (layout name, data frame name))
+        self._entries = {}
+        self._layout_keys = {}
+        # layout name to its position, so results come back in layout order
+        self._layout_order = {}
+        self._next_position = itertools.count()
+        self._root = None
+        self._pending = []
+        self._stale = 0
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        :param records: iterable of flat records
+        """
+        index = cls()
+        for record in records:
+            index.update(record.get('layout_name'), record)
+        index.pack()
+        return index
+
+    @classmethod
+    def from_storage(cls, storage):
+        """
+        Index the data frames of every layout in a layout storage
+        :type storage: storage_backends.LayoutStorage
+        """
+        stored_index = storage.read_index()[0]
+        collection = layout_storage.LayoutCollection(stored_index, storage.read_record)
+        return cls.from_records(collection.record(layout_name) for layout_name in collection)
+
+    @classmethod
+    def from_document(cls, mxd_path, storage="json"):
+        """
+        Index the layouts stored next to a map document, the map document itself isn't opened
+        :param storage: "json", "sqlite" or a storage_backends.LayoutStorage
+        """
+        return cls.from_storage(storage_backends.storage_for_document(mxd_path, storage))
+
+    def update(self, layout_name, record):
+        """
+        Index the data frames of a new or changed layout, a record of None removes the layout
+        """
+        # a changed layout keeps its place in the layout order
+        position = self._layout_order.get(layout_name)
+        self.remove(layout_name)
+        if record is None:
+            return
+        keys = []
+        for dataframe_name, bounds in record_extents(record):
+            key = (layout_name, dataframe_name)
+            entry = bounds + (key,)
+            self._entries[key] = entry
+            self._pending.append(entry)
+            keys.append(key)
+        self._layout_keys[layout_name] = keys
+        self._layout_order[layout_name] = next(self._next_position) if position is None else position
+
+    def remove(self, layout_name):
+        keys = self._layout_keys.pop(layout_name, ())
+        for key in keys:
+            del self._entries[key]
+            self._stale += 1
+        self._layout_order.pop(layout_name, None)
+
+    def __call__(self, layout_name, record):
+        # layout listener of a LayoutManager
+        self.update(layout_name, record)
+
+    def __contains__(self, layout_name):
+        return layout_name in self._layout_keys
+
+    def __len__(self):
+        return len(self._entries)
+
+    def pack(self):
+        """
+        Pack every extent into the tree, done on query once enough extents changed
+        """
+        self._pending = []
+        self._stale = 0
+        level = list(self._entries.values())
+        if not level:
+            self._root = None
+            return
+        while len(level) > 1 or len(level[0]) == 5:
+            level = _pack(level, self.node_capacity)
+        self._root = level[0]
+
+    def _search(self, xmin, ymin, xmax, ymax):
+        if len(self._pending) + self._stale > max(64, len(self._entries) // 8):
+            self.pack()
+
+        entries = self._entries
+        keys = []
+        if self._root is not None:
+            stack = [self._root]
+            while stack:
+                node = stack.pop()
+                for child in node[4]:
+                    if child[0] <= xmax and child[2] >= xmin and child[1] <= ymax and child[3] >= ymin:
+                        if not node[5]:
+                            stack.append(child)
+                        # entries removed or replaced since packing are skipped
+                        elif entries.get(child[4]) is child:
+                            keys.append(child[4])
+        for entry in self._pending:
+            if entry[0] <= xmax and entry[2] >= xmin and entry[1] <= ymax and entry[3] >= ymin \
+                    and entries.get(entry[4]) is entry:
+                keys.append(entry[4])
+
+        order = self._layout_order
+        keys.sort(key=lambda key: (order[key[0]], key[1] or ""))
+        return keys
+
+    def dataframes_at(self, x, y):
+        """
+        Data frames whose extent contains a point, in layout order
+        :return: (layout name, data frame name) pairs
+        :rtype: list
+        """
+        return self._search(x, y, x, y)
+
+    def dataframes_intersecting(self, xmin, ymin, xmax, ymax):
+        """
+        Data frames whose extent intersects a bounding box, in layout order
+        :return: (layout name, data frame name) pairs
+        :rtype: list
+        """
+        return self._search(xmin, ymin, xmax, ymax)
+
+    def layouts_at(self, x, y):
+        """
+        Layouts with a data frame whose extent contains a point, in layout order
+        :rtype: list
+        """
+        return _unique_layouts(self._search(x, y, x, y))
+
+    def layouts_intersecting(self, xmin, ymin, xmax, ymax):
+        """
+        Layouts with a data frame whose extent intersects a bounding box, in layout order
+        :rtype: list
+        """
+        return _unique_layouts(self._search(xmin, ymin, xmax, ymax))
+
+    def extent(self, layout_name, dataframe_name):
+        """
+        Indexed extent of a data frame as (xmin, ymin, xmax, ymax), None if not indexed
+        """
+        entry = self._entries.get((layout_name, dataframe_name))
+        return None if entry is None else entry[:4]
+
+
+def _unique_layouts(keys):
+    layouts = []
+    for layout_name, _ in keys:
+        if not layouts or layouts[-1] != layout_name:
+            layouts.append(layout_name)
+    return layouts
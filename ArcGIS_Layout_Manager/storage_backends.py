@@ -0,0 +1,561 @@
+from __future__ import print_function
+from __future__ import division
+
+import collections
+import hashlib
+import json
+import marshal
+import os
+import sqlite3
+import gzip
+import sys
+import tempfile
+
+from . import layout_codec, layout_storage
+
+"""
+Storage backends for the layouts of a map document
+Each backend reads an index of the stored layouts, loads single layout records and writes changed layouts.
+JSONLayoutStorage - the <mxd>_layout.json file next to the map document (default), read and written as a stream,
+optionally gzip compressed
+SQLiteLayoutStorage - <mxd>_layout.sqlite with one row per layout, element and table of contents item,
+so saving a changed layout only writes that layout
+Backends also report a version of the store and a signature per stored layout, so changes made by other
+processes can be found without loading the layouts.
+"""
+
+
+def storage_for_document(mxd_path, storage="json"):
+    """
+    Storage next to a map document, Ex: C:\\sample.mxd -> C:\\sample_layout.json
+    :param mxd_path: path to the map document
+    :param storage: "json", "sqlite" or a LayoutStorage which is returned as is
+    :rtype: LayoutStorage
+    """
+    if isinstance(storage, LayoutStorage):
+        return storage
+    mxd_name = os.path.basename(mxd_path).replace(".mxd", "")
+    storage_path = os.path.join(os.path.dirname(mxd_path), "{}_layout.{}".format(mxd_name, storage))
+    if storage == "json":
+        return JSONLayoutStorage(storage_path)
+    elif storage == "sqlite":
+        return SQLiteLayoutStorage(storage_path)
+    raise ValueError("Unknown layout storage {}".format(storage))
+
+
+class LayoutStorage(object):
+    """
+    Interface for layout storage backends
+    """
+    path = None
+
+    def exists(self):
+        raise NotImplementedError()
+
+    def create(self):
+        """
+        Create an empty store
+        """
+        raise NotImplementedError()
+
+    def read_index(self):
+        """
+        Read the stored layout names and settings
+        :return: layout name to (record, base), or None when the record is loaded on demand through read_record,
+        and the stored settings (toc_active, lyr_active)
+        :rtype: (collections.OrderedDict, dict)
+        """
+        raise NotImplementedError()
+
+    def read_record(self, layout_name):
+        """
+        Load the flat record of a single layout
+        """
+        raise NotImplementedError()
+
+    def list_layouts(self):
+        """
+        List the stored layout names without loading any layout
+        """
+        return list(self.read_index()[0])
+
+    def version(self):
+        """
+        Cheap token that changes whenever the store may have changed
+        """
+        raise NotImplementedError()
+
+    def content_version(self):
+        """
+        Token that only changes when the stored content changes, may read the whole store
+        """
+        return self.version()
+
+    def signatures(self, index):
+        """
+        Signature of each stored layout, changing when the stored record of the layout changes
+        :param index: layout index from read_index
+        :return: layout name to signature
+        :rtype: dict
+        """
+        raise NotImplementedError()
+
+    def write(self, layouts, changed_layouts, settings, format_version=layout_storage.OVERRIDE_FORMAT,
+              compress=False, compact=False):
+        """
+        Save layouts
+        :param layouts: all layouts
+        :type layouts: layout_storage.LayoutCollection
+        :param changed_layouts: names of the layouts changed since the last write
+        :type changed_layouts: set
+        :param settings: toc_active and lyr_active settings
+        :type settings: dict
+        :param format_version: json format, only used by file based storage
+        :param compress: gzip compress the file, only used by file based storage
+        :param compact: write json without indentation, only used by file based storage
+        :return: signatures of the stored layouts
+        :rtype: dict
+        """
+        raise NotImplementedError()
+
+
+class JSONLayoutStorage(LayoutStorage):
+    """
+    The file is read as a stream once for the index, keeping the offsets of each layout record (and the shared base),
+    records are then read from their offsets when a layout is used. A compressed file is read from the nearest
+    point of a layout_codec.GzipIndex taken while scanning, so only the index is held rather than the records.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # state of the file as last scanned, see _scan
+        self._scanned = None
+
+    def exists(self):
+        return os.path.isfile(self.path)
+
+    def create(self):
+        with open(self.path, 'w') as fl:
+            fl.write("[]")
+
+    def read_index(self):
+        scanned = self._scan()
+        index = collections.OrderedDict((layout_name, None) for layout_name in scanned['locations'])
+        return index, scanned['settings']
+
+    def _scan(self):
+        """
+        Read the file as a stream, keeping where each record is, its signature, the base and the settings
+        Records are never all held at once, except those of a format 2 file written with the base after its layouts
+        """
+        version = self.version()
+        gzip_index = layout_codec.GzipIndex() if layout_codec.is_compressed(self.path) else None
+        locations = collections.OrderedDict()
+        signatures = {}
+        settings = {}
+        header = {}
+        held = []
+        base_digests = None
+        for kind, value in layout_codec.iter_file(self.path, located=True, gzip_index=gzip_index):
+            if kind == "header":
+                header[value[0]] = value[1]
+                continue
+            record, start, end = value
+            layout_name = record.get('layout_name')
+            locations[layout_name] = (start, end)
+            if not header:
+                # flat records hold the settings themselves
+                settings['toc_active'] = record.get('toc_active', True)
+                settings['lyr_active'] = record.get('lyr_active', True)
+                signatures[layout_name] = _record_signature(record)
+            elif 'base' in header:
+                if base_digests is None:
+                    base_digests = _base_digests(header['base'])
+                signatures[layout_name] = _record_signature(record, header['base'], base_digests)
+            else:
+                held.append(record)
+
+        base = header.get('base')
+        if header:
+            settings = {
+                'toc_active': header.get('toc_active', True),
+                'lyr_active': header.get('lyr_active', True)
+            }
+            base = base or {}
+        for record in held:
+            signatures[record.get('layout_name')] = _record_signature(record, base)
+
+        self._scanned = {
+            'version': version,
+            'locations': locations,
+            'gzip_index': gzip_index,
+            'signatures': signatures,
+            'settings': settings,
+            'base': base
+        }
+        return self._scanned
+
+    def read_record(self, layout_name):
+        scanned = self._scanned
+        if scanned is None or scanned['version'] != self.version():
+            # written since the index was read, by this manager or another process
+            scanned = self._scan()
+        start, end = scanned['locations'][layout_name]
+        record = layout_codec.read_located(self.path, start, end, scanned['gzip_index'])
+        if scanned['base'] is None:
+            return record
+        return layout_storage.resolve_record(record, scanned['base'])
+
+    def version(self):
+        if not self.exists():
+            return None
+        stat = os.stat(self.path)
+        return stat.st_mtime, stat.st_size
+
+    def content_version(self):
+        if not self.exists():
+            return None
+        digest = hashlib.sha1()
+        with open(self.path, 'rb') as fl:
+            for chunk in iter(lambda: fl.read(layout_codec.CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def signatures(self, index):
+        # taken from the records once resolved when the file was scanned, so a change of the shared base
+        # only changes the layouts it affects
+        scanned = self._scanned if self._scanned is not None else self._scan()
+        return dict((layout_name, scanned['signatures'][layout_name]) for layout_name in index)
+
+    def write(self, layouts, changed_layouts, settings, format_version=layout_storage.OVERRIDE_FORMAT,
+              compress=False, compact=False):
+        # the json file always holds every layout, records are made one at a time as they are written
+        signatures = {}
+        # records of built layouts, kept from the base layout pass for the writing pass
+        built_records = {}
+
+        def records():
+            for layout_name in layouts:
+                record = built_records.pop(layout_name, None)
+                if record is None:
+                    record = layouts.record(layout_name)
+                    if layouts.is_loaded(layout_name):
+                        built_records[layout_name] = record
+                yield record
+
+        def on_record(record):
+            signatures[record.get('layout_name')] = _record_signature(record)
+
+        _write_atomic(self.path, lambda fl: layout_codec.write_layouts(
+            fl, records, settings, format_version, compact, on_record
+        ), compress)
+        return signatures
+
+
+class SQLiteLayoutStorage(LayoutStorage):
+    """
+    Layouts stored in SQLite, using write ahead logging so readers keep working while a layout is written
+    Layout names are stored json encoded to keep numeric names (data driven page ids) as numbers
+    Every write increases the store revision and stamps the written layouts with it
+    """
+    _schema = (
+        "CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)",
+        "CREATE TABLE IF NOT EXISTS layouts (layout_key TEXT PRIMARY KEY, position INTEGER)",
+        "CREATE TABLE IF NOT EXISTS layout_elements (layout_key TEXT, element_type TEXT, element_name TEXT, "
+        "data TEXT, PRIMARY KEY (layout_key, element_type, element_name))",
+        "CREATE TABLE IF NOT EXISTS toc_items (layout_key TEXT, long_name TEXT, data TEXT, "
+        "PRIMARY KEY (layout_key, long_name))",
+        "CREATE TABLE IF NOT EXISTS layout_revisions (layout_key TEXT PRIMARY KEY, revision INTEGER)",
+    )
+
+    # settings key of the store revision, counting writes
+    _revision_key = "revision"
+
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=self.timeout)
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    def exists(self):
+        return os.path.isfile(self.path)
+
+    def create(self):
+        connection = self._connect()
+        try:
+            with connection:
+                for statement in self._schema:
+                    connection.execute(statement)
+        finally:
+            connection.close()
+
+    def read_index(self):
+        connection = self._connect()
+        try:
+            settings = {}
+            for key, value in connection.execute("SELECT key, value FROM settings WHERE key != ?",
+                                                 (self._revision_key,)):
+                settings[key] = json.loads(value)
+            index = collections.OrderedDict()
+            for (layout_key,) in connection.execute("SELECT layout_key FROM layouts ORDER BY position"):
+                index[json.loads(layout_key)] = None
+        finally:
+            connection.close()
+        return index, settings
+
+    def read_record(self, layout_name):
+        layout_key = json.dumps(layout_name)
+        connection = self._connect()
+        try:
+            layout_items = {}
+            rows = connection.execute(
+                "SELECT element_type, data FROM layout_elements WHERE layout_key = ?", (layout_key,)
+            )
+            for element_type, data in rows:
+                layout_items.setdefault(element_type, []).append(json.loads(data))
+            toc_items = {}
+            for long_name, data in connection.execute(
+                    "SELECT long_name, data FROM toc_items WHERE layout_key = ?", (layout_key,)):
+                toc_items[long_name] = json.loads(data)
+        finally:
+            connection.close()
+        return {
+            'layout_name': layout_name,
+            'layout_items': layout_items,
+            'toc_items': toc_items
+        }
+
+    def _revision(self, connection):
+        row = connection.execute("SELECT value FROM settings WHERE key = ?", (self._revision_key,)).fetchone()
+        return 0 if row is None else json.loads(row[0])
+
+    def version(self):
+        if not self.exists():
+            return None
+        connection = self._connect()
+        try:
+            return self._revision(connection)
+        finally:
+            connection.close()
+
+    def signatures(self, index):
+        # layouts written before revisions were recorded are at revision 0
+        connection = self._connect()
+        try:
+            try:
+                revisions = dict(
+                    (json.loads(layout_key), revision) for layout_key, revision in
+                    connection.execute("SELECT layout_key, revision FROM layout_revisions")
+                )
+            except sqlite3.OperationalError:
+                revisions = {}
+            layout_names = [json.loads(layout_key) for (layout_key,) in
+                            connection.execute("SELECT layout_key FROM layouts")]
+        finally:
+            connection.close()
+        return dict((layout_name, revisions.get(layout_name, 0)) for layout_name in layout_names)
+
+    def write(self, layouts, changed_layouts, settings, format_version=layout_storage.OVERRIDE_FORMAT,
+              compress=False, compact=False):
+        connection = self._connect()
+        try:
+            with connection:
+                # older stores are created without the revisions table
+                connection.execute(self._schema[-1])
+                revision = self._revision(connection) + 1
+                connection.execute(
+                    "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                    (self._revision_key, json.dumps(revision))
+                )
+                for key in settings:
+                    connection.execute(
+                        "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, json.dumps(settings[key]))
+                    )
+                for layout_name in changed_layouts:
+                    if layout_name in layouts:
+                        self._write_layout(connection, layouts.record(layout_name))
+                        connection.execute(
+                            "INSERT OR REPLACE INTO layout_revisions (layout_key, revision) VALUES (?, ?)",
+                            (json.dumps(layout_name), revision)
+                        )
+                    else:
+                        self._delete_layout(connection, json.dumps(layout_name))
+                        connection.execute(
+                            "DELETE FROM layout_revisions WHERE layout_key = ?", (json.dumps(layout_name),)
+                        )
+        finally:
+            connection.close()
+        return self.signatures(None)
+
+    @staticmethod
+    def _delete_layout(connection, layout_key):
+        connection.execute("DELETE FROM layout_elements WHERE layout_key = ?", (layout_key,))
+        connection.execute("DELETE FROM toc_items WHERE layout_key = ?", (layout_key,))
+        connection.execute("DELETE FROM layouts WHERE layout_key = ?", (layout_key,))
+
+    def _write_layout(self, connection, record):
+        layout_key = json.dumps(record.get('layout_name'))
+        existing = connection.execute("SELECT position FROM layouts WHERE layout_key = ?", (layout_key,)).fetchone()
+        if existing is None:
+            position = connection.execute("SELECT COALESCE(MAX(position), 0) + 1 FROM layouts").fetchone()[0]
+        else:
+            position = existing[0]
+
+        self._delete_layout(connection, layout_key)
+        connection.execute("INSERT INTO layouts (layout_key, position) VALUES (?, ?)", (layout_key, position))
+
+        layout_items = record.get('layout_items', {})
+        connection.executemany(
+            "INSERT INTO layout_elements (layout_key, element_type, element_name, data) VALUES (?, ?, ?, ?)",
+            [(layout_key, element_type, element.get('name'), json.dumps(element))
+             for element_type in layout_items for element in layout_items[element_type]]
+        )
+        toc_items = record.get('toc_items', {})
+        connection.executemany(
+            "INSERT INTO toc_items (layout_key, long_name, data) VALUES (?, ?, ?)",
+            [(layout_key, long_name, json.dumps(toc_items[long_name])) for long_name in toc_items]
+        )
+
+
+def _write_atomic(path, write, compress=False):
+    """
+    Write a file through a temp file in the same folder, swapped in once complete so readers
+    never see a partly written file
+    :param write: function writing the content to the binary file it's given
+    :param compress: gzip compress the content
+    """
+    handle, temp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                                         dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(handle, 'wb') as fl:
+            if compress:
+                with gzip.GzipFile(filename="", mode='wb', fileobj=fl) as compressed:
+                    write(compressed)
+            else:
+                write(fl)
+            fl.flush()
+            os.fsync(fl.fileno())
+        # mkstemp creates the file readable by the owner only, keep the mode a plain write would give
+        os.chmod(temp_path, _file_mode(path))
+        _replace_file(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _read_umask():
+    # the umask can only be read by setting it, done once on import rather than while a writer thread runs
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+_UMASK = _read_umask()
+
+
+def _file_mode(path):
+    """
+    Permission bits of an existing file, or of a new file under the current umask
+    """
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except OSError:
+        return 0o666 & ~_UMASK
+
+
+# MoveFileExW flags
+_MOVEFILE_REPLACE_EXISTING = 0x1
+_MOVEFILE_WRITE_THROUGH = 0x8
+
+
+def _replace_file(source, destination):
+    if hasattr(os, "replace"):
+        os.replace(source, destination)
+        return
+    if sys.platform.startswith("win"):
+        # python 2 on windows can't rename over an existing file, MoveFileEx replaces it in one step
+        import ctypes
+        if isinstance(source, bytes):
+            source = source.decode(sys.getfilesystemencoding())
+        if isinstance(destination, bytes):
+            destination = destination.decode(sys.getfilesystemencoding())
+        flags = _MOVEFILE_REPLACE_EXISTING | _MOVEFILE_WRITE_THROUGH
+        if not ctypes.windll.kernel32.MoveFileExW(source, destination, flags):
+            raise ctypes.WinError()
+        return
+    os.rename(source, destination)
+
+
+_SIGNATURE_MODULUS = 2 ** 160
+
+
+def _item_digest(section, group, key, item):
+    # signatures never leave the process, marshal is exact and much cheaper than text for the float values
+    # version 2 has no references, so the bytes don't depend on which values share an object
+    data = marshal.dumps((section, group, key, sorted(item.items())), 2)
+    return int(hashlib.sha1(data).hexdigest(), 16)
+
+
+def _base_digests(base):
+    """
+    Digest of every item of a base and their total, see _record_signature
+    :rtype: (dict, int)
+    """
+    digests = {}
+    for element_type, elements in base.get('layout_items', {}).items():
+        for key, item in elements.items():
+            digests[('layout_items', element_type, key)] = _item_digest('layout_items', element_type, key, item)
+    for key, item in base.get('toc_items', {}).items():
+        digests[('toc_items', None, key)] = _item_digest('toc_items', None, key, item)
+    return digests, sum(digests.values()) % _SIGNATURE_MODULUS
+
+
+def _record_signature(record, base=None, base_digests=None):
+    """
+    Signature of a layout's flat record, from the flat record or from its overrides and the base
+    Each element and toc item is hashed on its own and the digests added up, so a record in the overrides format
+    starts from the total of the base and only its overridden and missing items are hashed, it's never resolved
+    :param base: base of an overrides record, None for a flat record
+    :param base_digests: _base_digests of the base
+    :type base_digests: (dict, int)
+    :rtype: str
+    """
+    if base is None:
+        total = sum(_item_digest(section, group, key, item)
+                    for section, group, key, item in layout_storage._record_groups(record))
+    else:
+        digests, total = base_digests if base_digests is not None else _base_digests(base)
+        missing_items = record.get('missing_items', {})
+        groups = [('layout_items', element_type, base.get('layout_items', {}).get(element_type, {}), overrides,
+                   missing_items.get(element_type, []), 'name')
+                  for element_type, overrides in record.get('layout_items', {}).items()]
+        groups.extend(('layout_items', element_type, base.get('layout_items', {}).get(element_type, {}), {}, missing,
+                       'name')
+                      for element_type, missing in missing_items.items()
+                      if element_type not in record.get('layout_items', {}))
+        groups.append(('toc_items', None, base.get('toc_items', {}), record.get('toc_items', {}),
+                       record.get('missing_toc_items', []), 'long_name'))
+        # the same items as layout_storage.resolve_record
+        for section, group, base_group, override_group, missing, key_field in groups:
+            missing = set(key for key in missing if key in base_group)
+            for key in missing:
+                total -= digests[(section, group, key)]
+            for key, override in override_group.items():
+                if key in missing:
+                    continue
+                if key in base_group:
+                    item = dict(base_group[key])
+                    item.update(override)
+                    total -= digests[(section, group, key)]
+                else:
+                    item = dict(override)
+                    item.setdefault(key_field, key)
+                total += _item_digest(section, group, key, item)
+
+    signature = hashlib.sha1(json.dumps(record.get('layout_name')).encode("utf-8"))
+    signature.update("{:x}".format(total % _SIGNATURE_MODULUS).encode("utf-8"))
+    return signature.hexdigest()
@@ -1,16 +1,16 @@
+from .interning import intern_string
+
+
 class TableOfContentsItem(object):
-    layer_name = ""
-    long_name = ""
-    visible = True
-    group_layer = False
-    transparency = 0.0
+    # slots instead of a per instance __dict__, there is one item per layer per layout
+    __slots__ = ("layer_name", "long_name", "visible", "group_layer", "transparency")
 
     def __init__(self, layer_object):
         if type(layer_object) is dict:
             self.visible = layer_object.get('visible')
-            self.long_name = layer_object.get('long_name')
+            self.long_name = intern_string(layer_object.get('long_name'))
             self.transparency = layer_object.get('transparency')
-            self.layer_name = layer_object.get('layer_name')
+            self.layer_name = intern_string(layer_object.get('layer_name'))
             self.group_layer = layer_object.get('group_layer')
         else:
             if self._supports(layer_object, "VISIBLE"):
@@ -19,7 +19,7 @@ class TableOfContentsItem(object):
                 self.visible = None
 
             if self._supports(layer_object, "LONGNAME"):
-                self.long_name = layer_object.longName
+                self.long_name = intern_string(layer_object.longName)
             else:
                 self.long_name = None
 
@@ -29,7 +29,7 @@ class TableOfContentsItem(object):
                 self.transparency = None
 
             if self._supports(layer_object, "NAME"):
-                self.layer_name = layer_object.name
+                self.layer_name = intern_string(layer_object.name)
             else:
                 self.layer_name = None
 
@@ -51,12 +51,47 @@ class TableOfContentsItem(object):
         }
         return dict_item
 
-    def update_toc_feature(self, arcpy_toc_object):
+    def changed_properties(self, previous):
+        """
+        List the toc properties that differ from a previously applied item
+        :param previous: item last applied to (or captured from) the map, None if unknown
+        :type previous: TableOfContentsItem
+        :return: names of the properties that need to be written
+        :rtype: list
+        """
+        changed = []
+        for prop in ("transparency", "visible"):
+            if getattr(self, prop) is None:
+                continue
+            if previous is None or getattr(previous, prop) != getattr(self, prop):
+                changed.append(prop)
+        return changed
+
+    def with_properties(self, values):
+        """
+        Copy of the item with some properties replaced, items are shared between layouts so aren't changed
+        :param values: property name to new value
+        :type values: dict
+        :rtype: TableOfContentsItem
+        """
+        item = object.__new__(type(self))
+        for slot in self.__slots__:
+            setattr(item, slot, values[slot] if slot in values else getattr(self, slot))
+        return item
+
+    def setter_operations(self):
+        """
+        Properties written by update_toc_feature as (property, value), used by compiled apply plans
+        :rtype: list
+        """
+        return [(prop, getattr(self, prop)) for prop in ("transparency", "visible") if getattr(self, prop) is not None]
+
+    def update_toc_feature(self, arcpy_toc_object, previous=None):
         # if self.layer_name is not None:
         #     arcpy_toc_object.name = self.layer_name
         # if self.long_name is not None:
         #     arcpy_toc_object.name = self.long_name
-        if self.transparency is not None:
-            arcpy_toc_object.transparency = self.transparency
-        if self.visible is not None:
-            arcpy_toc_object.visible = self.visible
+        written = self.changed_properties(previous)
+        for prop in written:
+            setattr(arcpy_toc_object, prop, getattr(self, prop))
+        return written
@@ -0,0 +1,73 @@
+from __future__ import print_function
+from __future__ import division
+
+import hashlib
+
+"""
+Table of contents of a map document as a tree built from the layer long names, Ex: "Basemap\\Roads\\Highways"
+is a child of "Basemap\\Roads". ListLayers lists layers depth first, so every subtree is a contiguous run of layers
+and can be skipped as a whole by jumping to its end.
+Apply plans keep a signature for every subtree of a layout's table of contents, with diff_switch a subtree whose
+signature matches the one last applied is skipped during a switch without looking at its layers.
+"""
+
+
+def parent_name(long_name):
+    if long_name is None or "\\" not in long_name:
+        return None
+    return long_name.rsplit("\\", 1)[0]
+
+
+class TocTree(object):
+    """
+    handles - (arcpy layer, long name) in document order
+    parents - index of the parent layer of each layer, None for top level layers
+    children - indexes of the child layers of each layer
+    subtree_end - index after the last layer of each layer's subtree
+    skippable - whether each subtree is a contiguous run of layers
+    """
+
+    def __init__(self, layer_handles):
+        """
+        :param layer_handles: (arcpy layer, long name) of every layer in the document, in ListLayers order
+        :type layer_handles: list
+        """
+        self.handles = layer_handles
+        self.parents = []
+        self.children = [[] for _ in layer_handles]
+
+        # the last layer seen with a long name, a layer listed in two data frames is a parent in the frame
+        # it was last listed in
+        last_seen = {}
+        for index, (handle, long_name) in enumerate(layer_handles):
+            parent = last_seen.get(parent_name(long_name))
+            self.parents.append(parent)
+            if parent is not None:
+                self.children[parent].append(index)
+            last_seen[long_name] = index
+
+        self.subtree_end = list(range(1, len(layer_handles) + 1))
+        sizes = [1] * len(layer_handles)
+        for index in range(len(layer_handles) - 1, -1, -1):
+            for child in self.children[index]:
+                sizes[index] += sizes[child]
+                self.subtree_end[index] = max(self.subtree_end[index], self.subtree_end[child])
+        # a subtree can only be skipped by jumping to its end when its layers are listed together
+        self.skippable = [self.subtree_end[index] - index == sizes[index] for index in range(len(layer_handles))]
+
+    def __len__(self):
+        return len(self.handles)
+
+    def signatures(self, states):
+        """
+        Signature of every subtree, a digest of the state of its layer and the signatures of its children, so equal
+        signatures mean equal subtrees
+        :param states: state of each layer in document order, as tuples of plain values
+        :type states: list
+        :rtype: list
+        """
+        signatures = [None] * len(self.handles)
+        for index in range(len(self.handles) - 1, -1, -1):
+            subtree = (states[index], [signatures[child] for child in self.children[index]])
+            signatures[index] = hashlib.sha1(repr(subtree).encode("utf-8")).hexdigest()
+        return signatures
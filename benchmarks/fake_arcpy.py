@@ -0,0 +1,289 @@
+from __future__ import print_function
+from __future__ import division
+
+import collections
+import json
+import sys
+import time
+import types
+
+"""
+Pure python stand in for the parts of arcpy/arcview used by the LayoutManager
+Every property read and write on a map document object goes through a counter and can be given a cost in seconds,
+modelling the COM round trip of the real arcpy objects.
+
+Map documents are json spec files written by generate_document, so any process can open the same document.
+Usage:
+    import fake_arcpy
+    fake_arcpy.install()
+    fake_arcpy.generate_document("/tmp/bench.mxd", elements=500, layers=200, pages=100)
+    fake_arcpy.configure(get_cost=0.00005, set_cost=0.0002)
+"""
+
+_perf_counter = getattr(time, "perf_counter", time.time)
+
+# (operation, object kind) -> count, operation is get, set or call
+counters = collections.Counter()
+
+_costs = {
+    "get": 0.0,
+    "set": 0.0,
+    "call": 0.0
+}
+
+ELEMENT_TYPES = (
+    "DATAFRAME_ELEMENT",
+    "GRAPHIC_ELEMENT",
+    "LEGEND_ELEMENT",
+    "MAPSURROUND_ELEMENT",
+    "PICTURE_ELEMENT",
+    "TEXT_ELEMENT"
+)
+
+
+def configure(get_cost=0.0, set_cost=0.0, call_cost=0.0):
+    """
+    Set the simulated cost in seconds of each property read, property write and function call
+    """
+    _costs["get"] = get_cost
+    _costs["set"] = set_cost
+    _costs["call"] = call_cost
+
+
+def reset_counters():
+    counters.clear()
+
+
+def counter_totals():
+    """
+    :return: total get, set and call counts
+    :rtype: dict
+    """
+    totals = {"get": 0, "set": 0, "call": 0}
+    for (operation, kind), count in counters.items():
+        totals[operation] += count
+    return totals
+
+
+def _record(operation, kind):
+    counters[(operation, kind)] += 1
+    cost = _costs[operation]
+    if cost > 0:
+        end = _perf_counter() + cost
+        while _perf_counter() < end:
+            pass
+
+
+class _ComObject(object):
+    """
+    Object whose fields are only reachable through counted property access
+    """
+    _kind = "OBJECT"
+
+    def __init__(self, **fields):
+        object.__setattr__(self, "_fields", fields)
+
+    def __getattr__(self, name):
+        fields = object.__getattribute__(self, "_fields")
+        if name not in fields:
+            raise AttributeError(name)
+        _record("get", self._kind)
+        value = fields[name]
+        if isinstance(value, Extent):
+            value = value.copy()
+        return value
+
+    def __setattr__(self, name, value):
+        _record("set", self._kind)
+        if isinstance(value, Extent):
+            value = value.copy()
+        self._fields[name] = value
+
+
+class Extent(_ComObject):
+    _kind = "EXTENT"
+
+    def __init__(self, XMin=0.0, YMin=0.0, XMax=0.0, YMax=0.0):
+        super(Extent, self).__init__(XMin=XMin, YMin=YMin, XMax=XMax, YMax=YMax)
+
+    def copy(self):
+        fields = object.__getattribute__(self, "_fields")
+        return Extent(fields["XMin"], fields["YMin"], fields["XMax"], fields["YMax"])
+
+
+class LayoutElement(_ComObject):
+    def __init__(self, **fields):
+        super(LayoutElement, self).__init__(**fields)
+        object.__setattr__(self, "_kind", fields["type"])
+
+
+class Layer(_ComObject):
+    _kind = "LAYER"
+
+    def supports(self, support_arg):
+        _record("call", self._kind)
+        return support_arg in ("VISIBLE", "LONGNAME", "TRANSPARENCY", "NAME")
+
+
+class PageSize(_ComObject):
+    _kind = "PAGESIZE"
+
+
+class DataDrivenPages(object):
+    """
+    Changing the current page moves the first data frame, as a data driven index layer would
+    """
+
+    def __init__(self, map_document, page_count):
+        self._map_document = map_document
+        self.pageCount = page_count
+        self._current_page_id = 1
+
+    def getPageIDFromName(self, page_name):
+        _record("call", "DATADRIVENPAGES")
+        return int(page_name)
+
+    @property
+    def currentPageID(self):
+        _record("get", "DATADRIVENPAGES")
+        return self._current_page_id
+
+    @currentPageID.setter
+    def currentPageID(self, page_id):
+        _record("set", "DATADRIVENPAGES")
+        self._current_page_id = page_id
+        for element in self._map_document._elements:
+            if element._kind == "DATAFRAME_ELEMENT":
+                offset = page_id * 1000.0
+                element._fields["extent"] = Extent(offset, offset, offset + 900.0, offset + 600.0)
+                break
+
+
+class MapDocument(object):
+    def __init__(self, mxd_path):
+        if mxd_path == "CURRENT":
+            raise RuntimeError("fake arcpy has no running ArcMap session")
+        with open(mxd_path, 'r') as fl:
+            spec = json.loads(fl.read())
+        self.filePath = mxd_path
+        self.pageSize = PageSize(width=spec["page_width"], height=spec["page_height"])
+        self._elements = [_build_element(element_spec) for element_spec in spec["elements"]]
+        self._layers = [Layer(**layer_spec) for layer_spec in spec["layers"]]
+        self.dataDrivenPages = DataDrivenPages(self, spec["pages"])
+
+
+def _build_element(element_spec):
+    fields = dict(element_spec)
+    if "extent" in fields:
+        fields["extent"] = Extent(*fields["extent"])
+    return LayoutElement(**fields)
+
+
+def ListLayoutElements(map_document, element_type=None, wildcard=None):
+    _record("call", "MAPPING")
+    if element_type is None:
+        return list(map_document._elements)
+    return [element for element in map_document._elements if element._kind == element_type]
+
+
+def ListLayers(map_document, wildcard=None, data_frame=None):
+    _record("call", "MAPPING")
+    return list(map_document._layers)
+
+
+def _export(map_document, out_path, *args, **kwargs):
+    _record("call", "MAPPING")
+    with open(out_path, 'w') as fl:
+        fl.write(json.dumps([object.__getattribute__(element, "_fields").get("name")
+                             for element in map_document._elements]))
+
+
+def RefreshTOC():
+    _record("call", "APPLICATION")
+
+
+def RefreshActiveView():
+    _record("call", "APPLICATION")
+
+
+def generate_document(mxd_path, elements=100, layers=100, pages=1, group_size=10, page_width=11.0, page_height=8.5):
+    """
+    Write a synthetic map document spec
+    Elements cycle through the element types with the graphic and text elements left unnamed,
+    layers are split into group layers of group_size
+    :param mxd_path: path of the spec file, opened with MapDocument
+    :param elements: number of layout elements
+    :param layers: number of layers including group layers
+    :param pages: number of data driven pages
+    :param group_size: layers per group layer
+    :return: the opened map document
+    :rtype: MapDocument
+    """
+    element_specs = []
+    for index in range(elements):
+        element_type = ELEMENT_TYPES[index % len(ELEMENT_TYPES)]
+        spec = {
+            "type": element_type,
+            "name": "" if element_type in ("GRAPHIC_ELEMENT", "TEXT_ELEMENT") else "{}_{}".format(element_type, index),
+            "elementPositionX": float(index % 10),
+            "elementPositionY": float(index % 7),
+            "elementWidth": 1.0 + index % 3,
+            "elementHeight": 0.5 + index % 2
+        }
+        if element_type == "DATAFRAME_ELEMENT":
+            spec["extent"] = [0.0, 0.0, 900.0, 600.0]
+        elif element_type == "LEGEND_ELEMENT":
+            spec["title"] = "Legend"
+        elif element_type == "PICTURE_ELEMENT":
+            spec["sourceImage"] = "C:\\images\\logo_{}.png".format(index % 5)
+        elif element_type == "TEXT_ELEMENT":
+            spec.update({"text": "Text {}".format(index), "angle": 0.0, "fontSize": 10.0})
+        element_specs.append(spec)
+
+    layer_specs = []
+    group_name = None
+    for index in range(layers):
+        is_group = index % (group_size + 1) == 0
+        if is_group:
+            group_name = "Group {}".format(index)
+            long_name = group_name
+            name = group_name
+        else:
+            name = "Layer {}".format(index)
+            long_name = "{}\\{}".format(group_name, name)
+        layer_specs.append({
+            "name": name,
+            "longName": long_name,
+            "visible": index % 3 != 0,
+            "transparency": 0,
+            "isGroupLayer": is_group
+        })
+
+    with open(mxd_path, 'w') as fl:
+        fl.write(json.dumps({
+            "page_width": page_width,
+            "page_height": page_height,
+            "pages": pages,
+            "elements": element_specs,
+            "layers": layer_specs
+        }))
+    return MapDocument(mxd_path)
+
+
+def install():
+    """
+    Register this module as arcpy (with arcpy.mapping) and an empty arcview module
+    """
+    module = sys.modules[__name__]
+    mapping = types.ModuleType("arcpy.mapping")
+    mapping.MapDocument = MapDocument
+    mapping.ListLayoutElements = ListLayoutElements
+    mapping.ListLayers = ListLayers
+    mapping.ExportToJPEG = _export
+    mapping.ExportToPNG = _export
+    mapping.ExportToPDF = _export
+    module.mapping = mapping
+    sys.modules["arcpy"] = module
+    sys.modules["arcpy.mapping"] = mapping
+    sys.modules.setdefault("arcview", types.ModuleType("arcview"))
+    return module
@@ -0,0 +1,110 @@
+from __future__ import print_function
+from __future__ import division
+
+import argparse
+import gc
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+
+"""
+Memory used by loaded layouts, with the slotted and interned element classes against plain objects with a
+per instance __dict__ and no interning (the element classes before __slots__)
+Each layout is built from its own json parsed record, as when layouts are loaded from the layout json.
+Needs python 3 for tracemalloc.
+Ex:
+    python benchmarks/memory_benchmark.py --elements 500 --layers 200 --layouts 200
+"""
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+sys.path.insert(0, BENCHMARK_DIR)
+
+import fake_arcpy
+
+fake_arcpy.install()
+
+from ArcGIS_Layout_Manager import LayoutManager
+from ArcGIS_Layout_Manager import layout_elements, layout_storage
+
+import tracemalloc
+
+TOC_FIELDS = ("layer_name", "long_name", "visible", "group_layer", "transparency")
+
+
+class LegacyItem(object):
+    """
+    Plain object holding the same fields as an element or table of contents item
+    """
+
+    def __init__(self, fields, item_dict):
+        for field in fields:
+            setattr(self, field, item_dict.get(field))
+
+
+def legacy_layout(record):
+    layout_items = {}
+    for element_type, element_dicts in record['layout_items'].items():
+        fields = layout_elements.layout_object_mapper[element_type]._properties
+        layout_items[element_type] = dict(
+            (element_dict.get('name'), LegacyItem(fields, element_dict)) for element_dict in element_dicts
+        )
+    toc_items = dict(
+        (long_name, LegacyItem(TOC_FIELDS, item_dict)) for long_name, item_dict in record['toc_items'].items()
+    )
+    return {'layout_name': record['layout_name'], 'layout_items': layout_items, 'toc_items': toc_items}
+
+
+def sample_record(elements, layers):
+    work_dir = tempfile.mkdtemp(prefix="layout_memory_")
+    try:
+        mxd_path = os.path.join(work_dir, "memory.mxd")
+        fake_arcpy.generate_document(mxd_path, elements=elements, layers=layers)
+        manager = LayoutManager(mxd_path=mxd_path)
+        manager.auto_save = False
+        manager.create_layout("sample")
+        return json.dumps(manager._layouts.record("sample"))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def measure(build_layout, record_json, layouts):
+    """
+    Traced memory held by the built layouts once the parsed records are freed, including the strings they keep
+    """
+    gc.collect()
+    tracemalloc.start()
+    built = [build_layout(json.loads(record_json)) for _ in range(layouts)]
+    gc.collect()
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del built
+    return current
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--elements", type=int, default=500)
+    parser.add_argument("--layers", type=int, default=200)
+    parser.add_argument("--layouts", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.ERROR)
+
+    record_json = sample_record(args.elements, args.layers)
+    items = (args.elements + args.layers) * args.layouts
+    print("elements={} layers={} layouts={}".format(args.elements, args.layers, args.layouts))
+    print("{:<12}{:>14}{:>18}".format("classes", "MB", "bytes per item"))
+    results = {}
+    for name, build_layout in (("legacy", legacy_layout), ("slotted", layout_storage.record_to_layout)):
+        results[name] = measure(build_layout, record_json, args.layouts)
+        print("{:<12}{:>14.2f}{:>18.1f}".format(name, results[name] / (1024.0 * 1024.0), results[name] / items))
+    print("slotted uses {:.0%} of legacy".format(results["slotted"] / results["legacy"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+from __future__ import print_function
+from __future__ import division
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+"""
+Benchmark the LayoutManager against a synthetic map document using the fake arcpy module
+Reports wall time, arcpy property reads, writes and calls, and peak python memory for each operation.
+Ex:
+    python benchmarks/run_benchmarks.py --elements 500 --layers 200 --layouts 100
+    python benchmarks/run_benchmarks.py --preset large --json results.json
+    python benchmarks/run_benchmarks.py --baseline results.json
+"""
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+sys.path.insert(0, BENCHMARK_DIR)
+
+import fake_arcpy
+
+fake_arcpy.install()
+
+from ArcGIS_Layout_Manager import LayoutManager
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+_perf_counter = getattr(time, "perf_counter", time.time)
+
+PRESETS = {
+    "small": {"elements": 10, "layers": 10, "layouts": 1},
+    "medium": {"elements": 500, "layers": 200, "layouts": 100},
+    "large": {"elements": 5000, "layers": 2000, "layouts": 1000},
+    "mapbook": {"elements": 50, "layers": 100, "layouts": 10000},
+}
+
+
+class BenchmarkResult(object):
+    def __init__(self, operation, seconds, calls, peak_memory):
+        self.operation = operation
+        self.seconds = seconds
+        self.calls = calls
+        self.peak_memory = peak_memory
+
+    def to_dictionary(self):
+        return {
+            "operation": self.operation,
+            "seconds": self.seconds,
+            "get": self.calls["get"],
+            "set": self.calls["set"],
+            "call": self.calls["call"],
+            "peak_memory": self.peak_memory
+        }
+
+
+def measure(operation, function, track_memory=True):
+    """
+    Run function once, recording wall time, fake arcpy call counts and peak traced memory
+    """
+    fake_arcpy.reset_counters()
+    if track_memory and tracemalloc is not None:
+        tracemalloc.start()
+    start = _perf_counter()
+    function()
+    seconds = _perf_counter() - start
+    peak_memory = None
+    if track_memory and tracemalloc is not None:
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return BenchmarkResult(operation, seconds, fake_arcpy.counter_totals(), peak_memory)
+
+
+def run(elements, layers, layouts, get_cost, set_cost, call_cost, track_memory=True, storage="json"):
+    work_dir = tempfile.mkdtemp(prefix="layout_benchmark_")
+    try:
+        mxd_path = os.path.join(work_dir, "benchmark.mxd")
+        fake_arcpy.configure()
+        fake_arcpy.generate_document(mxd_path, elements=elements, layers=layers, pages=layouts)
+
+        # build the stored layouts without any simulated latency
+        setup_manager = LayoutManager(mxd_path=mxd_path, storage=storage)
+        setup_manager.create_layouts(range(1, layouts + 1))
+        del setup_manager
+
+        fake_arcpy.configure(get_cost, set_cost, call_cost)
+        results = []
+        state = {}
+
+        def open_manager():
+            state["manager"] = LayoutManager(mxd_path=mxd_path, storage=storage)
+
+        results.append(measure("open", open_manager, track_memory))
+        manager = state["manager"]
+        layout_names = manager.list_layouts()
+        first_layout = layout_names[0]
+        last_layout = layout_names[-1]
+
+        results.append(measure("_read_layout", manager._read_layout, track_memory))
+        results.append(measure("switch_layout", lambda: manager.switch_layout(last_layout), track_memory))
+        results.append(measure("switch_layout (clean)", lambda: manager.switch_layout(first_layout), track_memory))
+
+        manager.diff_switch = True
+        results.append(measure("switch_layout (diff)", lambda: manager.switch_layout(last_layout), track_memory))
+        manager.diff_switch = False
+
+        results.append(measure("update_layout", manager.update_layout, track_memory))
+        results.append(measure("create_layout", lambda: manager.create_layout("benchmark layout"), track_memory))
+        results.append(measure("save_layout_json", manager.save_layout_json, track_memory))
+        return results
+    finally:
+        fake_arcpy.configure()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def print_results(results):
+    print("{:<24}{:>12}{:>12}{:>12}{:>12}{:>14}".format("operation", "seconds", "get", "set", "call", "peak MB"))
+    for result in results:
+        peak = "-" if result.peak_memory is None else "{:.2f}".format(result.peak_memory / (1024.0 * 1024.0))
+        print("{:<24}{:>12.4f}{:>12}{:>12}{:>12}{:>14}".format(
+            result.operation, result.seconds, result.calls["get"], result.calls["set"], result.calls["call"], peak
+        ))
+
+
+def compare_to_baseline(results, baseline_path, tolerance):
+    """
+    Compare against a previous --json run
+    Call counts are deterministic and must not grow, wall time may grow by tolerance (fraction)
+    :return: list of regression messages
+    """
+    with open(baseline_path, 'r') as fl:
+        baseline = dict((item["operation"], item) for item in json.loads(fl.read())["results"])
+
+    regressions = []
+    for result in results:
+        previous = baseline.get(result.operation)
+        if previous is None:
+            continue
+        for operation in ("get", "set", "call"):
+            if result.calls[operation] > previous[operation]:
+                regressions.append("{} {} calls {} -> {}".format(
+                    result.operation, operation, previous[operation], result.calls[operation]))
+        if result.seconds > previous["seconds"] * (1.0 + tolerance):
+            regressions.append("{} time {:.4f}s -> {:.4f}s".format(
+                result.operation, previous["seconds"], result.seconds))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="small")
+    parser.add_argument("--elements", type=int, help="layout elements, 10 to 5000")
+    parser.add_argument("--layers", type=int, help="layers, 10 to 2000")
+    parser.add_argument("--layouts", type=int, help="stored layouts, 1 to 10000")
+    parser.add_argument("--storage", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--get-cost", type=float, default=0.0, help="seconds per property read")
+    parser.add_argument("--set-cost", type=float, default=0.0, help="seconds per property write")
+    parser.add_argument("--call-cost", type=float, default=0.0, help="seconds per function call")
+    parser.add_argument("--no-memory", action="store_true", help="skip peak memory tracing")
+    parser.add_argument("--json", help="write the results to a json file")
+    parser.add_argument("--baseline", help="json results to compare against, exits 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed wall time growth against baseline")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.ERROR)
+
+    size = dict(PRESETS[args.preset])
+    for key in ("elements", "layers", "layouts"):
+        if getattr(args, key) is not None:
+            size[key] = getattr(args, key)
+
+    print("elements={elements} layers={layers} layouts={layouts}".format(**size))
+    results = run(size["elements"], size["layers"], size["layouts"], args.get_cost, args.set_cost, args.call_cost,
+                  not args.no_memory, args.storage)
+    print_results(results)
+
+    if args.json:
+        with open(args.json, 'w') as fl:
+            fl.write(json.dumps({"size": size, "results": [result.to_dictionary() for result in results]}, indent=4))
+
+    if args.baseline:
+        regressions = compare_to_baseline(results, args.baseline, args.tolerance)
+        for regression in regressions:
+            print("REGRESSION: {}".format(regression))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,26 @@
+from __future__ import print_function
+from __future__ import division
+
+import os
+import sys
+
+import pytest
+
+"""
+Tests run against the fake arcpy module of the benchmarks, so they need no ArcGIS install
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import fake_arcpy
+
+fake_arcpy.install()
+
+
+@pytest.fixture
+def mxd_path(tmpdir):
+    path = str(tmpdir.join("sample.mxd"))
+    fake_arcpy.generate_document(path, elements=12, layers=12, pages=1)
+    return path
@@ -0,0 +1,55 @@
+from __future__ import print_function
+from __future__ import division
+
+"""
+Read and edit the fake map documents of the benchmarks' fake arcpy
+"""
+
+
+def _fields(arcpy_object):
+    # read without going through the counters
+    return object.__getattribute__(arcpy_object, "_fields")
+
+
+def document_state(mxd):
+    """
+    Every element and layer property of a fake map document, in document order
+    :rtype: list
+    """
+    state = []
+    for element in mxd._elements:
+        fields = dict(_fields(element))
+        if "extent" in fields:
+            fields["extent"] = tuple(sorted(_fields(fields["extent"]).items()))
+        state.append(sorted(fields.items()))
+    for layer in mxd._layers:
+        state.append(sorted(_fields(layer).items()))
+    return state
+
+
+def changed_value(value, step):
+    if isinstance(value, bool):
+        return not value
+    if isinstance(value, (int, float)):
+        return value + step
+    return "{}_{}".format(value, step)
+
+
+def edit_document(mxd, step):
+    """
+    Give every element property and the visibility and transparency of every layer a value depending on step
+    """
+    for element in mxd._elements:
+        for field, value in list(_fields(element).items()):
+            if field in ("type", "name"):
+                continue
+            if field == "extent":
+                extent = element.extent
+                for extent_field in ("XMin", "XMax", "YMin", "YMax"):
+                    setattr(extent, extent_field, getattr(extent, extent_field) + step)
+                element.extent = extent
+            else:
+                setattr(element, field, changed_value(value, step))
+    for index, layer in enumerate(mxd._layers):
+        layer.visible = (index + step) % 2 == 0
+        layer.transparency = step * 10 % 100
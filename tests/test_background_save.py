@@ -0,0 +1,131 @@
+from __future__ import print_function
+from __future__ import division
+
+import threading
+
+import arcpy
+import pytest
+
+from ArcGIS_Layout_Manager import LayoutManager, background_save
+from document_helpers import edit_document
+
+"""
+Saving on the background writer thread, saves are coalesced and failures come back on flush
+"""
+
+
+class _Writes(object):
+    def __init__(self, error=None):
+        self.calls = []
+        self.error = error
+
+    def __call__(self, layouts, changed_layouts, settings, format_version):
+        if self.error is not None:
+            raise self.error
+        self.calls.append((layouts, set(changed_layouts), settings, format_version))
+
+
+def test_saves_waiting_together_are_written_once():
+    writes = _Writes()
+    # a long delay, only the flush starts the write
+    writer = background_save.BackgroundWriter(writes, delay=60)
+    try:
+        writer.submit("first", {"One"}, {}, 1)
+        writer.submit("second", {"Two"}, {}, 1)
+        writer.submit("third", set(), {"compress": True}, 2)
+        assert writer.busy()
+        writer.flush()
+        assert not writer.busy()
+        assert writes.calls == [("third", {"One", "Two"}, {"compress": True}, 2)]
+        assert (writer.submits, writer.writes) == (3, 1)
+    finally:
+        writer.close()
+
+
+def test_close_writes_the_waiting_save_and_stops():
+    writes = _Writes()
+    writer = background_save.BackgroundWriter(writes, delay=60)
+    writer.submit("layouts", {"One"}, {}, 1)
+    writer.close()
+    assert len(writes.calls) == 1
+    assert not writer._thread.is_alive()
+    with pytest.raises(RuntimeError):
+        writer.submit("layouts", {"One"}, {}, 1)
+
+
+def test_write_errors_are_kept_for_the_caller():
+    error = IOError("disk full")
+    writer = background_save.BackgroundWriter(_Writes(error), delay=0)
+    try:
+        writer.submit("layouts", {"One", "Two"}, {}, 1)
+        writer.flush()
+        assert writer.take_failure() == ({"One", "Two"}, error)
+        assert writer.take_failure() == (set(), None)
+    finally:
+        writer.close()
+
+
+def test_failed_check_skips_the_write():
+    writes = _Writes()
+    writer = background_save.BackgroundWriter(writes, check=lambda: False, delay=0)
+    try:
+        writer.submit("layouts", {"One"}, {}, 1)
+        writer.flush()
+        failed_layouts, error = writer.take_failure()
+        assert failed_layouts == {"One"}
+        assert isinstance(error, background_save.StorageChanged)
+        assert writes.calls == []
+
+        # a forced save doesn't check
+        writer.submit("layouts", {"One"}, {}, 1, force=True)
+        writer.flush()
+        assert len(writes.calls) == 1
+    finally:
+        writer.close()
+
+
+def test_write_holds_the_lock():
+    lock = threading.RLock()
+    held = []
+    writer = background_save.BackgroundWriter(lambda *args: held.append(lock._is_owned()), delay=0, lock=lock)
+    try:
+        writer.submit("layouts", {"One"}, {}, 1)
+        writer.flush()
+        assert held == [True]
+    finally:
+        writer.close()
+
+
+def test_layout_manager_saves_in_the_background(mxd_path):
+    lm = LayoutManager(mxd_path=mxd_path, background_save=True)
+    lm.start_background_save(delay=60)
+    for step, layout_name in enumerate(["One", "Two", "Three"]):
+        edit_document(lm._mxd, step)
+        lm.create_layout(layout_name)
+    assert lm._writer.writes == 0
+    lm.flush()
+    assert lm._writer.writes == 1
+    lm.close()
+
+    reopened = LayoutManager(mxd=arcpy.mapping.MapDocument(mxd_path), apply_first_layout=False, read_only=True)
+    assert reopened.list_layouts() == ["One", "Two", "Three"]
+
+
+def test_layout_manager_flush_raises_write_errors(mxd_path, monkeypatch):
+    lm = LayoutManager(mxd_path=mxd_path, background_save=True)
+    lm.start_background_save(delay=60)
+
+    def failing_write(*args, **kwargs):
+        raise IOError("disk full")
+
+    monkeypatch.setattr(lm._storage, "write", failing_write)
+    lm.create_layout("One")
+    with pytest.raises(IOError):
+        lm.flush()
+    # kept unsaved, so the next save writes it again
+    assert lm._unsaved_layouts == {"One"}
+    monkeypatch.undo()
+    lm.save_layout_json()
+    lm.flush()
+    assert lm._unsaved_layouts == set()
+    assert lm._writer.writes == 1
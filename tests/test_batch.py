@@ -0,0 +1,73 @@
+from __future__ import print_function
+from __future__ import division
+
+import pytest
+
+from ArcGIS_Layout_Manager import LayoutManager
+from document_helpers import document_state, edit_document
+
+"""
+batch() holds back refreshes, recaptures and saves, and rolls the layouts back when the block raises
+"""
+
+
+@pytest.fixture
+def lm(mxd_path):
+    lm = LayoutManager(mxd_path=mxd_path)
+    lm.create_layout("One")
+    edit_document(lm._mxd, 1)
+    lm.create_layout("Two")
+    lm.switch_layout("One")
+    return lm
+
+
+def test_batch_keeps_changes_made_before_it(lm):
+    lm._mxd._elements[0].elementPositionX = 42.0
+    edited = document_state(lm._mxd)
+    with lm.batch():
+        lm.switch_layout("Two")
+    lm.switch_layout("One")
+    assert document_state(lm._mxd) == edited
+
+
+def test_batch_saves_once(lm, monkeypatch):
+    saves = []
+    save_layout_json = lm.save_layout_json
+    monkeypatch.setattr(lm, "save_layout_json", lambda *args, **kwargs: saves.append(save_layout_json(*args, **kwargs)))
+    with lm.batch():
+        edit_document(lm._mxd, 2)
+        lm.create_layout("Three")
+        edit_document(lm._mxd, 3)
+        lm.create_layout("Four")
+        lm.switch_layout("Two")
+        assert saves == []
+    assert len(saves) == 1
+    assert lm._unsaved_layouts == set()
+
+
+def test_batch_rolls_back_when_it_raises(lm):
+    one = lm._layouts.get("One")
+    with pytest.raises(RuntimeError):
+        with lm.batch():
+            edit_document(lm._mxd, 2)
+            lm.create_layout("Three")
+            lm.update_layout("One")
+            raise RuntimeError("batch failed")
+
+    assert lm.list_layouts() == ["One", "Two"]
+    assert lm._layouts.get("One") is one
+    assert lm.active_layout == "One"
+    # the document still shows the batch, switching doesn't store it into the restored layout
+    lm.switch_layout("Two")
+    assert lm._layouts.get("One") is one
+
+
+def test_batch_rollback_keeps_changes_made_before_it(lm):
+    lm._mxd._elements[0].elementPositionX = 42.0
+    edited = document_state(lm._mxd)
+    with pytest.raises(RuntimeError):
+        with lm.batch():
+            lm.switch_layout("Two")
+            raise RuntimeError("batch failed")
+    lm.switch_layout("One")
+    assert document_state(lm._mxd) == edited
@@ -0,0 +1,61 @@
+from __future__ import print_function
+from __future__ import division
+
+import fake_arcpy
+import pytest
+
+from ArcGIS_Layout_Manager import LayoutManager
+
+"""
+create_layouts captures a layout for each data driven page in one pass, sharing what didn't change between pages
+"""
+
+
+@pytest.fixture
+def lm(tmpdir):
+    path = str(tmpdir.join("pages.mxd"))
+    # each page moves the first data frame
+    fake_arcpy.generate_document(path, elements=12, layers=12, pages=4)
+    return LayoutManager(mxd_path=path)
+
+
+def _dataframe(mxd):
+    return [element for element in mxd._elements if element.type == "DATAFRAME_ELEMENT"][0]
+
+
+def test_layout_for_every_page(lm, monkeypatch):
+    saves = []
+    save_layout_json = lm.save_layout_json
+    monkeypatch.setattr(lm, "save_layout_json", lambda *args, **kwargs: saves.append(save_layout_json(*args, **kwargs)))
+
+    assert lm.create_layouts(lm._mxd.dataDrivenPages) == [1, 2, 3, 4]
+    assert len(saves) == 1
+    assert lm.active_layout == 4
+    name = _dataframe(lm._mxd).name
+    assert [lm._layouts.get(page)['layout_items']['DATAFRAME_ELEMENT'][name].XMin for page in range(1, 5)] == \
+        [1000.0, 2000.0, 3000.0, 4000.0]
+
+    lm.switch_layout(2)
+    assert _dataframe(lm._mxd).extent.XMin == 2000.0
+
+
+def test_pages_share_unchanged_items(lm):
+    lm.create_layouts([1, 2])
+    one = lm._layouts.get(1)
+    two = lm._layouts.get(2)
+    assert two['toc_items'] is one['toc_items']
+    for element_type, elements in two['layout_items'].items():
+        for name, element in elements.items():
+            assert (element is one['layout_items'][element_type][name]) == (name != _dataframe(lm._mxd).name)
+
+
+def test_toc_captured_for_each_page_without_sharing(lm):
+    lm.create_layouts([1, 2], share_toc=False)
+    assert lm._layouts.get(2)['toc_items'] is not lm._layouts.get(1)['toc_items']
+
+
+def test_existing_pages_are_skipped(lm):
+    lm.create_layouts([1, 2])
+    # search cursor rows hold the page name first
+    assert lm.create_layouts([("2",), ("3",)]) == [3]
+    assert lm.list_layouts() == [1, 2, 3]
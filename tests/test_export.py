@@ -0,0 +1,58 @@
+from __future__ import print_function
+from __future__ import division
+
+import os
+
+from ArcGIS_Layout_Manager import LayoutManager, apply_plans, export
+from document_helpers import edit_document
+
+"""
+Exporting layouts in this process (workers=1), failures are reported per layout and retried
+"""
+
+
+def _create_layouts(mxd_path, layout_names):
+    lm = LayoutManager(mxd_path=mxd_path)
+    for step, layout_name in enumerate(layout_names):
+        edit_document(lm._mxd, step)
+        lm.create_layout(layout_name)
+    lm.save_layout_json()
+    lm.close()
+
+
+def test_export_writes_every_layout(mxd_path, tmpdir):
+    _create_layouts(mxd_path, ["One", "Two", "Three"])
+    results = export.export_layouts(mxd_path, str(tmpdir.join("out", "{layout}.jpg")), workers=1)
+    assert sorted(result.layout_name for result in results) == ["One", "Three", "Two"]
+    for result in results:
+        assert result.success and result.error is None
+        assert os.path.isfile(result.path)
+
+
+def test_export_reports_failed_layouts(mxd_path, tmpdir, monkeypatch):
+    _create_layouts(mxd_path, ["One", "Two", "Three"])
+    replay_elements = apply_plans.replay_elements
+
+    def failing_replay(plan, *args, **kwargs):
+        if plan.layout.get('layout_name') == "Two":
+            raise RuntimeError("replay failed")
+        return replay_elements(plan, *args, **kwargs)
+
+    monkeypatch.setattr(apply_plans, "replay_elements", failing_replay)
+    results = export.export_layouts(mxd_path, str(tmpdir.join("out", "{layout}.jpg")), workers=1, retries=1,
+                                    layouts=["One", "Two", "Three"])
+
+    assert [result.layout_name for result in results] == ["One", "Two", "Three"]
+    failed = results[1]
+    assert not failed.success
+    assert "replay failed" in failed.error
+    assert failed.attempts == 2
+    assert not os.path.exists(failed.path)
+    assert all(result.success and result.attempts == 1 for result in (results[0], results[2]))
+
+
+def test_export_reports_missing_layouts(mxd_path, tmpdir):
+    _create_layouts(mxd_path, ["One"])
+    results = export.export_layouts(mxd_path, str(tmpdir.join("{layout}.jpg")), workers=1, retries=0,
+                                     layouts=["One", "Missing"])
+    assert [(result.layout_name, result.success) for result in results] == [("One", True), ("Missing", False)]
@@ -0,0 +1,65 @@
+from __future__ import print_function
+from __future__ import division
+
+import pytest
+
+from ArcGIS_Layout_Manager import LayoutManager
+from document_helpers import document_state, edit_document
+
+numpy = pytest.importorskip("numpy")
+
+"""
+Bulk geometry changes through a geometry view, stored as new layouts by apply_geometry
+"""
+
+
+@pytest.fixture
+def lm(mxd_path):
+    lm = LayoutManager(mxd_path=mxd_path)
+    lm.create_layout("One")
+    edit_document(lm._mxd, 1)
+    lm.create_layout("Two")
+    return lm
+
+
+def _element(mxd, element_type):
+    return [element for element in mxd._elements if element.type == element_type][0]
+
+
+def test_view_masks_rows(lm):
+    view = lm.geometry_view()
+    text_rows = view.mask(element_types=["TEXT_ELEMENT"], layout_names=["Two"])
+    assert view.rows(text_rows) == [("Two", "TEXT_ELEMENT", "TEXT_ELEMENT_LAYOUT_1"),
+                                    ("Two", "TEXT_ELEMENT", "TEXT_ELEMENT_LAYOUT_2")]
+    assert not view.changed().any()
+
+
+def test_apply_geometry_stores_changed_layouts(lm):
+    one = lm._layouts.get("One")
+    x = _element(lm._mxd, "TEXT_ELEMENT").elementPositionX
+    view = lm.geometry_view()
+    view.translate(2, 0, view.mask(element_types=["TEXT_ELEMENT"], layout_names=["Two"]))
+    assert view.changed_layouts() == {"Two"}
+
+    assert lm.apply_geometry(view) == ["Two"]
+    assert lm._layouts.get("One") is one
+    # Two is active, so it's switched to again
+    assert _element(lm._mxd, "TEXT_ELEMENT").elementPositionX == x + 2
+    assert lm._layouts.get("Two")['layout_items']['TEXT_ELEMENT']["TEXT_ELEMENT_LAYOUT_1"].elementPositionX == x + 2
+
+
+def test_apply_geometry_keeps_changes_made_to_the_document(lm):
+    # a hand edit to the active layout that hasn't been stored yet
+    _element(lm._mxd, "LEGEND_ELEMENT").elementPositionY = 42.0
+    text = _element(lm._mxd, "TEXT_ELEMENT")
+    text.text = "edited"
+    view = lm.geometry_view(layouts=["Two"])
+    view.translate(2, 0, view.mask(element_types=["TEXT_ELEMENT"]))
+    lm.apply_geometry(view)
+
+    edited = document_state(lm._mxd)
+    assert _element(lm._mxd, "LEGEND_ELEMENT").elementPositionY == 42.0
+    assert text.text == "edited"
+    lm.switch_layout("One")
+    lm.switch_layout("Two")
+    assert document_state(lm._mxd) == edited
@@ -0,0 +1,112 @@
+from __future__ import print_function
+from __future__ import division
+
+from ArcGIS_Layout_Manager import LayoutManager, layout_index, spatial_index
+from document_helpers import edit_document
+
+"""
+Layout and data frame extent indexes over flat layout records, and kept up to date by a LayoutManager
+"""
+
+
+def _record(layout_name, text="", visible=True, x=1.0, extent=None):
+    layout_items = {
+        'TEXT_ELEMENT': [{'name': "Title", 'text': text, 'elementPositionX': x, 'elementPositionY': 1.0,
+                          'elementWidth': 2.0, 'elementHeight': 1.0}],
+        'PICTURE_ELEMENT': [{'name': "Logo", 'sourceImage': "logo.png"}],
+    }
+    if extent is not None:
+        layout_items['DATAFRAME_ELEMENT'] = [dict(zip(("name", "XMin", "YMin", "XMax", "YMax"),
+                                                      ("Main",) + extent))]
+    return {'layout_name': layout_name, 'layout_items': layout_items,
+            'toc_items': {"Roads": {'visible': visible, 'transparency': 0}}}
+
+
+def test_layout_index_queries():
+    index = layout_index.LayoutIndex.from_records([
+        _record("A", "Draft Map", visible=True),
+        _record("B", "Final Map", visible=False),
+        _record("C", "Draft", visible=False, x=20.0),
+    ], page_size=(11, 8.5))
+
+    assert index.query(layout_index.visible("Roads", False)) == ["B", "C"]
+    assert index.query(layout_index.text_contains("DRAFT")) == ["A", "C"]
+    assert index.query(layout_index.text_contains("draft") & layout_index.visible("Roads", False)) == ["C"]
+    assert index.query(layout_index.text("Final Map") | layout_index.off_page("Title")) == ["B", "C"]
+    assert index.query(~layout_index.text_contains("map")) == ["C"]
+    assert index.query(layout_index.element("Logo", "PICTURE_ELEMENT")) == ["A", "B", "C"]
+    assert index.terms("source_image") == [("source_image", "logo.png")]
+
+
+def test_layout_index_updates_and_removes():
+    index = layout_index.LayoutIndex.from_records([_record("A", "Draft"), _record("B", "Draft")])
+    index.update("A", _record("A", "Final"))
+    assert index.query(layout_index.text_contains("draft")) == ["B"]
+    index.update("B", None)
+    assert "B" not in index
+    assert index.query(layout_index.text_contains("draft")) == []
+    assert index.terms("text") == [("text", "Final")]
+
+
+def _grid_records(count):
+    # a row of overlapping 10 x 10 extents, 5 apart
+    return [_record("Layout {}".format(number), extent=(number * 5.0, 0.0, number * 5.0 + 10, 10.0))
+            for number in range(count)]
+
+
+def _brute_force(records, xmin, ymin, xmax, ymax):
+    found = []
+    for record in records:
+        for name, bounds in spatial_index.record_extents(record):
+            if bounds[0] <= xmax and bounds[2] >= xmin and bounds[1] <= ymax and bounds[3] >= ymin:
+                found.append(record['layout_name'])
+    return found
+
+
+def test_extent_index_matches_a_scan():
+    records = _grid_records(300)
+    index = spatial_index.ExtentIndex.from_records(records)
+    for box in [(0, 0, 0, 0), (12, 5, 12, 5), (100, -5, 160, 2), (2000, 0, 3000, 10), (-10, 20, 5000, 30)]:
+        assert index.layouts_intersecting(*box) == _brute_force(records, *box)
+    assert index.layouts_at(12, 5) == ["Layout 1", "Layout 2"]
+    assert index.dataframes_at(12, 5) == [("Layout 1", "Main"), ("Layout 2", "Main")]
+    assert index.extent("Layout 2", "Main") == (10.0, 0.0, 20.0, 10.0)
+
+
+def test_extent_index_updates_after_packing():
+    records = _grid_records(300)
+    index = spatial_index.ExtentIndex.from_records(records)
+    index.pack()
+    # moved far away, keeping its place in the layout order
+    index.update("Layout 1", _record("Layout 1", extent=(-100.0, -100.0, -90.0, -90.0)))
+    index.update("Layout 2", None)
+    assert index.layouts_at(12, 5) == []
+    assert index.layouts_at(-95, -95) == ["Layout 1"]
+    assert index.layouts_intersecting(-100, 0, 20, 10) == ["Layout 0", "Layout 3", "Layout 4"]
+    # enough changes pack the tree again on the next query
+    for number in range(3, 200):
+        index.update("Layout {}".format(number), None)
+    assert index.layouts_intersecting(0, 0, 5000, 10) == ["Layout 0"] + ["Layout {}".format(number)
+                                                                           for number in range(200, 300)]
+
+
+def test_layout_manager_keeps_indexes_up_to_date(mxd_path):
+    lm = LayoutManager(mxd_path=mxd_path)
+    layer = lm._mxd._layers[1]
+    layer.visible = True
+    lm.create_layout("One")
+    index = lm.build_layout_index()
+    extents = lm.build_extent_index()
+    dataframe = [element for element in lm._mxd._elements if element.type == "DATAFRAME_ELEMENT"][0]
+
+    edit_document(lm._mxd, 1)
+    layer.visible = False
+    lm.create_layout("Two")
+    assert index.query(layout_index.visible(layer.longName, False)) == ["Two"]
+    assert index.all_layouts() == {"One", "Two"}
+    extent = dataframe.extent
+    assert extents.extent("Two", dataframe.name) == (extent.XMin, extent.YMin, extent.XMax, extent.YMax)
+
+    layer.visible = True
+    lm.update_layout("Two")
+    assert index.query(layout_index.visible(layer.longName, True)) == ["One", "Two"]
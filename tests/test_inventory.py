@@ -0,0 +1,99 @@
+from __future__ import print_function
+from __future__ import division
+
+import json
+import os
+
+import arcpy
+import fake_arcpy
+
+from ArcGIS_Layout_Manager import LayoutManager, inventory
+
+"""
+The document inventory cache, element and layer names taken from <mxd>_inventory.json while the document is unchanged
+"""
+
+
+def _names(mxd):
+    return [(element.type, element.name) for element in mxd._elements]
+
+
+def _open_reads(mxd_path, **kwargs):
+    fake_arcpy.reset_counters()
+    lm = LayoutManager(mxd_path=mxd_path, **kwargs)
+    lm.switch_layout("One")
+    return lm, fake_arcpy.counter_totals()["get"]
+
+
+def test_inventory_is_written_with_the_layouts_names(mxd_path):
+    lm = LayoutManager(mxd_path=mxd_path)
+    lm.create_layout("One")
+    cached = inventory.DocumentInventory.for_document(mxd_path)
+    assert cached.stale is None and cached.is_complete()
+    assert cached.elements == _names(lm._mxd)
+    assert cached.layers == [layer.longName for layer in lm._mxd._layers]
+    # from the long names, so only group layers holding layers
+    assert cached.group_layers() == ["Group 0"]
+    # the fake document leaves graphic and text elements unnamed
+    assert [name for name in cached.listed_names if not name]
+
+
+def test_unchanged_document_is_named_from_the_inventory(mxd_path):
+    lm = LayoutManager(mxd_path=mxd_path)
+    lm.create_layout("One")
+    lm.save_layout_json()
+    named = _names(lm._mxd)
+    lm.close()
+
+    cached_lm, cached_reads = _open_reads(mxd_path)
+    assert _names(cached_lm._mxd) == named
+    listed_lm, listed_reads = _open_reads(mxd_path, inventory=False)
+    assert _names(listed_lm._mxd) == named
+    assert cached_reads < listed_reads
+
+
+def test_changed_document_keeps_the_inventory_as_stale(mxd_path):
+    lm = LayoutManager(mxd_path=mxd_path)
+    lm.create_layout("One")
+    lm.save_layout_json()
+    lm.close()
+    with open(mxd_path) as fl:
+        document = json.load(fl)
+    document["layers"].pop()
+    with open(mxd_path, "w") as fl:
+        json.dump(document, fl)
+
+    cached = inventory.DocumentInventory.for_document(mxd_path)
+    assert cached.elements is None and cached.stale is not None
+    # the elements didn't change, so their types come from the stale section
+    listed_names = [element.name for element in arcpy.mapping.MapDocument(mxd_path)._elements]
+    assert cached.element_types(listed_names) == [element_type for element_type, name in cached.stale.elements]
+
+    reopened = LayoutManager(mxd_path=mxd_path)
+    validation = reopened.validate_layouts()["One"]
+    assert validation.missing_layers == [cached.stale.layers[-1]]
+    assert not validation.missing_elements and not validation.new_elements and not validation.new_layers
+    refreshed = inventory.DocumentInventory.for_document(mxd_path)
+    assert refreshed.stale is None and refreshed.layers == cached.stale.layers[:-1]
+
+
+def test_inventory_of_another_version_is_ignored(mxd_path):
+    with open(inventory.inventory_path(mxd_path), "w") as fl:
+        json.dump({'inventory_version': inventory.INVENTORY_VERSION - 1, 'elements': [["TEXT_ELEMENT", "Old"]]}, fl)
+    cached = inventory.DocumentInventory.for_document(mxd_path)
+    assert cached.elements is None and cached.stale is None
+    assert cached.fingerprint == inventory.document_fingerprint(mxd_path)
+
+
+def test_validation_from_the_inventory(mxd_path, monkeypatch):
+    lm = LayoutManager(mxd_path=mxd_path)
+    lm.create_layout("One")
+    lm.save_layout_json()
+    lm.close()
+
+    reopened = LayoutManager(mxd_path=mxd_path, apply_first_layout=False)
+    # the document isn't listed when the inventory is current
+    monkeypatch.setattr(arcpy.mapping, "ListLayoutElements", None)
+    monkeypatch.setattr(arcpy.mapping, "ListLayers", None)
+    assert reopened.validate_layouts()["One"].is_valid()
+    assert os.path.isfile(inventory.inventory_path(mxd_path))
@@ -0,0 +1,61 @@
+from __future__ import print_function
+from __future__ import division
+
+from ArcGIS_Layout_Manager import planning
+
+"""
+Planning the switch order, greedy by the items that change and bounded to a window of the remaining layouts
+"""
+
+
+def _record(x_positions, visible=True):
+    elements = [{'name': "Element {}".format(index), 'elementPositionX': x}
+                for index, x in enumerate(x_positions)]
+    return {'layout_items': {'TEXT_ELEMENT': elements}, 'toc_items': {"Layer": {'visible': visible}}}
+
+
+def test_plan_goes_to_the_closest_layout():
+    records = {
+        "A": _record([0, 0, 0]),
+        "B": _record([1, 1, 1], visible=False),
+        "C": _record([0, 0, 1]),
+        "D": _record([0, 1, 1]),
+    }
+    order, total_cost = planning.plan_switch_order(records, start="A")
+    assert order == ["A", "C", "D", "B"]
+    assert total_cost == planning.path_cost(records, order) == 4
+
+
+def test_plan_counts_fields_of_missing_items():
+    records = [("A", _record([0, 0])), ("B", _record([0]))]
+    order, total_cost = planning.plan_switch_order(records)
+    assert order == ["A", "B"]
+    # both fields of the element B doesn't have
+    assert total_cost == planning.path_cost(dict(records), order) == 2
+
+
+def test_plan_only_compares_the_window():
+    records = [("Start", _record([0, 0, 0]))]
+    records += [("Far {}".format(index), _record([index + 10] * 3)) for index in range(3)]
+    records.append(("Near", _record([0, 0, 0])))
+    order = planning.plan_switch_order(records, window=2)[0]
+    assert order == ["Start", "Far 0", "Far 1", "Far 2", "Near"]
+    order = planning.plan_switch_order(records, window=None)[0]
+    assert order[:2] == ["Start", "Near"]
+
+
+def test_plan_reads_records_once():
+    reads = []
+
+    def records():
+        for index in range(200):
+            reads.append(index)
+            yield "Layout {}".format(index), _record([index % 7, index % 3])
+
+    order, total_cost = planning.plan_switch_order(records())
+    assert sorted(order) == sorted("Layout {}".format(index) for index in range(200))
+    assert reads == list(range(200))
+
+
+def test_plan_of_no_layouts():
+    assert planning.plan_switch_order({}) == ([], 0)
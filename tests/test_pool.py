@@ -0,0 +1,135 @@
+from __future__ import print_function
+from __future__ import division
+
+import os
+import threading
+
+import pytest
+
+from ArcGIS_Layout_Manager import pool
+
+"""
+Pooled managers, least recently used idle managers are closed over max_size
+"""
+
+
+class _Manager(object):
+    def __init__(self, mxd_path):
+        self.mxd_path = mxd_path
+        self.closed = False
+        self.saves = 0
+        self.unsaved = True
+
+    def has_unsaved_changes(self):
+        return self.unsaved
+
+    def save_layout_json(self):
+        self.saves += 1
+        self.unsaved = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def managers():
+    opened = []
+
+    def factory(mxd_path):
+        manager = _Manager(mxd_path)
+        opened.append(manager)
+        return manager
+    factory.opened = opened
+    return factory
+
+
+def test_checkout_reuses_the_open_manager(managers):
+    with pool.ManagerPool(max_size=2, manager_factory=managers) as manager_pool:
+        with manager_pool.checkout("a.mxd") as first:
+            pass
+        with manager_pool.checkout("a.mxd") as second:
+            assert second is first
+        assert len(managers.opened) == 1
+        assert "a.mxd" in manager_pool
+
+
+def test_least_recently_used_manager_is_closed(managers):
+    manager_pool = pool.ManagerPool(max_size=2, manager_factory=managers)
+    for mxd_path in ("a.mxd", "b.mxd", "a.mxd", "c.mxd"):
+        with manager_pool.checkout(mxd_path):
+            pass
+    a, b, c = managers.opened
+    assert b.closed and not a.closed and not c.closed
+    assert "b.mxd" not in manager_pool
+    assert [os.path.basename(path) for path in manager_pool.open_documents()] == ["a.mxd", "c.mxd"]
+
+    manager_pool.close()
+    assert a.closed and c.closed
+    with pytest.raises(RuntimeError):
+        with manager_pool.checkout("a.mxd"):
+            pass
+
+
+def test_checked_out_managers_are_not_closed(managers):
+    manager_pool = pool.ManagerPool(max_size=1, manager_factory=managers)
+    with manager_pool.checkout("a.mxd") as a:
+        with manager_pool.checkout("b.mxd") as b:
+            # over the cap while both are checked out
+            assert len(manager_pool) == 2
+        assert b.closed and not a.closed
+        assert manager_pool.evict("a.mxd") is False
+    assert manager_pool.evict("a.mxd") is True
+    assert a.closed
+
+
+def test_save_all_skips_checked_out_managers(managers):
+    manager_pool = pool.ManagerPool(max_size=2, manager_factory=managers)
+    with manager_pool.checkout("a.mxd"):
+        pass
+    with manager_pool.checkout("b.mxd") as b:
+        manager_pool.save_all()
+        assert b.saves == 0
+    a = managers.opened[0]
+    assert a.saves == 1
+    manager_pool.save_all()
+    assert a.saves == 1
+
+
+def test_one_thread_at_a_time_has_a_manager(managers):
+    manager_pool = pool.ManagerPool(max_size=1, manager_factory=managers)
+    active = []
+    overlaps = []
+
+    def work():
+        for _ in range(20):
+            with manager_pool.checkout("a.mxd") as manager:
+                active.append(manager)
+                overlaps.append(len(active))
+                active.remove(manager)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(overlaps) == 1
+    assert len(managers.opened) == 1
+
+
+def test_failed_open_leaves_no_entry():
+    def failing_factory(mxd_path):
+        raise IOError("no such document")
+
+    manager_pool = pool.ManagerPool(manager_factory=failing_factory)
+    with pytest.raises(IOError):
+        with manager_pool.checkout("a.mxd"):
+            pass
+    assert len(manager_pool) == 0
+
+
+def test_pool_opens_layout_managers(mxd_path):
+    with pool.ManagerPool(max_size=1) as manager_pool:
+        with manager_pool.checkout(mxd_path) as lm:
+            lm.create_layout("One")
+        with manager_pool.checkout(mxd_path) as lm:
+            assert lm.list_layouts() == ["One"]
@@ -0,0 +1,79 @@
+from __future__ import print_function
+from __future__ import division
+
+import pytest
+
+from ArcGIS_Layout_Manager import LayoutManager
+from document_helpers import document_state, edit_document
+
+"""
+Scoped captures only read the part of the map document in scope, the rest of the layout is kept from the stored layout
+"""
+
+
+@pytest.fixture
+def lm(mxd_path):
+    lm = LayoutManager(mxd_path=mxd_path)
+    lm.create_layout("One")
+    edit_document(lm._mxd, 1)
+    lm.create_layout("Two")
+    lm.switch_layout("One")
+    return lm
+
+
+def _text(mxd):
+    return [element for element in mxd._elements if element.type == "TEXT_ELEMENT"][0]
+
+
+def test_scoped_update_only_reads_the_scope(lm):
+    one = lm._layouts.get("One")
+    text = _text(lm._mxd)
+    text.elementPositionX += 5
+    text.text = "not in scope"
+    lm.update_layout(element_types=["TEXT_ELEMENT"], properties=["position"])
+
+    updated = lm._layouts.get("One")
+    stored_text = updated['layout_items']['TEXT_ELEMENT'][text.name]
+    assert stored_text.elementPositionX == text.elementPositionX
+    assert stored_text.text == one['layout_items']['TEXT_ELEMENT'][text.name].text
+    # items out of scope are shared with the layout as it was
+    for name, element in one['layout_items']['LEGEND_ELEMENT'].items():
+        assert updated['layout_items']['LEGEND_ELEMENT'][name] is element
+    assert updated['toc_items'] is one['toc_items']
+
+
+def test_scoped_create_copies_the_base_layout(lm):
+    one_visible = [layer.visible for layer in lm._mxd._layers]
+    lm.create_layout("Three", base_layout="Two", properties=["visibility"])
+    two = lm._layouts.get("Two")
+    three = lm._layouts.get("Three")
+    assert lm.active_layout == "Three"
+    for element_type, elements in two['layout_items'].items():
+        for name, element in elements.items():
+            assert three['layout_items'][element_type][name] is element
+    for layer, visible in zip(lm._mxd._layers, one_visible):
+        assert three['toc_items'][layer.longName].visible == visible
+        assert three['toc_items'][layer.longName].transparency == two['toc_items'][layer.longName].transparency
+
+
+@pytest.mark.parametrize("scope", [
+    {'element_types': ["TEXT_ELEMENT"], 'properties': ["position"]},
+    {'toc_root': None, 'properties': ["visibility"]},
+])
+def test_diff_switch_after_a_scoped_capture_writes_what_was_not_read(mxd_path, scope):
+    lm = LayoutManager(mxd_path=mxd_path)
+    lm.auto_save = False
+    lm.diff_switch = True
+    lm.create_layout("One")
+    edit_document(lm._mxd, 1)
+    lm.create_layout("Two")
+    lm.switch_layout("One")
+
+    # the document shows One, the properties out of scope of the capture are kept from Two
+    lm.update_layout("Two", **scope)
+    lm.switch_layout("Two")
+    switched = document_state(lm._mxd)
+    lm.diff_switch = False
+    lm.switch_layout("One")
+    lm.switch_layout("Two")
+    assert switched == document_state(lm._mxd)
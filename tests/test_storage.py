@@ -0,0 +1,115 @@
+from __future__ import print_function
+from __future__ import division
+
+import gzip
+import hashlib
+import json
+import os
+import stat
+
+import arcpy
+import pytest
+
+from ArcGIS_Layout_Manager import LayoutManager, layout_codec, layout_storage, storage_backends
+from document_helpers import document_state, edit_document
+
+"""
+Layouts saved in every storage format come back as they were captured
+"""
+
+STORAGE_FORMATS = [
+    ("json", layout_storage.FLAT_FORMAT, False),
+    ("json", layout_storage.OVERRIDE_FORMAT, False),
+    ("json", layout_storage.STREAM_FORMAT, False),
+    ("json", layout_storage.FLAT_FORMAT, True),
+    ("json", layout_storage.OVERRIDE_FORMAT, True),
+    ("json", layout_storage.STREAM_FORMAT, True),
+    ("sqlite", None, False),
+]
+
+
+@pytest.mark.parametrize("storage,json_format,compress", STORAGE_FORMATS)
+def test_layouts_round_trip(mxd_path, storage, json_format, compress):
+    lm = LayoutManager(mxd_path=mxd_path, storage=storage)
+    if json_format is not None:
+        lm.json_format = json_format
+    lm.json_compress = compress
+    states = {}
+    for step, layout_name in enumerate(["One", "Two", "Three"]):
+        edit_document(lm._mxd, step)
+        lm.create_layout(layout_name)
+        states[layout_name] = document_state(lm._mxd)
+    lm._mxd._elements.pop()
+    lm.create_layout("Missing Element")
+    states["Missing Element"] = document_state(lm._mxd)
+    lm.save_layout_json()
+    lm.close()
+
+    for layout_name in states:
+        mxd = arcpy.mapping.MapDocument(mxd_path)
+        if layout_name == "Missing Element":
+            mxd._elements.pop()
+        reopened = LayoutManager(mxd=mxd, storage=storage, apply_first_layout=False, read_only=True)
+        assert reopened.list_layouts() == ["One", "Two", "Three", "Missing Element"]
+        assert reopened.switch_layout(layout_name)
+        assert document_state(mxd) == states[layout_name]
+
+
+def test_reload_finds_only_changed_layouts(mxd_path):
+    lm = LayoutManager(mxd_path=mxd_path)
+    for step, layout_name in enumerate(["One", "Two", "Three"]):
+        edit_document(lm._mxd, step)
+        lm.create_layout(layout_name)
+    lm.save_layout_json()
+
+    other = LayoutManager(mxd=arcpy.mapping.MapDocument(mxd_path), apply_first_layout=False)
+    other.switch_layout("Two")
+    edit_document(other._mxd, 7)
+    other.update_layout()
+    other.save_layout_json()
+
+    assert lm.reload() == ["Two"]
+
+
+@pytest.mark.skipif(os.name == "nt", reason="file modes are only kept on posix")
+def test_atomic_write_gives_a_new_file_the_default_mode(tmpdir):
+    path = str(tmpdir.join("layout.json"))
+    storage_backends._write_atomic(path, lambda fl: fl.write(b"[]"))
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o666 & ~storage_backends._UMASK
+
+
+@pytest.mark.skipif(os.name == "nt", reason="file modes are only kept on posix")
+def test_atomic_write_keeps_the_file_mode(mxd_path):
+    lm = LayoutManager(mxd_path=mxd_path)
+    lm.create_layout("One")
+    os.chmod(lm._storage.path, 0o640)
+    edit_document(lm._mxd, 1)
+    lm.create_layout("Two")
+    lm.save_layout_json()
+    assert stat.S_IMODE(os.stat(lm._storage.path).st_mode) == 0o640
+    with open(lm._storage.path) as fl:
+        assert "Two" in fl.read()
+
+
+@pytest.mark.parametrize("members", [1, 3])
+def test_compressed_records_are_read_from_the_index(tmpdir, monkeypatch, members):
+    path = str(tmpdir.join("layout.json"))
+    records = [{'layout_name': "Layout {}".format(index), 'layout_items': {}, 'toc_items': {},
+                'text': "".join(hashlib.sha1(str(index * part).encode("utf-8")).hexdigest()
+                                for part in range(index % 50))} for index in range(200)]
+    text = json.dumps(records).encode("utf-8")
+    # concatenated gzip members, as appending to a gzip file gives
+    parts = [text[part * len(text) // members:(part + 1) * len(text) // members] for part in range(members)]
+    with open(path, 'wb') as fl:
+        for part in parts:
+            with gzip.GzipFile(filename="", mode='wb', fileobj=fl) as compressed:
+                compressed.write(part)
+
+    monkeypatch.setattr(layout_codec, "GZIP_INPUT_SIZE", 256)
+    gzip_index = layout_codec.GzipIndex(spacing=4096)
+    located = [value for kind, value in layout_codec.iter_file(path, chunk_size=1000, located=True,
+                                                               gzip_index=gzip_index)]
+    assert len(gzip_index.points) > 40
+    for record, start, end in reversed(located):
+        assert layout_codec.read_located(path, start, end, gzip_index) == record
+    assert [record for record, start, end in located] == records
@@ -0,0 +1,101 @@
+from __future__ import print_function
+from __future__ import division
+
+import arcpy
+import pytest
+
+from ArcGIS_Layout_Manager import LayoutManager, exceptions, layout_elements
+from document_helpers import changed_value, document_state, edit_document
+
+"""
+Switching layouts, with auto save storing changes made to the map document before each switch
+"""
+
+# every captured property but the element name, which is how elements are matched
+CAPTURED_PROPERTIES = [(element_type, prop)
+                       for element_type, element_class in sorted(layout_elements.layout_object_mapper.items())
+                       for prop in element_class._properties if prop != "name"]
+CAPTURED_PROPERTIES += [("LAYER", "visible"), ("LAYER", "transparency")]
+
+
+def _change_property(mxd, element_type, prop):
+    if element_type == "LAYER":
+        # not a group layer
+        layer = mxd._layers[1]
+        setattr(layer, prop, changed_value(getattr(layer, prop), 35))
+        return
+    element = [element for element in mxd._elements if element.type == element_type][0]
+    if prop in ("XMin", "XMax", "YMin", "YMax"):
+        extent = element.extent
+        setattr(extent, prop, getattr(extent, prop) + 35)
+        element.extent = extent
+    else:
+        setattr(element, prop, changed_value(getattr(element, prop), 35))
+
+
+@pytest.mark.parametrize("element_type,prop", CAPTURED_PROPERTIES)
+def test_auto_save_stores_every_captured_property(mxd_path, element_type, prop):
+    lm = LayoutManager(mxd_path=mxd_path)
+    lm.create_layout("One")
+    edit_document(lm._mxd, 1)
+    lm.create_layout("Two")
+    lm.switch_layout("One")
+
+    _change_property(lm._mxd, element_type, prop)
+    changed = document_state(lm._mxd)
+    assert lm.switch_layout("Two")
+    assert document_state(lm._mxd) != changed
+    assert lm.switch_layout("One")
+    assert document_state(lm._mxd) == changed
+
+
+def test_unchanged_document_is_not_stored_again(mxd_path):
+    lm = LayoutManager(mxd_path=mxd_path)
+    lm.create_layout("One")
+    edit_document(lm._mxd, 1)
+    lm.create_layout("Two")
+    lm.switch_layout("One")
+    layout = lm._layouts.get("One")
+    lm.switch_layout("Two")
+    assert lm._layouts.get("One") is layout
+
+
+def test_first_switch_without_applying_keeps_the_stored_layouts(mxd_path):
+    lm = LayoutManager(mxd_path=mxd_path)
+    lm.create_layout("One")
+    one = document_state(lm._mxd)
+    edit_document(lm._mxd, 1)
+    lm.create_layout("Two")
+    two = document_state(lm._mxd)
+    lm.save_layout_json()
+    lm.close()
+
+    mxd = arcpy.mapping.MapDocument(mxd_path)
+    # the document matches neither layout
+    edit_document(mxd, 5)
+    lm = LayoutManager(mxd=mxd, apply_first_layout=False)
+    assert lm.active_layout is None
+    assert lm.switch_layout("Two")
+    assert document_state(mxd) == two
+    assert lm.switch_layout("One")
+    assert document_state(mxd) == one
+
+    reopened = LayoutManager(mxd=arcpy.mapping.MapDocument(mxd_path), apply_first_layout=False, read_only=True)
+    assert reopened.switch_layout("One")
+    assert document_state(reopened._mxd) == one
+
+
+def test_switch_reports_failures(mxd_path):
+    lm = LayoutManager(mxd_path=mxd_path)
+    lm.create_layout("One")
+    assert lm.switch_layout("Missing") is False
+    assert lm.active_layout == "One"
+
+    read_only = LayoutManager(mxd_path=mxd_path, read_only=True)
+    with pytest.raises(exceptions.MissingLayout):
+        read_only.switch_layout("Missing")
+
+
+def test_read_only_manager_does_not_auto_save(mxd_path):
+    lm = LayoutManager(mxd_path=mxd_path, read_only=True)
+    assert lm.auto_save is False
@@ -0,0 +1,92 @@
+from __future__ import print_function
+from __future__ import division
+
+import fake_arcpy
+import pytest
+
+from ArcGIS_Layout_Manager import LayoutManager, apply_plans, toc_tree
+from document_helpers import document_state
+
+"""
+Table of contents trees, and diff_switch skipping the subtrees that didn't change
+"""
+
+
+def _tree(long_names):
+    return toc_tree.TocTree([(None, long_name) for long_name in long_names])
+
+
+def test_tree_from_long_names():
+    tree = _tree(["A", "A\\B", "A\\B\\C", "A\\D", "E"])
+    assert tree.parents == [None, 0, 1, 0, None]
+    assert tree.children == [[1, 3], [2], [], [], []]
+    assert tree.subtree_end == [4, 3, 3, 4, 5]
+    assert all(tree.skippable)
+
+
+def test_subtree_listed_apart_is_not_skippable():
+    tree = _tree(["A", "A\\B", "E", "A\\C"])
+    assert tree.subtree_end[0] == 4
+    assert tree.skippable == [False, True, True, True]
+
+
+def test_signatures_change_with_any_layer_of_the_subtree():
+    tree = _tree(["A", "A\\B", "A\\B\\C", "E"])
+    states = [(("visible", True),), (("visible", True),), (("visible", True),), (("visible", False),)]
+    signatures = tree.signatures(states)
+    changed = list(states)
+    changed[2] = (("visible", False),)
+    changed_signatures = tree.signatures(changed)
+    assert [old == new for old, new in zip(signatures, changed_signatures)] == [False, False, False, True]
+
+
+@pytest.fixture
+def lm(tmpdir):
+    path = str(tmpdir.join("groups.mxd"))
+    # three group layers of ten layers
+    fake_arcpy.generate_document(path, elements=6, layers=33, pages=1)
+    lm = LayoutManager(mxd_path=path)
+    lm.auto_save = False
+    lm.diff_switch = True
+    lm.create_layout("One")
+    return lm
+
+
+def test_diff_switch_only_writes_changed_layers(lm, monkeypatch):
+    replays = []
+    replay_toc_tree = apply_plans.replay_toc_tree
+
+    def counted_replay(plan, previous_plan, stats=None):
+        replays.append(plan.layout.get('layout_name'))
+        return replay_toc_tree(plan, previous_plan, stats)
+
+    monkeypatch.setattr(apply_plans, "replay_toc_tree", counted_replay)
+    layer = lm._mxd._layers[13]
+    layer.visible = not layer.visible
+    layer.transparency = 40
+    lm.create_layout("Two")
+    two = document_state(lm._mxd)
+    lm.switch_layout("One")
+    one = document_state(lm._mxd)
+
+    fake_arcpy.reset_counters()
+    lm.switch_layout("Two")
+    assert fake_arcpy.counters[("set", "LAYER")] == 2
+    assert document_state(lm._mxd) == two
+    fake_arcpy.reset_counters()
+    lm.switch_layout("One")
+    assert fake_arcpy.counters[("set", "LAYER")] == 2
+    assert document_state(lm._mxd) == one
+    # the first switch follows a capture, so only the switches after it replay against the tree
+    assert replays == ["Two", "One"]
+
+
+def test_diff_switch_writes_every_layer_after_a_capture(lm):
+    for layer in lm._mxd._layers:
+        layer.visible = not layer.visible
+    lm.create_layout("Two")
+    lm.switch_layout("One")
+    one = document_state(lm._mxd)
+    lm.switch_layout("Two")
+    lm.switch_layout("One")
+    assert document_state(lm._mxd) == one